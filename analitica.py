@@ -0,0 +1,192 @@
+# analitica.py
+# Rendimiento de combustible y control de odómetros sobre todo el historial de bitácoras
+# (con las archivadas si el rango de fechas llega al archivo, ver historico.py).
+# Las columnas se leen en bloque (tuplas, sin hidratar objetos ORM) y todo el cálculo es
+# vectorizado con NumPy, agrupando por vehículo sobre un arreglo ordenado por
+# (vehiculo_id, fecha_salida, id).
+import time as reloj
+import numpy as np
+from sqlalchemy import select, union_all
+from app import db
+from models import Bitacora, BitacoraArchivada, Vehiculo
+from consultas import aplicar_filtros
+import historico
+
+# Viajes que entran en el rendimiento "reciente" de cada vehículo
+VENTANA_RECIENTE = 10
+# Diferencia (km) entre el final de un viaje y el inicio del siguiente que se tolera
+TOLERANCIA_ODOMETRO = 1.0
+# Puntaje robusto (basado en la mediana y la MAD) a partir del cual una carga es atípica
+UMBRAL_ATIPICO = 3.5
+# Cuántos casos de cada lista se devuelven
+MAX_CASOS = 50
+
+def consulta_columnas(filtros, modelo=Bitacora):
+    # Solo columnas numéricas: las fechas se buscan luego, solo para los casos reportados.
+    consulta = select(
+        modelo.id,
+        modelo.vehiculo_id,
+        modelo.kilometraje_salida,
+        modelo.kilometraje_entrada,
+        modelo.litros_combustible
+    ).order_by(modelo.vehiculo_id, modelo.fecha_salida, modelo.id)
+    return aplicar_filtros(consulta, filtros, modelo)
+
+def _consulta_con_archivo(filtros):
+    # Las dos tablas en una sola consulta, con el mismo orden (historico.py)
+    partes = [aplicar_filtros(select(modelo.id, modelo.vehiculo_id, modelo.kilometraje_salida,
+                                     modelo.kilometraje_entrada, modelo.litros_combustible,
+                                     modelo.fecha_salida), filtros, modelo)
+              for modelo in (Bitacora, BitacoraArchivada)]
+    todas = union_all(*partes).subquery()
+    return (select(todas.c.id, todas.c.vehiculo_id, todas.c.kilometraje_salida, todas.c.kilometraje_entrada,
+                   todas.c.litros_combustible)
+            .order_by(todas.c.vehiculo_id, todas.c.fecha_salida, todas.c.id))
+
+def _leer_columnas(filtros):
+    # Por la conexión Core: sin la capa de resultados del ORM.
+    consulta = _consulta_con_archivo(filtros) if historico.alcanza(filtros) else consulta_columnas(filtros)
+    # 'clause' deja que la sesión elija la réplica de lectura si la vista la usa (replica.py).
+    resultado = db.session.connection(bind_arguments={'clause': consulta}).execute(consulta)
+    # Las filas se toman directo del cursor DBAPI (tuplas) y NumPy las convierte de una vez.
+    filas = resultado.cursor.fetchall()
+    resultado.close()
+    if not filas:
+        return None
+    # None -> NaN: viajes sin kilometraje final no suman km
+    matriz = np.array(filas, dtype=float)
+    return {
+        'id': matriz[:, 0].astype(np.int64),
+        'vehiculo': matriz[:, 1].astype(np.int64),
+        'km_salida': matriz[:, 2],
+        'km_entrada': matriz[:, 3],
+        'litros': np.nan_to_num(matriz[:, 4]),
+    }
+
+def _fechas(ids):
+    if not ids:
+        return {}
+    fechas = {}
+    for modelo in (Bitacora, BitacoraArchivada):
+        consulta = select(modelo.id, modelo.fecha_salida).where(modelo.id.in_(ids))
+        fechas.update((bitacora_id, fecha.strftime('%Y-%m-%d')) for bitacora_id, fecha in db.session.execute(consulta))
+    return fechas
+
+def _inicio_de_grupo(grupo):
+    # Para cada posición, el índice donde empieza su grupo (el arreglo ya viene ordenado).
+    n = len(grupo)
+    inicios = np.flatnonzero(np.r_[True, grupo[1:] != grupo[:-1]])
+    return np.repeat(inicios, np.diff(np.r_[inicios, n])), inicios
+
+def _suma_movil(valores, inicio_grupo, ventana):
+    # Suma de los últimos 'ventana' valores sin cruzar el inicio del grupo.
+    acumulado = np.r_[0.0, np.cumsum(valores)]
+    posiciones = np.arange(len(valores))
+    desde = np.maximum(posiciones - ventana + 1, inicio_grupo)
+    return acumulado[posiciones + 1] - acumulado[desde]
+
+def _mediana_por_grupo(grupo, valores):
+    # Devuelve la mediana del grupo de cada elemento (grupo = índices 0..k-1).
+    orden = np.lexsort((valores, grupo))
+    ordenados = valores[orden]
+    conteos = np.bincount(grupo)
+    inicios = np.r_[0, np.cumsum(conteos)[:-1]]
+    medianas = (ordenados[inicios + (conteos - 1) // 2] + ordenados[inicios + conteos // 2]) / 2
+    return medianas[grupo]
+
+def calcular(filtros):
+    inicio = reloj.perf_counter()
+    datos = _leer_columnas(filtros)
+    if datos is None:
+        return {'filas': 0, 'vehiculos': [], 'huecos_odometro': [], 'solapes_odometro': [],
+                'recargas_atipicas': [], 'segundos': round(reloj.perf_counter() - inicio, 4)}
+
+    vehiculo = datos['vehiculo']
+    km = np.nan_to_num(datos['km_entrada'] - datos['km_salida'])
+    litros = datos['litros']
+    inicio_grupo, inicios = _inicio_de_grupo(vehiculo)
+    ids_vehiculo = vehiculo[inicios]
+    indice_vehiculo = np.repeat(np.arange(len(inicios)), np.diff(np.r_[inicios, len(vehiculo)]))
+
+    # --- Rendimiento por vehículo (total y últimos VENTANA_RECIENTE viajes) ---
+    viajes = np.bincount(indice_vehiculo)
+    km_total = np.bincount(indice_vehiculo, weights=km)
+    litros_total = np.bincount(indice_vehiculo, weights=litros)
+    km_movil = _suma_movil(km, inicio_grupo, VENTANA_RECIENTE)
+    litros_movil = _suma_movil(litros, inicio_grupo, VENTANA_RECIENTE)
+    ultimos = np.r_[inicios[1:], len(vehiculo)] - 1
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rendimiento = np.where(litros_total > 0, km_total / litros_total, np.nan)
+        rendimiento_reciente = np.where(litros_movil[ultimos] > 0, km_movil[ultimos] / litros_movil[ultimos], np.nan)
+
+    # --- Continuidad del odómetro entre viajes consecutivos del mismo vehículo ---
+    mismo_vehiculo = np.r_[False, vehiculo[1:] == vehiculo[:-1]]
+    km_anterior = np.r_[np.nan, datos['km_entrada'][:-1]]
+    diferencia = datos['km_salida'] - km_anterior
+    valida = mismo_vehiculo & ~np.isnan(diferencia)
+    huecos = np.flatnonzero(valida & (diferencia > TOLERANCIA_ODOMETRO))
+    solapes = np.flatnonzero(valida & (diferencia < 0))
+
+    # --- Cargas de combustible atípicas (puntaje robusto por vehículo) ---
+    cargas = np.flatnonzero(litros > 0)
+    atipicas = np.array([], dtype=np.int64)
+    puntaje = np.array([])
+    mediana_carga = np.array([])
+    if len(cargas):
+        grupo_carga = np.unique(indice_vehiculo[cargas], return_inverse=True)[1]
+        litros_carga = litros[cargas]
+        mediana_carga = _mediana_por_grupo(grupo_carga, litros_carga)
+        desviacion = np.abs(litros_carga - mediana_carga)
+        mad = _mediana_por_grupo(grupo_carga, desviacion)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            puntaje = np.where(mad > 0, 0.6745 * desviacion / mad, 0.0)
+        atipicas = np.flatnonzero(puntaje > UMBRAL_ATIPICO)
+
+    def _mayores(indices, magnitud):
+        return indices[np.argsort(-np.abs(magnitud[indices]))][:MAX_CASOS]
+
+    huecos = _mayores(huecos, diferencia)
+    solapes = _mayores(solapes, diferencia)
+    atipicas = atipicas[np.argsort(-puntaje[atipicas])][:MAX_CASOS]
+    placas = dict(db.session.execute(select(Vehiculo.id, Vehiculo.placa)).all())
+    fechas = _fechas([int(datos['id'][i]) for i in np.r_[huecos, solapes, cargas[atipicas]]])
+
+    def _caso_odometro(i):
+        return {
+            'bitacora_id': int(datos['id'][i]),
+            'placa': placas.get(int(vehiculo[i])),
+            'fecha': fechas.get(int(datos['id'][i])),
+            'km_anterior': float(km_anterior[i]),
+            'km_salida': float(datos['km_salida'][i]),
+            'diferencia': round(float(diferencia[i]), 2)
+        }
+
+    return {
+        'filas': int(len(vehiculo)),
+        'vehiculos': [
+            {
+                'vehiculo_id': int(ids_vehiculo[k]),
+                'placa': placas.get(int(ids_vehiculo[k])),
+                'viajes': int(viajes[k]),
+                'km_recorridos': round(float(km_total[k]), 1),
+                'litros': round(float(litros_total[k]), 1),
+                'km_por_litro': None if np.isnan(rendimiento[k]) else round(float(rendimiento[k]), 2),
+                'km_por_litro_reciente': None if np.isnan(rendimiento_reciente[k]) else round(float(rendimiento_reciente[k]), 2)
+            }
+            for k in range(len(ids_vehiculo))
+        ],
+        'huecos_odometro': [_caso_odometro(i) for i in huecos],
+        'solapes_odometro': [_caso_odometro(i) for i in solapes],
+        'recargas_atipicas': [
+            {
+                'bitacora_id': int(datos['id'][cargas[j]]),
+                'placa': placas.get(int(vehiculo[cargas[j]])),
+                'fecha': fechas.get(int(datos['id'][cargas[j]])),
+                'litros': round(float(litros[cargas[j]]), 1),
+                'mediana_vehiculo': round(float(mediana_carga[j]), 1),
+                'puntaje': round(float(puntaje[j]), 1)
+            }
+            for j in atipicas
+        ],
+        'segundos': round(reloj.perf_counter() - inicio, 4)
+    }
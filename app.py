@@ -1,4 +1,5 @@
 # app.py
+import arranque  # primero: desde acá se mide la importación (ver arranque.py)
 from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager
@@ -12,7 +13,9 @@ app.config.from_object('config.Config')
 # 3. Inicialización de las extensiones de Flask
 #    Se definen aquí para que otros archivos (como models.py y routes.py)
 #    puedan importarlos desde 'app'.
-db = SQLAlchemy(app)
+#    La sesión envía a la réplica de lectura (si hay) los SELECT de las vistas @solo_lectura.
+from replica import SesionConReplica
+db = SQLAlchemy(app, session_options={'class_': SesionConReplica})
 bcrypt = Bcrypt(app)
 login_manager = LoginManager(app)
 
@@ -25,7 +28,27 @@ login_manager.login_message_category = 'info' # Categoría de Bootstrap para los
 #    Esto evita la importación circular, ya que 'routes.py' necesita importar 'app' y 'db'.
 #    Y 'models.py' (que es usado por 'routes.py') también necesita 'db'.
 from routes import *
+import indices  # comandos 'flask crear-indices' y 'flask verificar-planes'
 
-# 6. Punto de entrada para correr la aplicación
+# 6. Réplica de lectura (solo si DATABASE_REPLICA_URL, ver replica.py)
+import replica
+replica.instalar(app)
+
+# 7. Caché HTTP (ETag/304), compresión y estáticos con huella (ver cache_http.py)
+import cache_http
+cache_http.instalar(app)
+
+# 8. Métricas por endpoint en /metrics (solo si METRICAS_ACTIVAS, ver metricas.py)
+import metricas
+metricas.instalar(app)
+
+# 9. Tiempos de arranque (importación y primera solicitud, ver arranque.py)
+arranque.instalar(app)
+
+# 10. 'app' es lo que sirve gunicorn ('app:app', ver gunicorn.conf.py). No hay fábrica:
+#     la app es única por proceso, y models.py, routes.py y el resto la importan con
+#     'from app import app, db' para registrar en ella sus rutas, comandos y eventos.
+
+# 11. Punto de entrada para correr la aplicación
 if __name__ == '__main__':
     app.run(debug=True)
\ No newline at end of file
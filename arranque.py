@@ -0,0 +1,51 @@
+# arranque.py
+# Tiempos de arranque de cada proceso: cuánto tarda en importarse app.py y cuánto pasa
+# hasta terminar la primera solicitud. Se registran en el log y, con METRICAS_ACTIVAS,
+# en el histograma bitacoras_arranque_segundos de /metrics.
+# Con gunicorn --preload (gunicorn.conf.py) la app se importa una sola vez en el proceso
+# maestro; en cada worker el reloj de la primera solicitud empieza en el fork.
+import os
+import threading
+import time
+
+# app.py importa este módulo antes que cualquier otro, así este es el inicio del proceso.
+_estado = {'inicio': time.perf_counter(), 'pid': os.getpid(), 'importacion': None,
+           'pid_importacion': None, 'primera': None}
+_candado = threading.Lock()
+
+def _al_fork():
+    _estado.update(inicio=time.perf_counter(), pid=os.getpid(), primera=None)
+
+os.register_at_fork(after_in_child=_al_fork)
+
+def importacion():
+    # Segundos que tardó en importarse app.py (en el maestro, si se precargó).
+    return _estado['importacion']
+
+def primera_solicitud():
+    # Segundos desde el inicio del proceso (o el fork) hasta la primera respuesta, o None.
+    return _estado['primera']
+
+def _tras_primera_solicitud(respuesta):
+    if _estado['primera'] is not None:
+        return respuesta
+    with _candado:
+        if _estado['primera'] is not None:
+            return respuesta
+        _estado['primera'] = time.perf_counter() - _estado['inicio']
+    from flask import current_app
+    import metricas
+    current_app.logger.info('Primera solicitud del proceso %s a los %.0f ms del arranque',
+                            os.getpid(), _estado['primera'] * 1000)
+    # Un worker precargado no importó nada: ese tiempo queda en el log del maestro.
+    if _estado['pid'] == _estado['pid_importacion']:
+        metricas.observar_arranque('importacion', _estado['importacion'])
+    metricas.observar_arranque('primera_solicitud', _estado['primera'])
+    return respuesta
+
+def instalar(app):
+    # La llama app.py al final de la importación.
+    _estado['importacion'] = time.perf_counter() - _estado['inicio']
+    _estado['pid_importacion'] = os.getpid()
+    app.logger.info('app.py importada en %.0f ms', _estado['importacion'] * 1000)
+    app.after_request(_tras_primera_solicitud)
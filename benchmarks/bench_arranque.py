@@ -0,0 +1,64 @@
+# benchmarks/bench_arranque.py
+# Tiempo de arranque de un worker: importación de app.py, primera solicitud (GET /login)
+# y primer PDF (la primera vez se importa fpdf, ver pdf_plantilla.py). Cada repetición es
+# un intérprete nuevo, como un worker de gunicorn sin --preload.
+#
+#   python benchmarks/bench_arranque.py
+#   python benchmarks/bench_arranque.py --repeticiones 20 --json arranque.json
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Se ejecuta en cada proceso hijo; imprime una línea JSON con las mediciones.
+HIJO = '''
+import json, sys, time
+import app as modulo
+import arranque
+pesados = sorted(m for m in ('fpdf', 'PIL', 'fontTools', 'numpy', 'openpyxl') if m in sys.modules)
+cliente = modulo.app.test_client()
+cliente.get('/login')
+from pdf_reportes import construir_pdf
+inicio = time.perf_counter()
+construir_pdf([])
+print(json.dumps({'importacion_ms': arranque.importacion() * 1000,
+                  'primera_solicitud_ms': arranque.primera_solicitud() * 1000,
+                  'primer_pdf_ms': (time.perf_counter() - inicio) * 1000,
+                  'modulos_pesados': pesados}))
+'''
+
+def medir(repeticiones):
+    temporal = tempfile.mkdtemp(prefix='bench_arranque_')
+    entorno = dict(os.environ, DATABASE_URL='sqlite:///' + os.path.join(temporal, 'bench.db'))
+    corridas = []
+    for _ in range(repeticiones):
+        salida = subprocess.run([sys.executable, '-c', HIJO], cwd=RAIZ, env=entorno,
+                                capture_output=True, text=True, check=True).stdout
+        corridas.append(json.loads(salida.strip().splitlines()[-1]))
+    resultado = {clave: round(statistics.median(c[clave] for c in corridas), 1)
+                 for clave in ('importacion_ms', 'primera_solicitud_ms', 'primer_pdf_ms')}
+    resultado['modulos_pesados_al_importar'] = corridas[-1]['modulos_pesados']
+    return resultado
+
+def main():
+    parser = argparse.ArgumentParser(description='Tiempo de arranque de la aplicación (mediana de procesos nuevos).')
+    parser.add_argument('--repeticiones', type=int, default=10)
+    parser.add_argument('--json', help='archivo donde guardar los resultados')
+    args = parser.parse_args()
+
+    resultado = medir(args.repeticiones)
+    print(f"Importación de app.py:     {resultado['importacion_ms']:>8} ms")
+    print(f"Hasta la primera respuesta: {resultado['primera_solicitud_ms']:>7} ms")
+    print(f"Primer PDF (vacío):         {resultado['primer_pdf_ms']:>7} ms")
+    print(f"Cargados al importar:       {', '.join(resultado['modulos_pesados_al_importar']) or '-'}")
+    if args.json:
+        with open(args.json, 'w') as salida:
+            json.dump(resultado, salida, indent=2, ensure_ascii=False)
+
+if __name__ == '__main__':
+    main()
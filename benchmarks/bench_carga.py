@@ -0,0 +1,196 @@
+# benchmarks/bench_carga.py
+# Prueba de carga con gunicorn de verdad (gunicorn.conf.py): varios kioscos registrando
+# viajes sin parar mientras otros clientes descargan PDF de un mes entero. Informa
+# solicitudes por segundo y latencia p50/p99 del kiosko (POST /procesar_bitacora) para
+# cada combinación de workers x hilos, así se ve cuánto frena un PDF largo al kiosko en
+# workers sincrónicos y en hilos (gthread).
+# Siembra la base de DATABASE_URL (por defecto un SQLite temporal): no apuntarlo nunca
+# a la base de producción.
+#
+#   python benchmarks/bench_carga.py                           # 2 workers, 1 y 4 hilos
+#   python benchmarks/bench_carga.py --hilos 1 2 4 8 --segundos 60 --json carga.json
+#   DATABASE_URL=postgresql://localhost/bitacoras_bench python benchmarks/bench_carga.py --bitacoras 200000
+import argparse
+import http.cookiejar
+import json
+import os
+import re
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from datetime import date, timedelta
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+_temporal = tempfile.mkdtemp(prefix='bench_carga_')
+os.environ.setdefault('DATABASE_URL', 'sqlite:///' + os.path.join(_temporal, 'bench.db'))
+os.environ.setdefault('REPORTES_DIR', os.path.join(_temporal, 'reportes'))
+os.environ.setdefault('REPORTES_CACHE_DIR', os.path.join(_temporal, 'cache'))
+# Sin caché de PDF: cada descarga se renderiza de verdad
+os.environ.setdefault('REPORTES_CACHE_MAX_MB', '0')
+
+import flota_sintetica
+
+ADMIN = ('benchmark@ylb.gob.bo', 'bench')
+
+def _percentil(valores, p):
+    ordenados = sorted(valores)
+    if not ordenados:
+        return None
+    indice = min(len(ordenados) - 1, max(0, round(p / 100 * (len(ordenados) - 1))))
+    return round(ordenados[indice], 1)
+
+# --- Clientes HTTP ---
+class _SinRedireccion(urllib.request.HTTPRedirectHandler):
+    # Cada POST se mide solo: la redirección que lo sigue no se pide.
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+class Cliente:
+    # Un navegador: cookies propias y el token CSRF del último formulario leído.
+    def __init__(self, base):
+        self.base = base
+        self.abridor = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()), _SinRedireccion())
+
+    def pedir(self, ruta, datos=None):
+        cuerpo = urllib.parse.urlencode(datos).encode() if datos is not None else None
+        try:
+            with self.abridor.open(self.base + ruta, data=cuerpo, timeout=300) as respuesta:
+                return respuesta.status, respuesta.read()
+        except urllib.error.HTTPError as e:
+            return e.code, e.read()
+
+    def token(self, ruta):
+        _, html = self.pedir(ruta)
+        encontrado = re.search(rb'name="csrf_token" type="hidden" value="([^"]+)"', html)
+        return encontrado.group(1).decode() if encontrado else ''
+
+def _kiosko(base, vehiculo_id, area_id, hasta, latencias, errores):
+    cliente = Cliente(base)
+    token = cliente.token('/')
+    # Kilometraje muy por encima del sembrado: el control del odómetro siempre pasa.
+    km = 10_000_000 + vehiculo_id * 100_000
+    while time.monotonic() < hasta:
+        km += 50
+        inicio = time.perf_counter()
+        estado, _ = cliente.pedir('/procesar_bitacora', {
+            'csrf_token': token, 'nombre_conductor': 'Conductor Carga', 'vehiculo': vehiculo_id,
+            'area': area_id, 'fecha_viaje': date.today().isoformat(), 'kilometraje_salida': km,
+            'kilometraje_entrada': km + 42, 'litros_combustible': 0, 'descripcion_trabajo': 'Viaje de carga'})
+        latencias.append(time.perf_counter() - inicio)
+        if estado >= 400:
+            errores.append(estado)
+
+def _reportes(base, ruta, hasta, duraciones, errores):
+    cliente = Cliente(base)
+    token = cliente.token('/login')
+    cliente.pedir('/login', {'csrf_token': token, 'email': ADMIN[0], 'password': ADMIN[1]})
+    while time.monotonic() < hasta:
+        inicio = time.perf_counter()
+        estado, cuerpo = cliente.pedir(ruta)
+        duraciones.append(time.perf_counter() - inicio)
+        if estado != 200 or not cuerpo.startswith(b'%PDF'):
+            errores.append(estado)
+
+# --- Servidor ---
+def _puerto_libre():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+def _iniciar_gunicorn(workers, hilos, **variables):
+    # 'variables': entorno adicional para la aplicación (p. ej. KIOSKO_COMMIT_AGRUPADO='1')
+    puerto = _puerto_libre()
+    entorno = dict(os.environ, GUNICORN_THREADS=str(hilos), WEB_CONCURRENCY=str(workers), **variables)
+    proceso = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '--config', 'gunicorn.conf.py', '--bind', f'127.0.0.1:{puerto}',
+         '--timeout', '300', '--log-level', 'warning'],
+        cwd=RAIZ, env=entorno)
+    base = f'http://127.0.0.1:{puerto}'
+    for _ in range(300):
+        try:
+            urllib.request.urlopen(base + '/login', timeout=1).read()
+            return proceso, base
+        except OSError:
+            time.sleep(0.1)
+    proceso.terminate()
+    raise RuntimeError('gunicorn no respondió')
+
+def medir(workers, hilos, kioscos, descargas, segundos, vehiculo_ids, area_ids, ruta_pdf):
+    proceso, base = _iniciar_gunicorn(workers, hilos)
+    try:
+        latencias, duraciones, errores_kiosko, errores_pdf = [], [], [], []
+        hasta = time.monotonic() + segundos
+        hilos_carga = [threading.Thread(target=_reportes, args=(base, ruta_pdf, hasta, duraciones, errores_pdf))
+                       for _ in range(descargas)]
+        hilos_carga += [threading.Thread(target=_kiosko, args=(base, vehiculo_ids[n % len(vehiculo_ids)],
+                                                               area_ids[0], hasta, latencias, errores_kiosko))
+                        for n in range(kioscos)]
+        inicio = time.perf_counter()
+        for hilo in hilos_carga:
+            hilo.start()
+        for hilo in hilos_carga:
+            hilo.join()
+        transcurrido = time.perf_counter() - inicio
+    finally:
+        proceso.terminate()
+        proceso.wait()
+    latencias_ms = [t * 1000 for t in latencias]
+    return {
+        'workers': workers,
+        'hilos': hilos,
+        'kiosko_rps': round(len(latencias) / transcurrido, 1),
+        'kiosko_p50_ms': _percentil(latencias_ms, 50),
+        'kiosko_p99_ms': _percentil(latencias_ms, 99),
+        'kiosko_errores': len(errores_kiosko),
+        'pdf_completados': len(duraciones),
+        'pdf_p50_ms': _percentil([t * 1000 for t in duraciones], 50),
+        'pdf_errores': len(errores_pdf),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description='Kiosko bajo carga de reportes PDF, con gunicorn.')
+    parser.add_argument('--bitacoras', type=int, default=50000)
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--hilos', type=int, nargs='+', default=[1, 4])
+    parser.add_argument('--kioscos', type=int, default=4, help='clientes registrando viajes a la vez')
+    parser.add_argument('--descargas', type=int, default=2, help='clientes descargando PDF a la vez')
+    parser.add_argument('--segundos', type=int, default=20)
+    parser.add_argument('--json', help='archivo donde guardar los resultados')
+    args = parser.parse_args()
+
+    from app import app
+    with app.app_context():
+        flota_sintetica.vaciar()
+        vehiculo_ids, area_ids = flota_sintetica.sembrar(args.bitacoras, admin=ADMIN)
+    hoy = date.today()
+    ruta_pdf = '/reporte/pdf?' + urllib.parse.urlencode(
+        {'fecha_inicio': (hoy - timedelta(days=30)).isoformat(), 'fecha_fin': hoy.isoformat()})
+
+    resultados = []
+    print(f"{'workers':>8} {'hilos':>6} {'kiosko rps':>11} {'p50 ms':>8} {'p99 ms':>8} {'errores':>8} "
+          f"{'PDF':>5} {'PDF p50 ms':>11}")
+    for hilos in args.hilos:
+        medicion = medir(args.workers, hilos, args.kioscos, args.descargas, args.segundos,
+                         vehiculo_ids, area_ids, ruta_pdf)
+        resultados.append(medicion)
+        print(f"{medicion['workers']:>8} {medicion['hilos']:>6} {medicion['kiosko_rps']:>11} "
+              f"{medicion['kiosko_p50_ms']:>8} {medicion['kiosko_p99_ms']:>8} "
+              f"{medicion['kiosko_errores'] + medicion['pdf_errores']:>8} {medicion['pdf_completados']:>5} "
+              f"{medicion['pdf_p50_ms']:>11}")
+    if args.json:
+        with open(args.json, 'w') as salida:
+            json.dump({'motor': app.config['SQLALCHEMY_DATABASE_URI'].split(':')[0], 'resultados': resultados},
+                      salida, indent=2, ensure_ascii=False)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+# benchmarks/bench_historico.py
+# Consultas del día a día (reportes y PDF del mes, conteo, primera página) con más y más
+# años de historial, con los meses cerrados archivados (historico.py) y sin archivar.
+# La cantidad de viajes por año es fija: con archivo, bitacora tiene siempre los mismos
+# ARCHIVO_MESES_ACTIVOS meses y solo crece bitacora_archivada. El historial completo se
+# mide también, como referencia (ese sí crece). Borra y siembra DATABASE_URL (por
+# defecto un SQLite temporal).
+#
+#   python benchmarks/bench_historico.py
+#   python benchmarks/bench_historico.py --por-anio 50000 --anios 1 3 6 --json historico.json
+#   DATABASE_URL=postgresql://localhost/bitacoras_bench python benchmarks/bench_historico.py
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+_temporal = tempfile.mkdtemp(prefix='bench_historico_')
+os.environ.setdefault('DATABASE_URL', 'sqlite:///' + os.path.join(_temporal, 'bench.db'))
+os.environ.setdefault('REPORTES_CACHE_DIR', os.path.join(_temporal, 'cache'))
+
+from app import app
+from models import Bitacora
+from consultas import FILTROS_VACIOS, pagina_bitacoras, contar_filas, filas_por_lotes
+import flota_sintetica
+import historico
+import cache_http
+
+def _percentil(valores, p):
+    ordenados = sorted(valores)
+    indice = min(len(ordenados) - 1, max(0, round(p / 100 * (len(ordenados) - 1))))
+    return round(ordenados[indice], 2)
+
+def consultas_a_medir():
+    hoy = date.today()
+    del_mes = dict(FILTROS_VACIOS, fecha_inicio=hoy.replace(day=1), fecha_fin=hoy)
+    ultimos_30 = dict(FILTROS_VACIOS, fecha_inicio=hoy - timedelta(days=30), fecha_fin=hoy)
+    return [
+        ('reportes del mes', lambda: pagina_bitacoras(del_mes)),
+        ('conteo del mes', lambda: contar_filas(del_mes)),
+        ('filas PDF 30 días', lambda: sum(1 for _ in filas_por_lotes(ultimos_30))),
+        ('reportes página 1', lambda: pagina_bitacoras(dict(FILTROS_VACIOS))),
+        ('conteo sin filtros', lambda: contar_filas(dict(FILTROS_VACIOS))),
+        ('historial completo', lambda: sum(1 for _ in filas_por_lotes(dict(FILTROS_VACIOS)))),
+    ]
+
+def medir(funcion, repeticiones):
+    funcion()  # calienta la caché de páginas de la BD
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion()
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+    return _percentil(tiempos, 50)
+
+def main():
+    parser = argparse.ArgumentParser(description='Consultas del mes con y sin archivo de meses cerrados.')
+    parser.add_argument('--por-anio', type=int, default=20000, help='viajes por año de historial')
+    parser.add_argument('--anios', type=int, nargs='+', default=[1, 3, 6], help='años de historial a probar')
+    parser.add_argument('--repeticiones', type=int, default=20)
+    parser.add_argument('--json', help='archivo donde guardar los resultados')
+    args = parser.parse_args()
+
+    resultados = []
+    nombres = [nombre for nombre, _ in consultas_a_medir()]
+    print(f"{'años':>4} {'archivo':>8} {'en bitacora':>11} " + ' '.join(f'{nombre:>19}' for nombre in nombres))
+    for anios in args.anios:
+        for archivar in (False, True):
+            with app.app_context():
+                flota_sintetica.vaciar()
+                # drop_all no deja marca: el límite del archivo guardado sería el de la corrida anterior
+                cache_http.subir('mes_archivado')
+                flota_sintetica.sembrar(args.por_anio * anios, anios=anios)
+                if archivar:
+                    historico.archivar(app.config['ARCHIVO_MESES_ACTIVOS'])
+                en_bitacora = Bitacora.query.count()
+                medicion = {'anios': anios, 'archivo': archivar, 'en_bitacora': en_bitacora,
+                            'archivadas': historico.total_archivado(),
+                            'p50_ms': {nombre: medir(funcion, args.repeticiones)
+                                       for nombre, funcion in consultas_a_medir()}}
+            resultados.append(medicion)
+            print(f"{anios:>4} {'sí' if archivar else 'no':>8} {en_bitacora:>11} "
+                  + ' '.join(f"{medicion['p50_ms'][nombre]:>19}" for nombre in nombres))
+    if args.json:
+        with open(args.json, 'w') as salida:
+            json.dump(resultados, salida, indent=2, ensure_ascii=False)
+
+if __name__ == '__main__':
+    main()
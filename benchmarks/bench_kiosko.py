@@ -0,0 +1,98 @@
+# benchmarks/bench_kiosko.py
+# Altas del kiosko por segundo y latencia p50/p99 de POST /procesar_bitacora con 1, 10 y
+# 100 conductores enviando a la vez, con commit por alta y con commit agrupado
+# (KIOSKO_COMMIT_AGRUPADO, ver registro_agrupado.py), sobre gunicorn en hilos.
+# Siembra la base de DATABASE_URL (por defecto un SQLite temporal): no apuntarlo nunca
+# a la base de producción.
+#
+#   python benchmarks/bench_kiosko.py
+#   python benchmarks/bench_kiosko.py --concurrencia 1 10 100 --segundos 30 --json kiosko.json
+#   DATABASE_URL=postgresql://localhost/bitacoras_bench python benchmarks/bench_kiosko.py --hilos 32
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from datetime import date
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_carga import ADMIN, Cliente, _iniciar_gunicorn, _percentil
+import flota_sintetica
+
+MODOS = [('por alta', '0'), ('agrupado', '1')]
+
+def _conductor(base, vehiculo_id, area_id, kilometros, hasta, latencias, errores):
+    cliente = Cliente(base)
+    token = cliente.token('/')
+    while time.monotonic() < hasta:
+        # Cada conductor tiene su vehículo: el odómetro siempre avanza, también entre corridas.
+        kilometros[vehiculo_id] += 50
+        km = kilometros[vehiculo_id]
+        inicio = time.perf_counter()
+        estado, _ = cliente.pedir('/procesar_bitacora', {
+            'csrf_token': token, 'nombre_conductor': 'Conductor Kiosko', 'vehiculo': vehiculo_id,
+            'area': area_id, 'fecha_viaje': date.today().isoformat(), 'kilometraje_salida': km,
+            'kilometraje_entrada': km + 42, 'litros_combustible': 0, 'descripcion_trabajo': 'Cambio de turno'})
+        if estado == 302:
+            latencias.append(time.perf_counter() - inicio)
+        else:
+            errores.append(estado)
+
+def medir(base, conductores, segundos, vehiculo_ids, area_id, kilometros):
+    latencias, errores = [], []
+    hasta = time.monotonic() + segundos
+    hilos = [threading.Thread(target=_conductor, args=(base, vehiculo_ids[n], area_id, kilometros, hasta,
+                                                       latencias, errores))
+             for n in range(conductores)]
+    inicio = time.perf_counter()
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+    transcurrido = time.perf_counter() - inicio
+    latencias_ms = [t * 1000 for t in latencias]
+    return {'conductores': conductores, 'altas_por_segundo': round(len(latencias) / transcurrido, 1),
+            'p50_ms': _percentil(latencias_ms, 50), 'p99_ms': _percentil(latencias_ms, 99),
+            'errores': len(errores)}
+
+def main():
+    parser = argparse.ArgumentParser(description='Altas simultáneas del kiosko, con y sin commit agrupado.')
+    parser.add_argument('--concurrencia', type=int, nargs='+', default=[1, 10, 100])
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--hilos', type=int, default=16)
+    parser.add_argument('--segundos', type=int, default=15)
+    parser.add_argument('--bitacoras', type=int, default=10000)
+    parser.add_argument('--json', help='archivo donde guardar los resultados')
+    args = parser.parse_args()
+
+    from app import app
+    with app.app_context():
+        flota_sintetica.vaciar()
+        vehiculo_ids, area_ids = flota_sintetica.sembrar(args.bitacoras, vehiculos=max(args.concurrencia),
+                                                         admin=ADMIN)
+    # Muy por encima de lo sembrado: el control del odómetro siempre pasa.
+    kilometros = {vehiculo_id: 10_000_000 + vehiculo_id * 1_000_000 for vehiculo_id in vehiculo_ids}
+
+    resultados = []
+    print(f"{'modo':<10} {'conductores':>11} {'altas/s':>8} {'p50 ms':>8} {'p99 ms':>8} {'errores':>8}")
+    for nombre, agrupado in MODOS:
+        proceso, base = _iniciar_gunicorn(args.workers, args.hilos, KIOSKO_COMMIT_AGRUPADO=agrupado)
+        try:
+            for conductores in args.concurrencia:
+                medicion = dict(medir(base, conductores, args.segundos, vehiculo_ids, area_ids[0], kilometros),
+                                modo=nombre)
+                resultados.append(medicion)
+                print(f"{nombre:<10} {conductores:>11} {medicion['altas_por_segundo']:>8} "
+                      f"{medicion['p50_ms']:>8} {medicion['p99_ms']:>8} {medicion['errores']:>8}")
+        finally:
+            proceso.terminate()
+            proceso.wait()
+    if args.json:
+        with open(args.json, 'w') as salida:
+            json.dump({'motor': app.config['SQLALCHEMY_DATABASE_URI'].split(':')[0], 'workers': args.workers,
+                       'hilos': args.hilos, 'resultados': resultados}, salida, indent=2, ensure_ascii=False)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,138 @@
+# benchmarks/bench_novedades.py
+# Panel en vivo (/api/novedades, ver novedades.py) sobre gunicorn en hilos: con 0, 2 y 8
+# páginas abiertas escuchando, mide las altas del kiosko por segundo y su latencia, y
+# cuánto tarda cada alta en llegar a las páginas (desde que se envía el POST), venga del
+# mismo worker o de otro. Las conexiones que pasan del tope por worker
+# (NOVEDADES_MAX_CONEXIONES) se cuentan como rechazadas: el kiosko no debe notarlas.
+# Siembra la base de DATABASE_URL (por defecto un SQLite temporal): no apuntarlo nunca
+# a la base de producción.
+#
+#   python benchmarks/bench_novedades.py
+#   python benchmarks/bench_novedades.py --escuchas 0 4 16 --conductores 10 --json novedades.json
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from datetime import date
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_carga import ADMIN, Cliente, _iniciar_gunicorn, _percentil
+import flota_sintetica
+
+def _escuchar(base, llegadas, estados):
+    # Una página del panel abierta hasta que el servidor corta el flujo (NOVEDADES_DURACION):
+    # guarda cuándo llegó cada alta (por nombre del conductor)
+    cliente = Cliente(base)
+    token = cliente.token('/login')
+    cliente.pedir('/login', {'csrf_token': token, 'email': ADMIN[0], 'password': ADMIN[1]})
+    try:
+        respuesta = cliente.abridor.open(base + '/api/novedades', timeout=60)
+    except OSError as e:
+        estados.append(getattr(e, 'code', 0))
+        return
+    estados.append(respuesta.status)
+    with respuesta:
+        for linea in respuesta:
+            if linea.startswith(b'data: '):
+                fila = json.loads(linea[6:]).get('fila')
+                if fila:
+                    llegadas.append((fila['nombre_conductor'], time.perf_counter()))
+
+def _conductor(base, numero, vehiculo_id, area_id, kilometros, hasta, envios, latencias, errores):
+    cliente = Cliente(base)
+    token = cliente.token('/')
+    enviadas = 0
+    while time.monotonic() < hasta:
+        kilometros[vehiculo_id] += 50
+        km = kilometros[vehiculo_id]
+        nombre = f'Conductor {numero}-{enviadas}'
+        enviadas += 1
+        inicio = time.perf_counter()
+        envios[nombre] = inicio
+        estado, _ = cliente.pedir('/procesar_bitacora', {
+            'csrf_token': token, 'nombre_conductor': nombre, 'vehiculo': vehiculo_id,
+            'area': area_id, 'fecha_viaje': date.today().isoformat(), 'kilometraje_salida': km,
+            'kilometraje_entrada': km + 42, 'litros_combustible': 0, 'descripcion_trabajo': 'Cambio de turno'})
+        if estado == 302:
+            latencias.append(time.perf_counter() - inicio)
+        else:
+            errores.append(estado)
+
+def medir(base, escuchas, conductores, segundos, vehiculo_ids, area_id, kilometros):
+    llegadas, estados = [], []
+    oyentes = [threading.Thread(target=_escuchar, args=(base, llegadas, estados))
+               for _ in range(escuchas)]
+    for hilo in oyentes:
+        hilo.start()
+    while len(estados) < escuchas:
+        time.sleep(0.1)
+    time.sleep(0.5)
+
+    envios, latencias, errores = {}, [], []
+    hasta = time.monotonic() + segundos
+    hilos = [threading.Thread(target=_conductor, args=(base, n, vehiculo_ids[n], area_id, kilometros, hasta,
+                                                       envios, latencias, errores))
+             for n in range(conductores)]
+    inicio = time.perf_counter()
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+    transcurrido = time.perf_counter() - inicio
+    # Margen para las últimas entregas (otros workers las ven cada NOVEDADES_INTERVALO_MS)
+    time.sleep(2)
+    entregas_ms = [(llegada - envios[nombre]) * 1000 for nombre, llegada in list(llegadas) if nombre in envios]
+    latencias_ms = [t * 1000 for t in latencias]
+    # Que se cierren antes de la medición siguiente, para no ocupar su lugar en el tope
+    for hilo in oyentes:
+        hilo.join()
+    abiertas = estados.count(200)
+    return {'escuchas': escuchas, 'abiertas': abiertas, 'rechazadas': escuchas - abiertas,
+            'altas_por_segundo': round(len(latencias) / transcurrido, 1),
+            'p50_ms': _percentil(latencias_ms, 50), 'p99_ms': _percentil(latencias_ms, 99), 'errores': len(errores),
+            'entregas': len(entregas_ms), 'esperadas': len(latencias) * abiertas,
+            'entrega_p50_ms': _percentil(entregas_ms, 50), 'entrega_p99_ms': _percentil(entregas_ms, 99)}
+
+def main():
+    parser = argparse.ArgumentParser(description='Altas del kiosko con páginas del panel escuchando novedades.')
+    parser.add_argument('--escuchas', type=int, nargs='+', default=[0, 2, 8])
+    parser.add_argument('--conductores', type=int, default=10)
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--hilos', type=int, default=8)
+    parser.add_argument('--segundos', type=int, default=10)
+    parser.add_argument('--bitacoras', type=int, default=10000)
+    parser.add_argument('--json', help='archivo donde guardar los resultados')
+    args = parser.parse_args()
+
+    from app import app
+    with app.app_context():
+        flota_sintetica.vaciar()
+        vehiculo_ids, area_ids = flota_sintetica.sembrar(args.bitacoras, vehiculos=args.conductores, admin=ADMIN)
+    # Muy por encima de lo sembrado: el control del odómetro siempre pasa.
+    kilometros = {vehiculo_id: 10_000_000 + vehiculo_id * 1_000_000 for vehiculo_id in vehiculo_ids}
+
+    resultados = []
+    print(f"{'escuchas':>8} {'abiertas':>8} {'altas/s':>8} {'p50 ms':>8} {'p99 ms':>8} {'errores':>8} "
+          f"{'entregas':>10} {'entrega p50':>11} {'entrega p99':>11}")
+    proceso, base = _iniciar_gunicorn(args.workers, args.hilos, NOVEDADES_DURACION=str(args.segundos + 5))
+    try:
+        for escuchas in args.escuchas:
+            medicion = medir(base, escuchas, args.conductores, args.segundos, vehiculo_ids, area_ids[0], kilometros)
+            resultados.append(medicion)
+            print(f"{escuchas:>8} {medicion['abiertas']:>8} {medicion['altas_por_segundo']:>8} "
+                  f"{medicion['p50_ms']:>8} {medicion['p99_ms']:>8} {medicion['errores']:>8} "
+                  f"{medicion['entregas']:>4}/{medicion['esperadas']:<5} {str(medicion['entrega_p50_ms'] or '-'):>11} "
+                  f"{str(medicion['entrega_p99_ms'] or '-'):>11}")
+    finally:
+        proceso.terminate()
+        proceso.wait()
+    if args.json:
+        with open(args.json, 'w') as salida:
+            json.dump({'motor': app.config['SQLALCHEMY_DATABASE_URI'].split(':')[0], 'workers': args.workers,
+                       'hilos': args.hilos, 'resultados': resultados}, salida, indent=2, ensure_ascii=False)
+
+if __name__ == '__main__':
+    main()
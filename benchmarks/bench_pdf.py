@@ -0,0 +1,156 @@
+# benchmarks/bench_pdf.py
+# Filas por segundo del PDF de bitácoras: renderizador anterior (nueve multi_cell por
+# fila, offsets sumados en cada celda, logo leído en cada página) contra TablaPDF, con la
+# fuente Unicode (PDF_FUENTE, ver pdf_plantilla.py) y con Helvetica (solo latin-1).
+# Mide también el primer PDF del proceso (el que analiza los TTF) contra los siguientes.
+#
+#   python benchmarks/bench_pdf.py                 # 1k, 10k y 50k filas
+#   python benchmarks/bench_pdf.py 1000 5000 --json resultados_pdf.json
+#   python benchmarks/bench_pdf.py 10000 --solo-nuevo --repeticiones 5
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import app
+from pdf_plantilla import PDF
+from pdf_reportes import construir_pdf, safe_str
+
+Fila = namedtuple('Fila', ['id', 'fecha_salida', 'nombre_conductor', 'placa', 'kilometraje_salida',
+                           'kilometraje_entrada', 'litros_combustible', 'descripcion_trabajo', 'area'])
+
+ACTIVIDADES = [
+    'Traslado de personal a planta',
+    'Inspección de pozas de evaporación y toma de muestras de salmuera en el sector norte, '
+    'con retorno por el camino de servicio',
+    'Compra de repuestos',
+    'Mantenimiento preventivo programado del vehículo en taller central; se reporta ruido en la '
+    'suspensión delantera y desgaste de neumáticos, pendiente de revisión por el jefe de flota',
+]
+
+def filas_sinteticas(cantidad, semilla=1):
+    azar = random.Random(semilla)
+    fecha = datetime(2024, 1, 1)
+    km = 10000.0
+    filas = []
+    for i in range(cantidad):
+        recorrido = round(azar.uniform(5, 300), 1)
+        filas.append(Fila(i + 1, fecha, f'Conductor {azar.randint(1, 80)}', f'P-{azar.randint(1, 60):03d}',
+                          km, km + recorrido, round(azar.uniform(0, 60), 1) if azar.random() < 0.3 else 0,
+                          azar.choice(ACTIVIDADES), f'Área {azar.randint(1, 12)}'))
+        km += recorrido
+        fecha += timedelta(minutes=37)
+    return filas
+
+# --- Renderizador anterior (copia del bucle original de routes.reporte_pdf) ---
+def construir_pdf_anterior(filas):
+    pdf = PDF(orientation='L', unit='mm', format='A4')
+    pdf.add_page()
+    pdf.set_font('Arial', '', 8)
+    col_width = {
+        "fecha": 18, "nombre": 40, "km_inicial": 15, "km_final": 15,
+        "km_recorridos": 15, "litros": 15, "actividad": 105,
+        "sector": 34, "firma": 20
+    }
+    claves = list(col_width)
+    pdf.set_fill_color(220, 220, 220)
+    pdf.set_font('Arial', 'B', 8)
+    for titulo, clave in zip(['FECHA', 'RESPONSABLE DE USO', 'KM. INI', 'KM. FIN', 'KM. REC', 'LITROS',
+                              'ACTIVIDAD / OBSERVACIONES', 'SECTOR', 'FIRMA'], claves):
+        pdf.cell(col_width[clave], 8, safe_str(titulo), 1, 1 if clave == 'firma' else 0, 'C', fill=True)
+    pdf.set_font('Arial', '', 8)
+    fill = False
+    for bitacora in filas:
+        km_recorrido = bitacora.kilometraje_entrada - bitacora.kilometraje_salida
+        textos = [
+            (bitacora.fecha_salida.strftime('%Y-%m-%d'), 'C'), (safe_str(bitacora.nombre_conductor), 'L'),
+            (str(bitacora.kilometraje_salida), 'R'), (str(bitacora.kilometraje_entrada), 'R'),
+            (str(round(km_recorrido, 2)), 'R'), (str(bitacora.litros_combustible or 0), 'R'),
+            (safe_str(bitacora.descripcion_trabajo), 'L'), (safe_str(bitacora.area), 'L'), ('', 'C'),
+        ]
+        pdf.set_fill_color(*((245, 245, 245) if fill else (255, 255, 255)))
+        y_inicial = pdf.get_y()
+        alturas = []
+        for i, (texto, alineacion) in enumerate(textos):
+            pdf.multi_cell(col_width[claves[i]], 8, texto, 1, alineacion, fill=True)
+            alturas.append(pdf.get_y())
+            if i + 1 < len(textos):
+                pdf.set_y(y_inicial)
+                pdf.set_x(pdf.get_x() + sum(col_width[c] for c in claves[:i + 1]))
+        max_y = max(alturas)
+        pdf.set_draw_color(200, 200, 200)
+        pdf.line(10, max_y, 287, max_y)
+        pdf.set_y(max_y)
+        fill = not fill
+    return bytes(pdf.output())
+
+def con_fuente(unicode, funcion):
+    # Corre 'funcion' con la fuente Unicode configurada o sin ella (Helvetica)
+    def renderizar(filas):
+        archivo = app.config['PDF_FUENTE']
+        if not unicode:
+            app.config['PDF_FUENTE'] = ''
+        try:
+            return funcion(filas)
+        finally:
+            app.config['PDF_FUENTE'] = archivo
+    return renderizar
+
+def medir(funcion, filas, repeticiones=1):
+    # El mejor de 'repeticiones' (el resto del tiempo es ruido de la máquina)
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        contenido = funcion(filas)
+        tiempos.append(time.perf_counter() - inicio)
+    segundos = min(tiempos)
+    return {'segundos': round(segundos, 3), 'filas_por_segundo': round(len(filas) / segundos),
+            'bytes': len(contenido)}
+
+def medir_primer_pdf(filas):
+    # Un PDF de pocas filas: el primero del proceso analiza los TTF, los siguientes no
+    primero = medir(con_fuente(True, construir_pdf), filas)
+    siguiente = medir(con_fuente(True, construir_pdf), filas, repeticiones=5)
+    helvetica = medir(con_fuente(False, construir_pdf), filas, repeticiones=5)
+    return {'filas': len(filas), 'primero_ms': round(primero['segundos'] * 1000, 1),
+            'siguiente_ms': round(siguiente['segundos'] * 1000, 1),
+            'helvetica_ms': round(helvetica['segundos'] * 1000, 1)}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('tamanos', nargs='*', type=int, default=[1000, 10000, 50000])
+    parser.add_argument('--json', help='archivo donde guardar los resultados')
+    parser.add_argument('--solo-nuevo', action='store_true', help='omite el renderizador anterior')
+    parser.add_argument('--repeticiones', type=int, default=1, help='se informa la mejor')
+    args = parser.parse_args()
+
+    primer_pdf = medir_primer_pdf(filas_sinteticas(20))
+    print(f"PDF de 20 filas: primero del proceso {primer_pdf['primero_ms']} ms, siguientes "
+          f"{primer_pdf['siguiente_ms']} ms (Helvetica {primer_pdf['helvetica_ms']} ms)")
+
+    resultados = []
+    print(f"{'filas':>8} {'renderizador':>18} {'segundos':>9} {'filas/s':>9} {'bytes':>10}")
+    for cantidad in args.tamanos:
+        filas = filas_sinteticas(cantidad)
+        casos = [('TablaPDF Helvetica', con_fuente(False, construir_pdf)),
+                 ('TablaPDF Unicode', con_fuente(True, construir_pdf))]
+        if not args.solo_nuevo:
+            casos.insert(0, ('anterior', con_fuente(False, construir_pdf_anterior)))
+        for nombre, funcion in casos:
+            medicion = dict(medir(funcion, filas, args.repeticiones), filas=cantidad, renderizador=nombre)
+            resultados.append(medicion)
+            print(f"{cantidad:>8} {nombre:>18} {medicion['segundos']:>9} {medicion['filas_por_segundo']:>9} "
+                  f"{medicion['bytes']:>10}")
+
+    if args.json:
+        with open(args.json, 'w') as salida:
+            json.dump({'primer_pdf': primer_pdf, 'resultados': resultados}, salida, indent=2)
+
+if __name__ == '__main__':
+    main()
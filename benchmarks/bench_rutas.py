@@ -0,0 +1,194 @@
+# benchmarks/bench_rutas.py
+# Latencia (p50/p95/p99), consultas SQL y memoria pico por ruta, con el cliente de
+# pruebas de Flask sobre una flota sintética (flota_sintetica.py) de varios tamaños.
+# Cada tamaño borra y vuelve a sembrar la base de DATABASE_URL (por defecto un SQLite
+# temporal), así que no apuntarlo nunca a la base de producción.
+#
+#   python benchmarks/bench_rutas.py                              # 10k y 100k en SQLite
+#   python benchmarks/bench_rutas.py 10000 100000 1000000 --json resultados/$(git rev-parse --short HEAD).json
+#   DATABASE_URL=postgresql://localhost/bitacoras_bench python benchmarks/bench_rutas.py 100000
+#   python benchmarks/bench_rutas.py 100000 --comparar resultados/abc1234.json
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import date, timedelta
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+_temporal = tempfile.mkdtemp(prefix='bench_rutas_')
+os.environ.setdefault('DATABASE_URL', 'sqlite:///' + os.path.join(_temporal, 'bench.db'))
+os.environ.setdefault('REPORTES_DIR', os.path.join(_temporal, 'reportes'))
+os.environ.setdefault('REPORTES_CACHE_DIR', os.path.join(_temporal, 'cache'))
+# Sin caché de PDF: cada /reporte/pdf se renderiza de verdad
+os.environ.setdefault('REPORTES_CACHE_MAX_MB', '0')
+
+from sqlalchemy import event
+from app import app, db
+import consultas
+import flota_sintetica
+
+ADMIN = ('benchmark@ylb.gob.bo', 'bench')
+
+def _percentil(valores, p):
+    ordenados = sorted(valores)
+    if not ordenados:
+        return None
+    indice = min(len(ordenados) - 1, max(0, round(p / 100 * (len(ordenados) - 1))))
+    return ordenados[indice]
+
+class ContadorSQL:
+    def __init__(self):
+        self.consultas = 0
+
+    def __call__(self, *args):
+        self.consultas += 1
+
+def casos(vehiculo_ids, area_ids):
+    # (nombre, método, url, datos, repeticiones relativas); las URL se arman por tamaño.
+    hoy = date.today()
+    mes = {'fecha_inicio': (hoy - timedelta(days=30)).isoformat(), 'fecha_fin': hoy.isoformat()}
+    estado = {'km': 10_000_000.0}
+
+    def kiosko():
+        # Kilometraje propio que siempre crece: la validación del formulario pasa.
+        estado['km'] += 100
+        return {'nombre_conductor': 'Conductor Bench', 'vehiculo': str(vehiculo_ids[0]), 'area': str(area_ids[0]),
+                'fecha_viaje': hoy.isoformat(), 'kilometraje_salida': str(estado['km']),
+                'kilometraje_entrada': str(estado['km'] + 42), 'litros_combustible': '0',
+                'descripcion_trabajo': 'Viaje de benchmark'}
+
+    return [
+        ('kiosko GET /', 'GET', '/', None, 1),
+        ('procesar_bitacora', 'POST', '/procesar_bitacora', kiosko, 1),
+        ('reportes (sin filtros)', 'GET', '/reportes', None, 1),
+        ('reportes (vehículo + mes)', 'GET', '/reportes', dict(mes, vehiculo_id=vehiculo_ids[0]), 1),
+        ('reportes (búsqueda)', 'GET', '/reportes', {'texto': 'repuestos'}, 1),
+        ('reportes (búsqueda + vehículo)', 'GET', '/reportes', {'texto': 'salmuera', 'vehiculo_id': vehiculo_ids[0]}, 1),
+        ('dashboard', 'GET', '/dashboard', None, 1),
+        ('reporte_pdf (vehículo + mes)', 'GET', '/reporte/pdf', dict(mes, vehiculo_id=vehiculo_ids[0]), 0.25),
+        ('reporte_pdf (mes)', 'GET', '/reporte/pdf', mes, 0.25),
+    ]
+
+def _pedir(cliente, metodo, url, datos):
+    if metodo == 'POST':
+        return cliente.post(url, data=datos() if callable(datos) else datos)
+    return cliente.get(url, query_string=datos)
+
+def medir_caso(cliente, contador, metodo, url, datos, repeticiones):
+    # Una vuelta de calentamiento (cachés de proceso, plantillas compiladas) que no cuenta.
+    respuesta = _pedir(cliente, metodo, url, datos)
+    if respuesta.status_code >= 400:
+        raise RuntimeError(f'{metodo} {url} devolvió {respuesta.status_code}')
+    tiempos = []
+    consultas = []
+    for _ in range(repeticiones):
+        contador.consultas = 0
+        inicio = time.perf_counter()
+        respuesta = _pedir(cliente, metodo, url, datos)
+        respuesta.get_data()
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+        consultas.append(contador.consultas)
+    # Memoria en una pasada aparte: tracemalloc distorsiona los tiempos.
+    tracemalloc.start()
+    respuesta = _pedir(cliente, metodo, url, datos)
+    respuesta.get_data()
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        'repeticiones': repeticiones,
+        'p50_ms': round(_percentil(tiempos, 50), 2),
+        'p95_ms': round(_percentil(tiempos, 95), 2),
+        'p99_ms': round(_percentil(tiempos, 99), 2),
+        'max_ms': round(max(tiempos), 2),
+        'consultas_sql': round(sum(consultas) / len(consultas), 1),
+        'memoria_pico_kb': round(pico / 1024),
+        'bytes_respuesta': len(respuesta.get_data()),
+    }
+
+def _commit_actual():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=RAIZ, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def comparar(anterior, actual):
+    # Variación del p50 por ruta y tamaño respecto de otra corrida guardada con --json.
+    previos = {(tamano['filas'], ruta): medicion['p50_ms']
+               for tamano in anterior['tamanos'] for ruta, medicion in tamano['rutas'].items()}
+    print(f"\nComparación con {anterior.get('commit')} ({anterior.get('motor')}), p50:")
+    for tamano in actual['tamanos']:
+        for ruta, medicion in tamano['rutas'].items():
+            previo = previos.get((tamano['filas'], ruta))
+            if not previo:
+                continue
+            cambio = (medicion['p50_ms'] - previo) / previo * 100
+            print(f"{tamano['filas']:>9}  {ruta:<30} {previo:>9} -> {medicion['p50_ms']:>9} ms  {cambio:+6.1f}%")
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark de rutas sobre una flota sintética.')
+    parser.add_argument('tamanos', nargs='*', type=int, default=[10000, 100000])
+    parser.add_argument('--repeticiones', type=int, default=30)
+    parser.add_argument('--vehiculos', type=int, default=60)
+    parser.add_argument('--areas', type=int, default=12)
+    parser.add_argument('--anios', type=int, default=3)
+    parser.add_argument('--json', help='archivo donde guardar los resultados (para comparar entre commits)')
+    parser.add_argument('--comparar', help='resultados JSON de otra corrida contra los que comparar')
+    args = parser.parse_args()
+
+    app.config['WTF_CSRF_ENABLED'] = False
+    contador = ContadorSQL()
+    with app.app_context():
+        event.listen(db.engine, 'before_cursor_execute', contador)
+        motor = db.engine.dialect.name
+
+    resultados = {
+        'commit': _commit_actual(),
+        'motor': motor,
+        'python': platform.python_version(),
+        'fecha': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'tamanos': [],
+    }
+    print(f'Motor: {motor}  commit: {resultados["commit"]}')
+    print(f"{'filas':>9}  {'ruta':<30} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'SQL':>6} {'mem KB':>8}")
+    for cantidad in args.tamanos:
+        inicio = time.perf_counter()
+        with app.app_context():
+            flota_sintetica.vaciar()
+            vehiculo_ids, area_ids = flota_sintetica.sembrar(cantidad, args.vehiculos, args.areas, args.anios,
+                                                             admin=ADMIN)
+        siembra = round(time.perf_counter() - inicio, 1)
+        # Los conteos en caché son del tamaño anterior
+        consultas._conteos.clear()
+
+        cliente = app.test_client()
+        respuesta = cliente.post('/login', data={'email': ADMIN[0], 'password': ADMIN[1]})
+        if respuesta.status_code != 302:
+            raise RuntimeError('No se pudo iniciar sesión con el admin del benchmark')
+
+        rutas = {}
+        for nombre, metodo, url, datos, factor in casos(vehiculo_ids, area_ids):
+            repeticiones = max(3, round(args.repeticiones * factor))
+            medicion = medir_caso(cliente, contador, metodo, url, datos, repeticiones)
+            rutas[nombre] = medicion
+            print(f"{cantidad:>9}  {nombre:<30} {medicion['p50_ms']:>9} {medicion['p95_ms']:>9} "
+                  f"{medicion['p99_ms']:>9} {medicion['consultas_sql']:>6} {medicion['memoria_pico_kb']:>8}")
+        resultados['tamanos'].append({'filas': cantidad, 'siembra_segundos': siembra, 'rutas': rutas})
+
+    if args.json:
+        with open(args.json, 'w') as salida:
+            json.dump(resultados, salida, indent=2, ensure_ascii=False)
+    if args.comparar:
+        with open(args.comparar) as archivo:
+            comparar(json.load(archivo), resultados)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+# benchmarks/bench_sesion.py
+# Latencia de páginas de admin con la caché de usuarios (usuarios.py) activa y sin ella
+# (USUARIOS_CACHE_TTL=0, un SELECT del usuario en cada solicitud), con el cliente de
+# pruebas de Flask sobre una flota sintética chica. Borra y siembra DATABASE_URL (por
+# defecto un SQLite temporal).
+#
+#   python benchmarks/bench_sesion.py
+#   DATABASE_URL=postgresql://localhost/bitacoras_bench python benchmarks/bench_sesion.py --repeticiones 500
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+_temporal = tempfile.mkdtemp(prefix='bench_sesion_')
+os.environ.setdefault('DATABASE_URL', 'sqlite:///' + os.path.join(_temporal, 'bench.db'))
+os.environ.setdefault('REPORTES_CACHE_DIR', os.path.join(_temporal, 'cache'))
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from app import app
+import flota_sintetica
+
+ADMIN = ('benchmark@ylb.gob.bo', 'bench')
+RUTAS = ['/reporte/cache', '/areas', '/vehiculos', '/api/series?periodo=mes']
+
+def _percentil(valores, p):
+    ordenados = sorted(valores)
+    indice = min(len(ordenados) - 1, max(0, round(p / 100 * (len(ordenados) - 1))))
+    return round(ordenados[indice], 3)
+
+def medir(cliente, ruta, repeticiones, consultas):
+    tiempos = []
+    total_sql = 0
+    for _ in range(repeticiones):
+        consultas[0] = 0
+        inicio = time.perf_counter()
+        respuesta = cliente.get(ruta)
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+        total_sql += consultas[0]
+        if respuesta.status_code != 200:
+            raise RuntimeError(f'{ruta}: {respuesta.status_code}')
+    return {'p50_ms': _percentil(tiempos, 50), 'p95_ms': _percentil(tiempos, 95),
+            'consultas_sql': round(total_sql / repeticiones, 2)}
+
+def main():
+    parser = argparse.ArgumentParser(description='Páginas de admin con y sin caché de usuarios.')
+    parser.add_argument('--bitacoras', type=int, default=5000)
+    parser.add_argument('--repeticiones', type=int, default=200)
+    parser.add_argument('--json', help='archivo donde guardar los resultados')
+    args = parser.parse_args()
+
+    with app.app_context():
+        flota_sintetica.vaciar()
+        flota_sintetica.sembrar(args.bitacoras, admin=ADMIN)
+    consultas = [0]
+
+    def contar(*_):
+        consultas[0] += 1
+    event.listen(Engine, 'before_cursor_execute', contar)
+
+    app.config['WTF_CSRF_ENABLED'] = False
+    cliente = app.test_client()
+    respuesta = cliente.post('/login', data={'email': ADMIN[0], 'password': ADMIN[1]})
+    if respuesta.status_code != 302:
+        raise RuntimeError('No se pudo iniciar sesión con el admin del benchmark')
+
+    resultados = {}
+    print(f"{'ruta':<28} {'caché':>6} {'p50 ms':>8} {'p95 ms':>8} {'SQL':>6}")
+    for ruta in RUTAS:
+        for nombre, ttl in (('no', 0), ('sí', 300)):
+            app.config['USUARIOS_CACHE_TTL'] = ttl
+            cliente.get(ruta)  # calienta la caché (y las demás del proceso)
+            medicion = medir(cliente, ruta, args.repeticiones, consultas)
+            resultados.setdefault(ruta, {})['con_cache' if ttl else 'sin_cache'] = medicion
+            print(f"{ruta:<28} {nombre:>6} {medicion['p50_ms']:>8} {medicion['p95_ms']:>8} "
+                  f"{medicion['consultas_sql']:>6}")
+    if args.json:
+        with open(args.json, 'w') as salida:
+            json.dump(resultados, salida, indent=2, ensure_ascii=False)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,131 @@
+# benchmarks/flota_sintetica.py
+# Flota sintética para los benchmarks: vehículos, áreas y años de bitácoras con
+# odómetros consistentes (cada viaje de un vehículo empieza donde terminó el anterior)
+# y cargas de combustible periódicas. Se inserta por lotes con executemany y al final
+# se reconstruye ResumenDiario, igual que en una base real.
+#
+#   DATABASE_URL=sqlite:////tmp/flota.db python benchmarks/flota_sintetica.py 100000
+#   DATABASE_URL=postgresql://localhost/bitacoras_bench python benchmarks/flota_sintetica.py 1000000 --anios 5
+import argparse
+import os
+import random
+import sys
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+MARCAS = [('Toyota', 'Hilux'), ('Nissan', 'Frontier'), ('Mitsubishi', 'L200'), ('Ford', 'Ranger'),
+          ('Volvo', 'FMX'), ('Mercedes-Benz', 'Actros')]
+AREAS = ['Planta Industrial', 'Pozas de Evaporación', 'Campamento', 'Laboratorio', 'Almacenes',
+         'Mantenimiento', 'Administración', 'Seguridad Industrial', 'Perforación', 'Transporte de Salmuera',
+         'Medio Ambiente', 'Oficina Central']
+ACTIVIDADES = [
+    'Traslado de personal a planta',
+    'Inspección de pozas de evaporación y toma de muestras de salmuera en el sector norte, '
+    'con retorno por el camino de servicio',
+    'Compra de repuestos',
+    'Mantenimiento preventivo programado del vehículo en taller central; se reporta ruido en la '
+    'suspensión delantera y desgaste de neumáticos, pendiente de revisión por el jefe de flota',
+    'Transporte de muestras al laboratorio',
+    'Recorrido de seguridad por el perímetro',
+]
+
+def vaciar():
+    from app import db
+    db.drop_all()
+    db.create_all()
+
+def _bitacoras(cantidad, vehiculo_ids, area_ids, anios, azar):
+    # Genera los viajes en orden cronológico, repartidos en horario laboral.
+    inicio = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0) - timedelta(days=365 * anios)
+    paso = timedelta(days=365 * anios) / max(cantidad, 1)
+    odometros = {vehiculo_id: round(azar.uniform(5000, 150000), 1) for vehiculo_id in vehiculo_ids}
+    rendimiento = {vehiculo_id: azar.uniform(6, 12) for vehiculo_id in vehiculo_ids}
+    sin_cargar = dict.fromkeys(vehiculo_ids, 0.0)
+    conductores = [f'Conductor {n}' for n in range(1, len(vehiculo_ids) * 2 + 1)]
+    for i in range(cantidad):
+        # Mismo orden que i, comprimido entre las 07:00 y las 18:00 de cada día
+        momento = inicio + paso * i
+        medianoche = momento.replace(hour=0, minute=0, second=0, microsecond=0)
+        fecha = medianoche + timedelta(hours=7) + (momento - medianoche) * 11 / 24
+        vehiculo_id = azar.choice(vehiculo_ids)
+        km_salida = odometros[vehiculo_id]
+        # Pocos viajes dejan un hueco en el odómetro (uso sin registrar)
+        if azar.random() < 0.01:
+            km_salida += round(azar.uniform(5, 80), 1)
+        recorrido = round(azar.lognormvariate(3.5, 0.7), 1) + 1
+        km_entrada = round(km_salida + recorrido, 1)
+        odometros[vehiculo_id] = km_entrada
+        sin_cargar[vehiculo_id] += recorrido
+        litros = 0
+        if sin_cargar[vehiculo_id] > 350 or azar.random() < 0.05:
+            litros = round(sin_cargar[vehiculo_id] / rendimiento[vehiculo_id] * azar.uniform(0.9, 1.1), 1)
+            sin_cargar[vehiculo_id] = 0.0
+        yield {
+            'nombre_conductor': azar.choice(conductores),
+            'vehiculo_id': vehiculo_id,
+            'area_id': azar.choice(area_ids),
+            'fecha_salida': fecha,
+            'kilometraje_salida': km_salida,
+            'fecha_entrada': fecha + timedelta(hours=azar.randint(1, 8)),
+            'kilometraje_entrada': km_entrada,
+            'descripcion_trabajo': azar.choice(ACTIVIDADES),
+            'litros_combustible': litros,
+        }
+
+def sembrar(cantidad, vehiculos=60, areas=12, anios=3, semilla=1, lote=5000, admin=('benchmark@ylb.gob.bo', 'bench')):
+    # Requiere contexto de aplicación. Devuelve los ids de vehículos y áreas creados.
+    from app import db, bcrypt
+    from models import User, Vehiculo, Area, Bitacora
+    import indices
+    import odometro
+    import resumen
+
+    azar = random.Random(semilla)
+    if admin and not User.query.filter_by(email=admin[0]).first():
+        db.session.add(User(username='bench', email=admin[0], role='admin',
+                            password=bcrypt.generate_password_hash(admin[1]).decode('utf-8')))
+    for n in range(1, vehiculos + 1):
+        marca, modelo = azar.choice(MARCAS)
+        db.session.add(Vehiculo(codigo=f'V-{n:04d}', codigo_interno=f'YLB-{n:04d}', nr_chasis=f'CH{n:010d}',
+                                placa=f'{n:04d}-ABC'[:10], marca=marca, modelo=modelo))
+    for n in range(areas):
+        db.session.add(Area(nombre=AREAS[n] if n < len(AREAS) else f'Área {n + 1}'))
+    db.session.commit()
+
+    vehiculo_ids = [fila[0] for fila in db.session.execute(db.select(Vehiculo.id)).all()]
+    area_ids = [fila[0] for fila in db.session.execute(db.select(Area.id)).all()]
+    tabla = Bitacora.__table__
+    pendientes = []
+    for fila in _bitacoras(cantidad, vehiculo_ids, area_ids, anios, azar):
+        pendientes.append(fila)
+        if len(pendientes) >= lote:
+            db.session.execute(tabla.insert(), pendientes)
+            db.session.commit()
+            pendientes = []
+    if pendientes:
+        db.session.execute(tabla.insert(), pendientes)
+        db.session.commit()
+    resumen.reconstruir()
+    odometro.reconstruir()
+    # Índices que falten y estadísticas del planificador (ANALYZE)
+    indices.crear()
+    return vehiculo_ids, area_ids
+
+def main():
+    parser = argparse.ArgumentParser(description='Siembra una flota sintética en DATABASE_URL (borra lo que haya).')
+    parser.add_argument('bitacoras', type=int)
+    parser.add_argument('--vehiculos', type=int, default=60)
+    parser.add_argument('--areas', type=int, default=12)
+    parser.add_argument('--anios', type=int, default=3)
+    parser.add_argument('--semilla', type=int, default=1)
+    args = parser.parse_args()
+
+    from app import app
+    with app.app_context():
+        vaciar()
+        sembrar(args.bitacoras, args.vehiculos, args.areas, args.anios, args.semilla)
+    print(f'{args.bitacoras} bitácoras sembradas en {app.config["SQLALCHEMY_DATABASE_URI"]}')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,137 @@
+# busqueda.py
+# Búsqueda de texto completo en Bitacora.descripcion_trabajo (filtro 'texto' de consultas.py).
+#  - SQLite: tabla FTS5 'bitacora_fts' de contenido externo (content=bitacora), sin
+#    acentos ni mayúsculas, y triggers que la mantienen al día en cada alta, edición y
+#    baja, también las que no pasan por el ORM (importacion.py, flota_sintetica.py).
+#    BitacoraArchivada (historico.py) tiene la suya, 'bitacora_archivada_fts', igual: una
+#    búsqueda encuentra y ordena lo mismo antes y después de archivar.
+#  - Postgres: índice GIN sobre to_tsvector('spanish', descripcion_trabajo), con raíces
+#    en español; la expresión se recalcula sola en cada escritura. El de
+#    bitacora_archivada se define en la tabla particionada y lo hereda cada partición.
+# Se crea con db.create_all() (tabla nueva) o con 'flask crear-indices' (BD existente).
+import re
+from sqlalchemy import select, event, text, and_, literal, func, table, column
+from app import db
+from models import Bitacora, BitacoraArchivada
+
+MAX_TEXTO = 200
+# Tabla FTS5 (SQLite) e índice GIN (Postgres) de cada tabla de bitácoras
+TABLAS_FTS = {Bitacora: 'bitacora_fts', BitacoraArchivada: 'bitacora_archivada_fts'}
+INDICES_POSTGRES = {Bitacora: 'ix_bitacora_descripcion_fts',
+                    BitacoraArchivada: 'ix_bitacora_archivada_descripcion_fts'}
+
+def _fts(modelo):
+    nombre = TABLAS_FTS[modelo]
+    return table(nombre, column('rowid'), column('rank'), column(nombre))
+
+# --- Texto buscado ---
+def terminos(texto):
+    return re.findall(r'\w+', texto.lower())
+
+def normalizar(texto):
+    # Lo que llega del formulario o de la URL. Devuelve None si no hay nada que buscar.
+    # Lanza ValueError si es demasiado largo.
+    texto = ' '.join((texto or '').split())
+    if len(texto) > MAX_TEXTO:
+        raise ValueError(f'La búsqueda admite hasta {MAX_TEXTO} caracteres.')
+    return texto if terminos(texto) else None
+
+def _consulta_fts5(texto):
+    # Todas las palabras, cada una como prefijo ("bomba"* también encuentra "bombas"):
+    # FTS5 no trae raíces en español. Entre comillas, para que nada de lo que escriba el
+    # usuario se interprete como sintaxis de FTS5.
+    return ' '.join(f'"{termino}"*' for termino in terminos(texto))
+
+def _vector(modelo=Bitacora):
+    return func.to_tsvector('spanish', modelo.descripcion_trabajo)
+
+def _tsquery(texto):
+    # Admite "frases entre comillas", OR y -palabra, como un buscador web.
+    return func.websearch_to_tsquery('spanish', texto)
+
+def _like(termino):
+    # Sin comodines: '_' (parte de \w) se busca literal
+    return '%' + termino.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+
+# --- Condiciones para las consultas ---
+# 'modelo' es Bitacora o BitacoraArchivada (historico.py).
+def condicion(texto, modelo=Bitacora):
+    # Filtro WHERE sobre 'modelo' (lo usa consultas.aplicar_filtros).
+    dialecto = db.engine.dialect.name
+    if dialecto == 'sqlite':
+        fts = _fts(modelo)
+        return modelo.id.in_(select(fts.c.rowid).where(fts.c[fts.name].match(_consulta_fts5(texto))))
+    if dialecto == 'postgresql':
+        return _vector(modelo).op('@@')(_tsquery(texto))
+    return and_(*[modelo.descripcion_trabajo.ilike(_like(termino), escape='\\') for termino in terminos(texto)])
+
+def relevancia(query, texto, modelo=Bitacora):
+    # Filtra 'query' (sobre 'modelo') por el texto y devuelve (query, puntaje), donde un
+    # puntaje menor es más relevante (bm25 en SQLite, -ts_rank en Postgres).
+    dialecto = db.engine.dialect.name
+    if dialecto == 'sqlite':
+        fts = _fts(modelo)
+        coincidencias = select(fts.c.rowid, fts.c.rank).where(
+            fts.c[fts.name].match(_consulta_fts5(texto))).subquery('coincidencias')
+        return query.join(coincidencias, coincidencias.c.rowid == modelo.id), coincidencias.c.rank
+    if dialecto == 'postgresql':
+        return query.filter(condicion(texto, modelo)), -func.ts_rank(_vector(modelo), _tsquery(texto))
+    return query.filter(condicion(texto, modelo)), literal(0.0)
+
+# --- Creación ---
+def sqlite_ddl(tabla, fts):
+    return [
+        f"CREATE VIRTUAL TABLE {fts} USING fts5(descripcion_trabajo, content='{tabla}', "
+        "content_rowid='id', tokenize='unicode61 remove_diacritics 2')",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_alta AFTER INSERT ON {tabla} BEGIN "
+        f"INSERT INTO {fts}(rowid, descripcion_trabajo) VALUES (new.id, new.descripcion_trabajo); END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_baja AFTER DELETE ON {tabla} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, descripcion_trabajo) "
+        "VALUES ('delete', old.id, old.descripcion_trabajo); END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_edicion AFTER UPDATE OF descripcion_trabajo ON {tabla} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, descripcion_trabajo) "
+        "VALUES ('delete', old.id, old.descripcion_trabajo); "
+        f"INSERT INTO {fts}(rowid, descripcion_trabajo) VALUES (new.id, new.descripcion_trabajo); END",
+    ]
+
+def _crear_sqlite(conexion, modelo):
+    tabla, fts = modelo.__tablename__, TABLAS_FTS[modelo]
+    inspector = db.inspect(conexion)
+    if inspector.has_table(fts) or not inspector.has_table(tabla):
+        return False
+    for sentencia in sqlite_ddl(tabla, fts):
+        conexion.exec_driver_sql(sentencia)
+    conexion.exec_driver_sql(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')")
+    return True
+
+def crear(conexion):
+    # Crea lo que falte y, si el índice es nuevo, lo llena con las bitácoras existentes.
+    # Devuelve True si creó alguno.
+    if conexion.dialect.name == 'sqlite':
+        creados = [_crear_sqlite(conexion, modelo) for modelo in TABLAS_FTS]
+        return any(creados)
+    if conexion.dialect.name == 'postgresql':
+        creados = [_crear_postgresql(conexion, modelo) for modelo in INDICES_POSTGRES]
+        return any(creados)
+    return False
+
+def _crear_postgresql(conexion, modelo):
+    tabla, indice = modelo.__tablename__, INDICES_POSTGRES[modelo]
+    if conexion.execute(text('SELECT to_regclass(:indice)'), {'indice': indice}).scalar() is not None \
+            or not db.inspect(conexion).has_table(tabla):
+        return False
+    conexion.execute(text(f"CREATE INDEX {indice} ON {tabla} "
+                          "USING gin (to_tsvector('spanish', descripcion_trabajo))"))
+    return True
+
+@event.listens_for(Bitacora.__table__, 'after_create')
+@event.listens_for(BitacoraArchivada.__table__, 'after_create')
+def _crear_con_la_tabla(tabla, conexion, **kwargs):
+    # Si quedó una tabla FTS de una tabla anterior (drop_all), se descarta: su
+    # contenido ya no corresponde.
+    modelo = Bitacora if tabla is Bitacora.__table__ else BitacoraArchivada
+    if conexion.dialect.name == 'sqlite':
+        conexion.exec_driver_sql(f'DROP TABLE IF EXISTS {TABLAS_FTS[modelo]}')
+        _crear_sqlite(conexion, modelo)
+    elif conexion.dialect.name == 'postgresql':
+        _crear_postgresql(conexion, modelo)
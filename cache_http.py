@@ -0,0 +1,226 @@
+# cache_http.py
+# Caché HTTP de las páginas de admin, compresión de respuestas y estáticos con huella.
+#  - Versión por tabla: cada commit que inserta, edita o borra filas de una tabla sube
+#    su marca en instance/versiones/<tabla> (única, no un contador), así todos
+#    los workers la ven. @condicional arma con esas marcas el ETag y el Last-Modified de
+#    la página y contesta 304 sin ejecutar la vista (sin consultar la BD) si nada cambió.
+#  - Compresión gzip (o brotli, si el paquete está instalado) de HTML, CSV y JSON, también
+#    de las exportaciones en streaming.
+#  - url_for('static', ...) agrega ?v=<hash del contenido>; esas URL se sirven con caché
+#    de un año (immutable), porque si el archivo cambia cambia también la URL.
+import gzip
+import hashlib
+import os
+import threading
+import time
+import zlib
+from datetime import datetime, timezone, date
+from functools import wraps
+from flask import request, session, g, make_response, message_flashed
+from flask_login import current_user
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from werkzeug.http import is_resource_modified
+from werkzeug.security import safe_join
+from app import app, db
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRIMIBLES = {'text/html', 'text/csv', 'text/plain', 'text/css', 'text/javascript',
+                'application/json', 'application/javascript', 'image/svg+xml'}
+
+# --- Versión por tabla ---
+# Las tablas escritas se anotan en la conexión; al confirmar pasan a este hilo y se
+# suben recién después del commit de la sesión. Subirlas antes dejaría una ventana en la
+# que otra solicitud lee la marca nueva con los datos viejos y los guarda como vigentes.
+_confirmadas = threading.local()
+
+def _ruta(tabla):
+    return os.path.join(app.instance_path, 'versiones', tabla)
+
+def subir(*tablas):
+    os.makedirs(os.path.join(app.instance_path, 'versiones'), exist_ok=True)
+    marca = f'{time.time_ns()}-{os.getpid()}'
+    # Temporal propio de este hilo: con gunicorn en hilos dos commits del mismo worker
+    # pueden subir la misma tabla a la vez.
+    sufijo = f'{os.getpid()}.{threading.get_ident()}.tmp'
+    for tabla in tablas:
+        ruta = _ruta(tabla)
+        with open(f'{ruta}.{sufijo}', 'w') as archivo:
+            archivo.write(marca)
+        os.replace(f'{ruta}.{sufijo}', ruta)
+    return marca
+
+def version(tabla):
+    try:
+        with open(_ruta(tabla)) as archivo:
+            return archivo.read()
+    except FileNotFoundError:
+        # Tabla sin cambios desde que existe el directorio: se marca ahora, para que un
+        # instance/ nuevo no repita marcas que ya vieron los navegadores.
+        return subir(tabla)
+
+def _fecha(marca):
+    return datetime.fromtimestamp(int(marca.split('-')[0]) // 1_000_000_000, timezone.utc)
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _anotar_escritura(conn, cursor, statement, parameters, context, executemany):
+    if context is None or context.compiled is None:
+        return
+    if not (context.isinsert or context.isupdate or context.isdelete):
+        return
+    tabla = getattr(context.compiled.statement, 'table', None)
+    if tabla is not None and hasattr(tabla, 'name'):
+        conn.info.setdefault('tablas_escritas', set()).add(tabla.name)
+
+@event.listens_for(Engine, 'commit')
+def _al_confirmar(conn):
+    tablas = conn.info.pop('tablas_escritas', None)
+    if tablas:
+        if not hasattr(_confirmadas, 'tablas'):
+            _confirmadas.tablas = set()
+        _confirmadas.tablas |= tablas
+
+@event.listens_for(Engine, 'rollback')
+def _al_deshacer(conn):
+    conn.info.pop('tablas_escritas', None)
+
+@event.listens_for(db.session, 'after_commit')
+def _subir_versiones(session):
+    tablas = getattr(_confirmadas, 'tablas', None)
+    if tablas:
+        _confirmadas.tablas = set()
+        subir(*tablas)
+
+# --- Páginas con ETag / Last-Modified ---
+def _etag(marcas):
+    # La página también depende del usuario, del token CSRF de sus formularios (que
+    # vence, WTF_CSRF_TIME_LIMIT) y del día (el panel muestra los viajes de hoy).
+    limite = app.config.get('WTF_CSRF_TIME_LIMIT') or 3600
+    partes = [request.full_path, current_user.get_id() or '', session.get('csrf_token', ''),
+              str(int(time.time() // (limite / 2))), date.today().isoformat()] + marcas
+    return hashlib.sha1('|'.join(partes).encode()).hexdigest()[:20]
+
+def condicional(*tablas):
+    # Para vistas que solo muestran datos de estas tablas. Va debajo de
+    # login_required/admin_required y encima de @replica.solo_lectura.
+    def decorador(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            # Con mensajes flash pendientes la página no es la misma que la guardada
+            if request.method != 'GET' or '_flashes' in session:
+                return f(*args, **kwargs)
+            marcas = [version(tabla) for tabla in tablas]
+            etag = _etag(marcas)
+            modificada = max(_fecha(marca) for marca in marcas)
+            if not is_resource_modified(request.environ, etag=etag, last_modified=modificada):
+                respuesta = app.response_class(status=304)
+            else:
+                respuesta = make_response(f(*args, **kwargs))
+                # Sin validadores si la vista mostró un flash o leyó de una réplica, que
+                # puede ir atrasada respecto de las marcas.
+                if respuesta.status_code != 200 or g.get('mensaje_flash') or g.get('usar_replica'):
+                    return respuesta
+            respuesta.set_etag(etag, weak=True)
+            respuesta.last_modified = modificada
+            respuesta.cache_control.private = True
+            respuesta.cache_control.no_cache = True
+            respuesta.vary.add('Cookie')
+            return respuesta
+        return decorated_function
+    return decorador
+
+def _mensaje_flash(sender, message, category, **kwargs):
+    g.mensaje_flash = True
+
+# --- Compresión ---
+def _codificacion():
+    if brotli is not None and request.accept_encodings['br']:
+        return 'br'
+    if request.accept_encodings['gzip']:
+        return 'gzip'
+    return None
+
+def _comprimir_en_flujo(partes, codificacion, nivel):
+    if codificacion == 'br':
+        compresor = brotli.Compressor(quality=nivel)
+        comprimir, terminar = compresor.process, compresor.finish
+    else:
+        compresor = zlib.compressobj(nivel, zlib.DEFLATED, 31)  # 31: formato gzip
+        comprimir, terminar = compresor.compress, compresor.flush
+    try:
+        for parte in partes:
+            bloque = comprimir(parte.encode() if isinstance(parte, str) else parte)
+            if bloque:
+                yield bloque
+        yield terminar()
+    finally:
+        # Si el cliente corta la descarga se cierra también el generador original
+        if hasattr(partes, 'close'):
+            partes.close()
+
+def _comprimir(respuesta):
+    if (respuesta.status_code != 200 or respuesta.direct_passthrough
+            or 'Content-Encoding' in respuesta.headers or respuesta.mimetype not in COMPRIMIBLES):
+        return respuesta
+    respuesta.vary.add('Accept-Encoding')
+    codificacion = _codificacion()
+    if codificacion is None:
+        return respuesta
+    nivel = app.config['HTTP_COMPRESION_NIVEL']
+    if respuesta.is_streamed:
+        respuesta.response = _comprimir_en_flujo(respuesta.response, codificacion, nivel)
+        respuesta.headers.pop('Content-Length', None)
+    else:
+        datos = respuesta.get_data()
+        if len(datos) < app.config['HTTP_COMPRESION_MIN_BYTES']:
+            return respuesta
+        if codificacion == 'br':
+            respuesta.set_data(brotli.compress(datos, quality=nivel))
+        else:
+            respuesta.set_data(gzip.compress(datos, compresslevel=nivel, mtime=0))
+    respuesta.headers['Content-Encoding'] = codificacion
+    return respuesta
+
+# --- Estáticos con huella ---
+_huellas = {}
+
+def huella(nombre):
+    # Hash del contenido, recalculado solo si cambia la fecha de modificación del archivo.
+    ruta = safe_join(app.static_folder, nombre)
+    try:
+        modificado = os.stat(ruta).st_mtime_ns
+    except (OSError, TypeError):
+        return None
+    guardada = _huellas.get(nombre)
+    if guardada and guardada[0] == modificado:
+        return guardada[1]
+    with open(ruta, 'rb') as archivo:
+        valor = hashlib.sha256(archivo.read()).hexdigest()[:12]
+    _huellas[nombre] = (modificado, valor)
+    return valor
+
+def _url_estatica(endpoint, valores):
+    if endpoint == 'static' and 'filename' in valores and 'v' not in valores:
+        valor = huella(valores['filename'])
+        if valor:
+            valores['v'] = valor
+
+def _despues_de_responder(respuesta):
+    if request.endpoint == 'static' and respuesta.status_code in (200, 304):
+        if request.args.get('v') and request.args.get('v') == huella(request.view_args['filename']):
+            respuesta.cache_control.no_cache = None
+            respuesta.cache_control.public = True
+            respuesta.cache_control.max_age = app.config['ESTATICOS_MAX_AGE']
+            respuesta.cache_control.immutable = True
+        return respuesta
+    return _comprimir(respuesta)
+
+def instalar(app):
+    # La llama app.py.
+    app.url_defaults(_url_estatica)
+    app.after_request(_despues_de_responder)
+    message_flashed.connect(_mensaje_flash, app)
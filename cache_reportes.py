@@ -0,0 +1,167 @@
+# cache_reportes.py
+# Caché en disco de los PDF de /reporte/pdf, direccionada por contenido: el nombre del
+# archivo es el hash de los filtros normalizados. Cada entrada guarda a su lado (.json)
+# los filtros que cubre, para borrar solo los PDF afectados cuando se crea, edita o
+# elimina una bitácora. El tamaño total se limita desalojando las menos usadas (LRU).
+# El PDF también imprime placas y nombres de área: la clave lleva la versión de los
+# catálogos (catalogos.py), así un cambio de nombre deja de usar los viejos.
+import hashlib
+import json
+import os
+import threading
+from datetime import datetime
+from app import app
+from consultas import parametros_url
+import catalogos
+
+# Subir este número cuando cambie el diseño del PDF: invalida todo lo anterior.
+VERSION_FORMATO = 3
+
+# Contadores de este proceso (cada worker de gunicorn lleva los suyos)
+contadores = {'aciertos': 0, 'fallos': 0, 'guardados': 0, 'invalidados': 0, 'desalojados': 0}
+_candado = threading.Lock()
+
+def directorio_cache():
+    directorio = app.config['REPORTES_CACHE_DIR'] or os.path.join(app.instance_path, 'cache_reportes')
+    os.makedirs(directorio, exist_ok=True)
+    return directorio
+
+def _version_catalogos():
+    return list(catalogos.version())
+
+def clave(filtros):
+    normalizados = json.dumps([VERSION_FORMATO, _version_catalogos(), parametros_url(filtros)], sort_keys=True)
+    return hashlib.sha256(normalizados.encode('utf-8')).hexdigest()
+
+def _contar(nombre):
+    with _candado:
+        contadores[nombre] += 1
+
+# --- Versión de datos ---
+# Contador en disco que sube con cada invalidación. Quien genera un PDF lee la generación
+# (contador y versiones de los catálogos) antes de consultar y no guarda el resultado si
+# cambió mientras tanto: el PDF podría estar viejo, o quedar bajo una clave que no es la suya.
+def _ruta_generacion():
+    return os.path.join(directorio_cache(), 'generacion')
+
+def generacion():
+    return [_contador()] + _version_catalogos()
+
+def _contador():
+    try:
+        with open(_ruta_generacion()) as archivo:
+            return int(archivo.read() or 0)
+    except (OSError, ValueError):
+        return 0
+
+def _subir_generacion():
+    with _candado:
+        ruta = _ruta_generacion()
+        # El candado es del proceso: otro worker puede estar escribiendo a la vez.
+        temporal = f'{ruta}.{os.getpid()}.tmp'
+        with open(temporal, 'w') as archivo:
+            archivo.write(str(_contador() + 1))
+        os.replace(temporal, ruta)
+
+# --- Lectura / escritura ---
+def obtener(filtros):
+    ruta = os.path.join(directorio_cache(), clave(filtros) + '.pdf')
+    try:
+        with open(ruta, 'rb') as archivo:
+            contenido = archivo.read()
+        # La fecha de modificación marca el último uso (orden LRU).
+        os.utime(ruta)
+    except OSError:
+        _contar('fallos')
+        return None
+    _contar('aciertos')
+    return contenido
+
+def guardar(filtros, contenido, generacion_inicial):
+    if generacion() != generacion_inicial:
+        return
+    base = os.path.join(directorio_cache(), clave(filtros))
+    # Temporales propios: otro worker u otro hilo puede estar guardando el mismo reporte.
+    sufijo = f'.{os.getpid()}.{threading.get_ident()}.tmp'
+    with open(base + '.json' + sufijo, 'w') as archivo:
+        json.dump({'filtros': parametros_url(filtros), 'creado': datetime.utcnow().isoformat()}, archivo)
+    with open(base + '.pdf' + sufijo, 'wb') as archivo:
+        archivo.write(contenido)
+    os.replace(base + '.json' + sufijo, base + '.json')
+    os.replace(base + '.pdf' + sufijo, base + '.pdf')
+    if generacion() != generacion_inicial:
+        # Una invalidación entró entre el control de arriba y la publicación, quizás
+        # después de revisar esta entrada: se retira.
+        _borrar(base + '.pdf')
+        return
+    _contar('guardados')
+    _podar()
+
+def _entradas():
+    directorio = directorio_cache()
+    for nombre in os.listdir(directorio):
+        if nombre.endswith('.pdf'):
+            ruta = os.path.join(directorio, nombre)
+            try:
+                info = os.stat(ruta)
+            except OSError:
+                continue
+            yield ruta, info.st_size, info.st_mtime
+
+def _borrar(ruta_pdf):
+    for ruta in (ruta_pdf, ruta_pdf[:-len('.pdf')] + '.json'):
+        try:
+            os.remove(ruta)
+        except OSError:
+            pass
+
+def _podar():
+    limite = app.config['REPORTES_CACHE_MAX_MB'] * 1024 * 1024
+    entradas = sorted(_entradas(), key=lambda entrada: entrada[2])
+    total = sum(tamano for _, tamano, _ in entradas)
+    for ruta, tamano, _ in entradas:
+        if total <= limite:
+            break
+        _borrar(ruta)
+        total -= tamano
+        _contar('desalojados')
+
+# --- Invalidación ---
+def _cubre(filtros, fecha, vehiculo_id, area_id):
+    dia = fecha.strftime('%Y-%m-%d')
+    if filtros.get('fecha_inicio') and dia < filtros['fecha_inicio']:
+        return False
+    if filtros.get('fecha_fin') and dia > filtros['fecha_fin']:
+        return False
+    if filtros.get('vehiculo_id') and int(filtros['vehiculo_id']) != vehiculo_id:
+        return False
+    if filtros.get('area_id') and int(filtros['area_id']) != area_id:
+        return False
+    return True
+
+def invalidar(*bitacoras):
+    # Cada bitácora es una tupla (fecha_salida, vehiculo_id, area_id); al editar se
+    # pasan los valores anteriores y los nuevos.
+    _subir_generacion()
+    directorio = directorio_cache()
+    for nombre in os.listdir(directorio):
+        if not nombre.endswith('.json'):
+            continue
+        ruta = os.path.join(directorio, nombre)
+        try:
+            with open(ruta) as archivo:
+                filtros = json.load(archivo)['filtros']
+        except (OSError, ValueError, KeyError):
+            continue
+        if any(_cubre(filtros, *bitacora) for bitacora in bitacoras):
+            _borrar(ruta[:-len('.json')] + '.pdf')
+            _contar('invalidados')
+
+def estado():
+    entradas = list(_entradas())
+    return dict(contadores,
+                pid=os.getpid(),
+                entradas=len(entradas),
+                tamano_mb=round(sum(tamano for _, tamano, _ in entradas) / (1024 * 1024), 2),
+                limite_mb=app.config['REPORTES_CACHE_MAX_MB'],
+                generacion=_contador())
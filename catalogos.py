@@ -0,0 +1,52 @@
+# catalogos.py
+# Caché en memoria de los vehículos y áreas que llenan los selects del kiosko y de
+# reportes. Se guardan tuplas livianas (no objetos ORM) y se recargan solo cuando cambia
+# la versión de las tablas vehiculo o area (cache_http.py), que sube sola con cada
+# commit que las escribe: así todos los workers de gunicorn se enteran del cambio sin
+# consultar la BD en cada formulario.
+import threading
+from collections import namedtuple
+from app import db
+from models import Vehiculo, Area
+import cache_http
+
+VehiculoRef = namedtuple('VehiculoRef', 'id placa')
+AreaRef = namedtuple('AreaRef', 'id nombre')
+
+# (versión con la que se cargó, vehículos, áreas); se reemplaza entera al recargar
+_cache = (None, (), ())
+_candado = threading.Lock()
+
+def version():
+    return (cache_http.version('vehiculo'), cache_http.version('area'))
+
+def _cargar():
+    global _cache
+    actual = version()
+    if _cache[0] == actual:
+        return _cache
+    with _candado:
+        if _cache[0] != actual:
+            # La versión se lee antes de consultar: si cambia durante la carga, la
+            # próxima llamada vuelve a recargar. Siempre de la principal: una réplica
+            # atrasada dejaría la lista vieja en caché hasta el próximo cambio.
+            principal = {'bind': db.engine}
+            vehiculos = tuple(VehiculoRef(*fila) for fila in db.session.execute(
+                db.select(Vehiculo.id, Vehiculo.placa).order_by(Vehiculo.placa), bind_arguments=principal))
+            areas = tuple(AreaRef(*fila) for fila in db.session.execute(
+                db.select(Area.id, Area.nombre).order_by(Area.nombre), bind_arguments=principal))
+            _cache = (actual, vehiculos, areas)
+        return _cache
+
+def vehiculos():
+    return _cargar()[1]
+
+def areas():
+    return _cargar()[2]
+
+# --- Opciones para los SelectField de forms.py ---
+def opciones_vehiculos():
+    return [(vehiculo.id, vehiculo.placa) for vehiculo in vehiculos()]
+
+def opciones_areas():
+    return [(area.id, area.nombre) for area in areas()]
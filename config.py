@@ -1,6 +1,36 @@
 # config.py
 import os
 
+# --- Pool de conexiones (Postgres) ---
+# Un pool por proceso: con gunicorn en hilos (GUNICORN_THREADS, ver gunicorn.conf.py)
+# DB_POOL_SIZE + DB_MAX_OVERFLOW debe alcanzar para todos los hilos de un worker, y
+# workers x (DB_POOL_SIZE + DB_MAX_OVERFLOW) no debe pasar el límite de conexiones de la
+# base. pre_ping y recycle evitan usar conexiones que el servidor ya cortó por
+# inactividad (frecuente en Postgres administrado).
+# DB_STATEMENT_TIMEOUT_MS corta en el servidor cualquier consulta más larga (0 = sin
+# límite); detrás de un pgbouncer en modo transacción hay que dejarlo en 0 y
+# configurarlo en el rol de la base.
+# SQLite (desarrollo): cada transacción que escribe empieza con BEGIN IMMEDIATE y toma
+# la base de entrada. Con BEGIN a secas dos escrituras simultáneas (gunicorn en hilos)
+# pueden trabarse al pasar de lectura a escritura, y SQLite corta una con 'database is
+# locked' sin esperar; así la segunda espera su turno (hasta 'timeout' segundos).
+def opciones_pool(url):
+    if url.startswith('sqlite'):
+        return {'connect_args': {'isolation_level': 'IMMEDIATE', 'timeout': 30}}
+    if not url.startswith('postgresql'):
+        return {}
+    opciones = {
+        'pool_size': int(os.environ.get('DB_POOL_SIZE', 5)),
+        'max_overflow': int(os.environ.get('DB_MAX_OVERFLOW', 5)),
+        'pool_timeout': int(os.environ.get('DB_POOL_TIMEOUT', 10)),
+        'pool_recycle': int(os.environ.get('DB_POOL_RECYCLE', 300)),
+        'pool_pre_ping': os.environ.get('DB_POOL_PRE_PING', '1').lower() not in ('0', 'false', 'no'),
+    }
+    timeout = int(os.environ.get('DB_STATEMENT_TIMEOUT_MS', 0))
+    if timeout:
+        opciones['connect_args'] = {'options': f'-c statement_timeout={timeout}'}
+    return opciones
+
 class Config:
     # Busca la clave en el sistema, si no hay, usa una por defecto
     SECRET_KEY = os.environ.get('SECRET_KEY') or 'clave_super_secreta_por_defecto'
@@ -13,4 +43,106 @@ class Config:
         uri = uri.replace("postgres://", "postgresql://", 1)
         
     SQLALCHEMY_DATABASE_URI = uri or 'sqlite:///site.db'
-    SQLALCHEMY_TRACK_MODIFICATIONS = False
\ No newline at end of file
+    SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+    # Pool de conexiones: ver opciones_pool() más arriba
+    SQLALCHEMY_ENGINE_OPTIONS = opciones_pool(SQLALCHEMY_DATABASE_URI)
+
+    # --- Réplica de lectura opcional (replica.py) ---
+    # Reportes, exportaciones, panel y listados leen de aquí; las escrituras van siempre a la principal.
+    replica = os.environ.get('DATABASE_REPLICA_URL')
+    if replica and replica.startswith("postgres://"):
+        replica = replica.replace("postgres://", "postgresql://", 1)
+    SQLALCHEMY_BINDS = {'replica': dict(opciones_pool(replica), url=replica, pool_pre_ping=True)} if replica else {}
+    # Segundos que quien acaba de escribir sigue leyendo de la principal (retraso de la réplica)
+    REPLICA_RETRASO_MAX = int(os.environ.get('REPLICA_RETRASO_MAX', 5))
+    # Segundos sin usar la réplica después de una falla de conexión
+    REPLICA_REINTENTO = int(os.environ.get('REPLICA_REINTENTO', 30))
+
+    # --- Kiosko: commit agrupado de altas simultáneas (registro_agrupado.py) ---
+    # Solo sirve con gunicorn en hilos (GUNICORN_THREADS > 1)
+    KIOSKO_COMMIT_AGRUPADO = os.environ.get('KIOSKO_COMMIT_AGRUPADO', '').lower() in ('1', 'true', 'si', 'sí')
+    # Milisegundos que el primero espera a que se sumen otros, y altas por transacción
+    KIOSKO_AGRUPAR_MS = int(os.environ.get('KIOSKO_AGRUPAR_MS', 10))
+    KIOSKO_LOTE_MAX = int(os.environ.get('KIOSKO_LOTE_MAX', 100))
+
+    # --- Reportes ---
+    # Filas por página en /reportes (paginación por cursor) y tope para ?por_pagina=
+    REPORTES_POR_PAGINA = int(os.environ.get('REPORTES_POR_PAGINA', 50))
+    REPORTES_MAX_POR_PAGINA = 500
+    # Segundos que se reutiliza el conteo total de registros por combinación de filtros
+    REPORTES_CONTEO_TTL = int(os.environ.get('REPORTES_CONTEO_TTL', 60))
+    # Segundos que se reutiliza cada serie de /api/series por combinación de filtros (series.py)
+    SERIES_TTL = int(os.environ.get('SERIES_TTL', 30))
+
+    # --- PDF en segundo plano (trabajos.py) ---
+    # Carpeta de los PDF generados (por defecto instance/reportes)
+    REPORTES_DIR = os.environ.get('REPORTES_DIR')
+    # Procesos que renderizan PDF a la vez, y trabajos pendientes admitidos como máximo
+    REPORTES_MAX_RENDERS = int(os.environ.get('REPORTES_MAX_RENDERS', 2))
+    REPORTES_MAX_EN_COLA = int(os.environ.get('REPORTES_MAX_EN_COLA', 10))
+    # Horas que se conservan los trabajos y sus archivos antes de limpiarlos
+    REPORTES_RETENCION_HORAS = int(os.environ.get('REPORTES_RETENCION_HORAS', 24))
+    # Minutos tras los que un trabajo que sigue pendiente o en proceso se da por perdido
+    # (su worker o su proceso hijo murió) y pasa a 'error'
+    REPORTES_TIEMPO_MAX_MIN = int(os.environ.get('REPORTES_TIEMPO_MAX_MIN', 30))
+
+    # --- Caché de PDF (cache_reportes.py) ---
+    REPORTES_CACHE_DIR = os.environ.get('REPORTES_CACHE_DIR')
+    REPORTES_CACHE_MAX_MB = int(os.environ.get('REPORTES_CACHE_MAX_MB', 200))
+
+    # --- Fuente de los PDF (pdf_plantilla.py) ---
+    # TTF con Unicode para el cuerpo y la negrita; si falta alguno se usa Helvetica (solo latin-1)
+    PDF_FUENTE = os.environ.get('PDF_FUENTE', '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf')
+    PDF_FUENTE_NEGRITA = os.environ.get('PDF_FUENTE_NEGRITA', '/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf')
+
+    # --- Paquetes ZIP con un PDF por vehículo/área (paquetes.py) ---
+    # Procesos que renderizan en paralelo (por defecto, uno por núcleo)
+    REPORTES_PAQUETE_PROCESOS = int(os.environ.get('REPORTES_PAQUETE_PROCESOS', os.cpu_count() or 1))
+
+    # --- Importación masiva de bitácoras (importacion.py) ---
+    # Filas por INSERT (executemany) y transacción, y tope de filas por archivo
+    IMPORTACION_LOTE = int(os.environ.get('IMPORTACION_LOTE', 500))
+    IMPORTACION_MAX_FILAS = int(os.environ.get('IMPORTACION_MAX_FILAS', 20000))
+
+    # --- Archivo de meses cerrados (historico.py, 'flask archivar-bitacoras') ---
+    # Meses que se quedan en bitacora, contando el actual
+    ARCHIVO_MESES_ACTIVOS = int(os.environ.get('ARCHIVO_MESES_ACTIVOS', 12))
+    # Postgres: tablespace de las particiones archivadas (por defecto, el de la base)
+    ARCHIVO_TABLESPACE = os.environ.get('ARCHIVO_TABLESPACE')
+
+    # --- Novedades en vivo del panel y /reportes (novedades.py, /api/novedades) ---
+    # Cada conexión abierta ocupa un hilo de su worker mientras espera: como mucho estas
+    # por worker (por defecto la mitad de GUNICORN_THREADS); las demás reciben 503 y el
+    # navegador reintenta más tarde
+    NOVEDADES_MAX_CONEXIONES = int(os.environ.get('NOVEDADES_MAX_CONEXIONES',
+                                                  max(1, int(os.environ.get('GUNICORN_THREADS', 4)) // 2)))
+    # Segundos que dura cada conexión antes de que el navegador vuelva a conectar
+    NOVEDADES_DURACION = int(os.environ.get('NOVEDADES_DURACION', 300))
+    # Milisegundos entre revisiones de los cambios hechos en otros workers
+    NOVEDADES_INTERVALO_MS = int(os.environ.get('NOVEDADES_INTERVALO_MS', 1000))
+    # Horas que se guardan los eventos en la BD
+    NOVEDADES_RETENCION_HORAS = int(os.environ.get('NOVEDADES_RETENCION_HORAS', 24))
+
+    # --- Métricas por endpoint en /metrics (metricas.py) ---
+    METRICAS_ACTIVAS = os.environ.get('METRICAS_ACTIVAS', '').lower() in ('1', 'true', 'si', 'sí')
+    # Carpeta donde cada proceso vuelca sus números (por defecto instance/metricas)
+    METRICAS_DIR = os.environ.get('METRICAS_DIR')
+    # Si se define, /metrics exige 'Authorization: Bearer <token>' (si no, sesión de admin)
+    METRICAS_TOKEN = os.environ.get('METRICAS_TOKEN')
+    # Solicitudes que tardan al menos estos ms se registran en el log (0 = desactivado)
+    METRICAS_LENTO_MS = int(os.environ.get('METRICAS_LENTO_MS', 0))
+
+    # --- Usuarios con sesión en caché (usuarios.py) ---
+    # Segundos que cada proceso reutiliza los datos de un usuario sin consultar la BD
+    # (0 = consultar en cada solicitud) y cuántos usuarios guarda como máximo
+    USUARIOS_CACHE_TTL = int(os.environ.get('USUARIOS_CACHE_TTL', 300))
+    USUARIOS_CACHE_MAX = int(os.environ.get('USUARIOS_CACHE_MAX', 256))
+
+    # --- Caché HTTP y compresión (cache_http.py) ---
+    # Respuestas más chicas que esto se envían sin comprimir
+    HTTP_COMPRESION_MIN_BYTES = int(os.environ.get('HTTP_COMPRESION_MIN_BYTES', 1024))
+    # Nivel de gzip (1-9) o calidad de brotli (0-11)
+    HTTP_COMPRESION_NIVEL = int(os.environ.get('HTTP_COMPRESION_NIVEL', 6))
+    # Segundos de caché de los estáticos pedidos con su huella (?v=...)
+    ESTATICOS_MAX_AGE = int(os.environ.get('ESTATICOS_MAX_AGE', 365 * 24 * 3600))
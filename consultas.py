@@ -0,0 +1,243 @@
+# consultas.py
+# Filtros y consultas compartidas por las vistas de reportes (/reportes, /reporte/pdf).
+# Si el rango de fechas llega a meses archivados (historico.py) se lee también
+# BitacoraArchivada y las filas de las dos tablas se intercalan en el mismo orden.
+from app import db
+from models import Bitacora, Vehiculo, Area
+from sqlalchemy import select, func, or_, and_, text
+from sqlalchemy.orm import joinedload
+from collections import namedtuple
+from datetime import datetime, time
+import heapq
+import math
+import time as reloj
+import busqueda
+import cache_http
+import historico
+
+FILTROS_VACIOS = {'fecha_inicio': None, 'fecha_fin': None, 'vehiculo_id': None, 'area_id': None, 'texto': None}
+
+Pagina = namedtuple('Pagina', ['bitacoras', 'siguiente', 'anterior'])
+
+# --- Filtros ---
+def leer_filtros(fuente):
+    # Convierte los parámetros de la URL (strings) en un diccionario normalizado.
+    # Lanza ValueError si alguna fecha o id no es válido, o si el texto es demasiado largo.
+    filtros = dict(FILTROS_VACIOS)
+    if fuente.get('fecha_inicio'):
+        filtros['fecha_inicio'] = datetime.strptime(fuente.get('fecha_inicio'), '%Y-%m-%d').date()
+    if fuente.get('fecha_fin'):
+        filtros['fecha_fin'] = datetime.strptime(fuente.get('fecha_fin'), '%Y-%m-%d').date()
+    if fuente.get('vehiculo_id'):
+        filtros['vehiculo_id'] = int(fuente.get('vehiculo_id'))
+    if fuente.get('area_id'):
+        filtros['area_id'] = int(fuente.get('area_id'))
+    if fuente.get('texto'):
+        filtros['texto'] = busqueda.normalizar(fuente.get('texto'))
+    return filtros
+
+def parametros_url(filtros):
+    # Inverso de leer_filtros: solo los filtros activos, listos para url_for().
+    parametros = {}
+    for clave, valor in filtros.items():
+        if valor is None:
+            continue
+        parametros[clave] = valor.strftime('%Y-%m-%d') if hasattr(valor, 'strftime') else str(valor)
+    return parametros
+
+def aplicar_filtros(query, filtros, modelo=Bitacora):
+    # 'modelo': Bitacora o BitacoraArchivada, la tabla sobre la que se arma 'query'
+    if filtros['fecha_inicio']:
+        query = query.filter(modelo.fecha_salida >= datetime.combine(filtros['fecha_inicio'], time.min))
+    if filtros['fecha_fin']:
+        query = query.filter(modelo.fecha_salida <= datetime.combine(filtros['fecha_fin'], time.max))
+    if filtros['vehiculo_id']:
+        query = query.filter(modelo.vehiculo_id == filtros['vehiculo_id'])
+    if filtros['area_id']:
+        query = query.filter(modelo.area_id == filtros['area_id'])
+    if filtros['texto']:
+        query = query.filter(busqueda.condicion(filtros['texto'], modelo))
+    return query
+
+# --- Filas planas para exportaciones ---
+# Columnas ya unidas con la placa y el área en SQL: sin objetos ORM ni consultas por fila.
+def consulta_filas(filtros, modelo=Bitacora):
+    consulta = select(
+        modelo.id,
+        modelo.fecha_salida,
+        modelo.nombre_conductor,
+        Vehiculo.placa,
+        modelo.kilometraje_salida,
+        modelo.kilometraje_entrada,
+        modelo.litros_combustible,
+        modelo.descripcion_trabajo,
+        Area.nombre.label('area')
+    ).join(Vehiculo, modelo.vehiculo_id == Vehiculo.id).join(Area, modelo.area_id == Area.id)
+    return aplicar_filtros(consulta, filtros, modelo).order_by(modelo.fecha_salida.asc(), modelo.id.asc())
+
+def _orden_fila(fila):
+    return fila.fecha_salida, fila.id
+
+def filas_reporte(filtros, lote=1000):
+    # yield_per activa cursores del lado del servidor (stream_results): la memoria no crece con el total.
+    resultados = [db.session.execute(consulta_filas(filtros, modelo).execution_options(yield_per=lote))
+                  for modelo in historico.modelos(filtros)]
+    if len(resultados) == 1:
+        return resultados[0]
+    return heapq.merge(*resultados, key=_orden_fila)
+
+def filas_por_lotes(filtros, lote=1000, liberar=False):
+    lotes = [_lotes(filtros, modelo, lote, liberar) for modelo in historico.modelos(filtros)]
+    if len(lotes) == 1:
+        return lotes[0]
+    return heapq.merge(*lotes, key=_orden_fila)
+
+def _lotes(filtros, modelo, lote, liberar):
+    # Igual que filas_reporte pero en consultas cortas por cursor (fecha_salida, id):
+    # entre un lote y otro no queda ninguna lectura abierta, así quien consume las filas
+    # puede escribir en la BD (p. ej. el avance de un trabajo) sin bloquear SQLite.
+    # Con liberar=True además se cierra la sesión después de cada lote: la conexión vuelve
+    # al pool mientras se procesan las filas (p. ej. mientras se dibuja el PDF) y la usan
+    # otros hilos del worker. Las filas son tuplas, no objetos ORM, así que no se pierde nada.
+    ultima = None
+    while True:
+        consulta = consulta_filas(filtros, modelo)
+        if ultima is not None:
+            consulta = consulta.filter(or_(modelo.fecha_salida > ultima.fecha_salida,
+                                           and_(modelo.fecha_salida == ultima.fecha_salida,
+                                                modelo.id > ultima.id)))
+        filas = db.session.execute(consulta.limit(lote)).all()
+        if liberar:
+            db.session.close()
+        yield from filas
+        if len(filas) < lote:
+            return
+        ultima = filas[-1]
+
+# --- Paginación por cursor (keyset) ---
+# Sin búsqueda de texto el orden es (fecha_salida, id), más recientes primero; con
+# búsqueda, (puntaje, id), más relevantes primero. El cursor es "<valor>_<id>" de la
+# última (o primera) fila mostrada, así el costo de cada página no depende de cuántas
+# páginas haya antes.
+def codificar_cursor(valor, bitacora_id):
+    return f"{valor.isoformat() if hasattr(valor, 'isoformat') else repr(valor)}_{bitacora_id}"
+
+def decodificar_cursor(cursor, convertir):
+    # Lanza ValueError si el cursor no es uno de codificar_cursor (viene de la URL: puede
+    # llegar cortado o editado a mano).
+    valor, _, bitacora_id = cursor.rpartition('_')
+    try:
+        valor, bitacora_id = convertir(valor), int(bitacora_id)
+    except (TypeError, OverflowError) as e:
+        raise ValueError(f'Cursor no válido: {cursor!r}') from e
+    if isinstance(valor, float) and not math.isfinite(valor):
+        raise ValueError(f'Cursor no válido: {cursor!r}')
+    return valor, bitacora_id
+
+def _convertir(filtros):
+    # Tipo del valor del cursor: puntaje con búsqueda de texto, fecha sin ella
+    return float if filtros['texto'] else datetime.fromisoformat
+
+def validar_cursor(filtros, cursor):
+    # Para las vistas, antes de consultar. Lanza ValueError si no sirve con estos filtros.
+    if cursor:
+        decodificar_cursor(cursor, _convertir(filtros))
+
+def _descendente(filtros, hacia_atras):
+    # Hacia atrás se recorre en el orden inverso al de la página.
+    return (not filtros['texto']) != hacia_atras
+
+def consulta_pagina(filtros, cursor=None, hacia_atras=False, modelo=Bitacora):
+    # Filas (Bitacora o BitacoraArchivada, valor de la clave de orden).
+    if filtros['texto']:
+        # relevancia() ya filtra por el texto
+        query, clave = busqueda.relevancia(aplicar_filtros(modelo.query, dict(filtros, texto=None), modelo),
+                                           filtros['texto'], modelo)
+    else:
+        query = aplicar_filtros(modelo.query, filtros, modelo)
+        clave = modelo.fecha_salida
+    query = query.add_columns(clave).options(
+        joinedload(modelo.vehiculo_usado),
+        joinedload(modelo.area_asignada)
+    )
+    descendente = _descendente(filtros, hacia_atras)
+    if cursor:
+        valor, bitacora_id = decodificar_cursor(cursor, _convertir(filtros))
+        if descendente:
+            query = query.filter(or_(clave < valor, and_(clave == valor, modelo.id < bitacora_id)))
+        else:
+            query = query.filter(or_(clave > valor, and_(clave == valor, modelo.id > bitacora_id)))
+
+    if descendente:
+        return query.order_by(clave.desc(), modelo.id.desc())
+    return query.order_by(clave.asc(), modelo.id.asc())
+
+def pagina_bitacoras(filtros, despues=None, antes=None, por_pagina=50):
+    hacia_atras = bool(antes) and not despues
+    cursor = antes if hacia_atras else despues
+    # Pedimos una fila extra solo para saber si existe otra página. Con archivo, cada
+    # tabla da su página con el mismo cursor y se queda la mejor mitad de las dos.
+    filas = []
+    for modelo in historico.modelos(filtros):
+        filas += consulta_pagina(filtros, cursor, hacia_atras, modelo).limit(por_pagina + 1).all()
+    filas.sort(key=lambda fila: (fila[1], fila[0].id), reverse=_descendente(filtros, hacia_atras))
+    filas = filas[:por_pagina + 1]
+    hay_mas = len(filas) > por_pagina
+    filas = filas[:por_pagina]
+    if hacia_atras:
+        filas.reverse()
+
+    if not filas:
+        return Pagina([], None, None)
+    primera = codificar_cursor(filas[0][1], filas[0][0].id)
+    ultima = codificar_cursor(filas[-1][1], filas[-1][0].id)
+    if hacia_atras:
+        anterior = primera if hay_mas else None
+        siguiente = ultima
+    else:
+        anterior = primera if cursor else None
+        siguiente = ultima if hay_mas else None
+    return Pagina([fila[0] for fila in filas], siguiente, anterior)
+
+# --- Conteo total aproximado (con caché por filtros) ---
+# La clave lleva las versiones de las tablas contadas (cache_http.py): /reportes arma su
+# ETag con ellas, y un total de antes de un alta quedaría guardado con el ETag nuevo.
+_conteos = {}
+MAX_CONTEOS_EN_CACHE = 256
+TABLAS_CONTEO = ('bitacora', 'bitacora_archivada', 'mes_archivado')
+
+def contar_bitacoras(filtros, ttl=60):
+    clave = (tuple(sorted(filtros.items())), tuple(cache_http.version(tabla) for tabla in TABLAS_CONTEO))
+    ahora = reloj.monotonic()
+    en_cache = _conteos.get(clave)
+    if en_cache and ahora - en_cache[1] < ttl:
+        return en_cache[0]
+
+    total = None
+    if filtros == FILTROS_VACIOS and db.engine.dialect.name == 'postgresql':
+        # Sin filtros, en Postgres la estimación del planificador basta y no recorre la tabla.
+        total = db.session.execute(
+            text("SELECT reltuples::bigint FROM pg_class WHERE relname = 'bitacora'")
+        ).scalar()
+        if total is not None and total < 0:
+            total = None
+        elif total is not None:
+            total += historico.total_archivado()
+    if total is None:
+        total = contar_filas(filtros)
+
+    if len(_conteos) >= MAX_CONTEOS_EN_CACHE:
+        _conteos.clear()
+    _conteos[clave] = (total, ahora)
+    return total
+
+def contar_filas(filtros):
+    # Conteo exacto, con las archivadas si el rango llega al archivo. Sin filtros, las
+    # archivadas se toman del registro de meses (MesArchivado) sin recorrer la tabla.
+    total = 0
+    for modelo in historico.modelos(filtros):
+        if modelo is not Bitacora and filtros == FILTROS_VACIOS:
+            total += historico.total_archivado()
+        else:
+            total += aplicar_filtros(db.session.query(func.count(modelo.id)), filtros, modelo).scalar()
+    return total
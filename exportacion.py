@@ -0,0 +1,119 @@
+# exportacion.py
+# Exportaciones en streaming (CSV y XLSX) de las filas devueltas por consultas.filas_reporte().
+# Cada generador produce bloques de bytes a medida que lee filas, así la memoria
+# se mantiene plana sin importar si el reporte tiene 100 o 2 millones de filas.
+import csv
+import io
+import re
+import zipfile
+from xml.sax.saxutils import escape
+
+ENCABEZADOS = ['FECHA', 'RESPONSABLE DE USO', 'PLACA', 'KM. INI', 'KM. FIN', 'KM. REC',
+               'LITROS', 'ACTIVIDAD / OBSERVACIONES', 'SECTOR']
+
+# Filas que se acumulan antes de entregar un bloque al cliente
+FILAS_POR_BLOQUE = 500
+
+def valores_fila(fila):
+    km_recorrido = round((fila.kilometraje_entrada or 0) - fila.kilometraje_salida, 2)
+    return [
+        fila.fecha_salida.strftime('%Y-%m-%d'),
+        fila.nombre_conductor,
+        fila.placa,
+        fila.kilometraje_salida,
+        fila.kilometraje_entrada,
+        km_recorrido,
+        fila.litros_combustible or 0,
+        fila.descripcion_trabajo,
+        fila.area
+    ]
+
+# --- CSV ---
+def generar_csv(filas):
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer)
+    # BOM para que Excel abra el archivo como UTF-8 (tildes y eñes)
+    buffer.write('\ufeff')
+    escritor.writerow(ENCABEZADOS)
+    for i, fila in enumerate(filas, 1):
+        escritor.writerow(valores_fila(fila))
+        if i % FILAS_POR_BLOQUE == 0:
+            yield buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue().encode('utf-8')
+
+# --- XLSX ---
+# Un .xlsx es un ZIP con XML adentro. zipfile puede escribir en un destino que no
+# admite seek (usa descriptores de datos), así que la hoja se comprime y se envía
+# por partes sin armar el libro completo en memoria.
+class Tuberia:
+    def __init__(self):
+        self._partes = []
+
+    def write(self, datos):
+        self._partes.append(bytes(datos))
+        return len(datos)
+
+    def flush(self):
+        pass
+
+    def vaciar(self):
+        datos = b''.join(self._partes)
+        self._partes = []
+        return datos
+
+_PARTES_XLSX = [
+    ('[Content_Types].xml',
+     '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+     '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+     '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+     '<Default Extension="xml" ContentType="application/xml"/>'
+     '<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+     '<Override PartName="/xl/worksheets/sheet1.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+     '</Types>'),
+    ('_rels/.rels',
+     '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+     '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+     '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="xl/workbook.xml"/>'
+     '</Relationships>'),
+    ('xl/workbook.xml',
+     '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+     '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+     'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+     '<sheets><sheet name="Bitacoras" sheetId="1" r:id="rId1"/></sheets>'
+     '</workbook>'),
+    ('xl/_rels/workbook.xml.rels',
+     '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+     '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+     '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" Target="worksheets/sheet1.xml"/>'
+     '</Relationships>'),
+]
+
+_CARACTERES_INVALIDOS_XML = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+def _celda(valor):
+    if isinstance(valor, (int, float)) and not isinstance(valor, bool):
+        return f'<c><v>{valor}</v></c>'
+    texto = escape(_CARACTERES_INVALIDOS_XML.sub('', str(valor if valor is not None else '')))
+    return f'<c t="inlineStr"><is><t xml:space="preserve">{texto}</t></is></c>'
+
+def _fila_xml(valores):
+    return ('<row>' + ''.join(_celda(v) for v in valores) + '</row>').encode('utf-8')
+
+def generar_xlsx(filas):
+    tuberia = Tuberia()
+    with zipfile.ZipFile(tuberia, 'w', zipfile.ZIP_DEFLATED) as libro:
+        for nombre, contenido in _PARTES_XLSX:
+            libro.writestr(nombre, contenido)
+        with libro.open('xl/worksheets/sheet1.xml', 'w', force_zip64=True) as hoja:
+            hoja.write(b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                       b'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+                       b'<sheetData>')
+            hoja.write(_fila_xml(ENCABEZADOS))
+            for i, fila in enumerate(filas, 1):
+                hoja.write(_fila_xml(valores_fila(fila)))
+                if i % FILAS_POR_BLOQUE == 0:
+                    yield tuberia.vaciar()
+            hoja.write(b'</sheetData></worksheet>')
+    yield tuberia.vaciar()
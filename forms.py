@@ -2,15 +2,18 @@
 from flask_wtf import FlaskForm
 from wtforms import StringField, PasswordField, SubmitField, BooleanField, TextAreaField, FloatField, SelectField
 from wtforms.fields import DateField
-from wtforms.validators import DataRequired, Email, EqualTo, ValidationError, NumberRange, Optional
+from wtforms.validators import DataRequired, Email, EqualTo, ValidationError, NumberRange, Optional, Length
 from models import User, Vehiculo, Area
-from wtforms_sqlalchemy.fields import QuerySelectField
+import catalogos
+import busqueda
 
-# --- Funciones helper (Sin cambios) ---
-def todos_los_vehiculos():
-    return Vehiculo.query.order_by(Vehiculo.placa)
-def todas_las_areas():
-    return Area.query.order_by(Area.nombre)
+# --- Funciones helper ---
+# Los selects de vehículo y área se llenan desde catalogos.py (caché en memoria) y
+# devuelven el id como entero: validar la opción elegida no consulta la BD.
+def entero_o_nada(valor):
+    if valor in (None, ''):
+        return None
+    return int(valor)
 
 # --- LoginForm, VehiculoForm, AreaForm (Sin cambios) ---
 class LoginForm(FlaskForm):
@@ -41,16 +44,8 @@ class AreaForm(FlaskForm):
 # -----------------------------------------------------------------
 class BitacoraForm(FlaskForm):
     nombre_conductor = StringField('Nombre Completo del Conductor', validators=[DataRequired()])
-    vehiculo = QuerySelectField('Vehículo Asignado', 
-                                query_factory=todos_los_vehiculos, 
-                                get_label='placa',
-                                allow_blank=False,
-                                validators=[DataRequired()])
-    area = QuerySelectField('Área (Sector o Zona de Trabajo)',
-                                query_factory=todas_las_areas, 
-                                get_label='nombre',
-                                allow_blank=False,
-                                validators=[DataRequired()])
+    vehiculo = SelectField('Vehículo Asignado', coerce=int, validators=[DataRequired()])
+    area = SelectField('Área (Sector o Zona de Trabajo)', coerce=int, validators=[DataRequired()])
     
     fecha_viaje = DateField('Fecha', format='%Y-%m-%d', validators=[DataRequired()])
 
@@ -63,23 +58,26 @@ class BitacoraForm(FlaskForm):
     
     submit = SubmitField('Registrar Bitácora Completa')
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.vehiculo.choices = catalogos.opciones_vehiculos()
+        self.area.choices = catalogos.opciones_areas()
+
     def validate_kilometraje_entrada(self, kilometraje_entrada):
         if kilometraje_entrada.data and self.kilometraje_salida.data:
             if kilometraje_entrada.data <= self.kilometraje_salida.data:
                 raise ValidationError('El kilometraje final debe ser mayor al inicial.')
 
-# --- ReportForm (Sin cambios) ---
+# --- ReportForm ---
 class ReportForm(FlaskForm):
     fecha_inicio = DateField('Fecha de Inicio', format='%Y-%m-%d', validators=[Optional()])
     fecha_fin = DateField('Fecha de Fin', format='%Y-%m-%d', validators=[Optional()])
-    vehiculo = QuerySelectField('Filtrar por Vehículo', 
-                                query_factory=todos_los_vehiculos, 
-                                get_label='placa',
-                                allow_blank=True,
-                                validators=[Optional()])
-    area = QuerySelectField('Filtrar por Área',
-                            query_factory=todas_las_areas,
-                            get_label='nombre',
-                            allow_blank=True,
-                            validators=[Optional()])
-    submit = SubmitField('Generar Reporte')
\ No newline at end of file
+    vehiculo = SelectField('Filtrar por Vehículo', coerce=entero_o_nada, validators=[Optional()])
+    area = SelectField('Filtrar por Área', coerce=entero_o_nada, validators=[Optional()])
+    texto = StringField('Buscar en Actividad / Observaciones', validators=[Optional(), Length(max=busqueda.MAX_TEXTO)])
+    submit = SubmitField('Generar Reporte')
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.vehiculo.choices = [('', 'Todos')] + catalogos.opciones_vehiculos()
+        self.area.choices = [('', 'Todos')] + catalogos.opciones_areas()
\ No newline at end of file
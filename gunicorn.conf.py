@@ -0,0 +1,31 @@
+# gunicorn.conf.py
+# Configuración de gunicorn (la lee el Procfile).
+# Con preload_app la aplicación se importa una sola vez en el proceso maestro y los
+# workers la heredan por fork: arrancan sin repetir la importación y comparten esa
+# memoria. Lo único que no puede heredarse es el pool de conexiones de SQLAlchemy (dos
+# procesos usando el mismo socket mezclarían sus consultas), por eso cada worker lo
+# descarta al nacer y abre conexiones propias.
+import os
+
+wsgi_app = 'app:app'
+preload_app = os.environ.get('GUNICORN_PRELOAD', '1').lower() not in ('0', 'false', 'no')
+# Hilos por worker (gthread si son más de uno): mientras un hilo arma un PDF los otros
+# siguen atendiendo el kiosko. Cada hilo usa su propia sesión de SQLAlchemy (una por
+# solicitud), así que el pool de cada worker (DB_POOL_SIZE + DB_MAX_OVERFLOW, ver
+# config.py) tiene que tener al menos tantas conexiones como hilos.
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+
+def when_ready(server):
+    import arranque
+    if arranque.importacion() is not None:
+        server.log.info('App importada en %.0f ms (precargada en el maestro)', arranque.importacion() * 1000)
+
+def post_fork(server, worker):
+    if not server.cfg.preload_app:
+        return
+    # close=False: las conexiones heredadas se olvidan sin cerrarlas, porque cerrarlas
+    # desde el hijo cerraría también las del maestro.
+    from app import app, db
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose(close=False)
@@ -0,0 +1,144 @@
+# historico.py
+# Archivo de las bitácoras de meses cerrados. Casi todo lo que se lee (kiosko, panel,
+# reportes del mes) cae en los últimos meses: bitacora guarda solo los meses activos
+# (ARCHIVO_MESES_ACTIVOS, contando el actual) y 'flask archivar-bitacoras' pasa los
+# anteriores a bitacora_archivada, con los mismos ids y en una transacción por mes.
+#  - Postgres: bitacora_archivada está particionada por mes de fecha_salida (PARTITION
+#    BY RANGE) y cada mes archivado es una partición, opcionalmente en otro tablespace
+#    (ARCHIVO_TABLESPACE: un disco más barato o con compresión).
+#  - SQLite: una tabla más, con los mismos índices que bitacora.
+# Las lecturas de reportes (consultas.py, analitica.py, paquetes.py, series.py) suman la
+# tabla archivada solo si el rango de fechas pedido llega a un mes archivado (modelos());
+# las del mes en curso cuestan lo mismo sin importar cuánto archivo haya.
+# ResumenDiario y los odómetros no cambian al archivar: los totales son los mismos.
+# Una bitácora cargada o editada después con fecha de un mes ya archivado se queda en
+# bitacora (los reportes la siguen viendo) y pasa al archivo en la próxima corrida.
+import threading
+from datetime import date, datetime, time
+import click
+from sqlalchemy import select, func, delete, text
+from app import app, db
+from models import Bitacora, BitacoraArchivada, MesArchivado
+import cache_http
+import busqueda
+
+# --- Límite del archivo ---
+# {versión de la tabla mes_archivado: límite}, por proceso
+_limite = {}
+_candado = threading.Lock()
+
+def mes_siguiente(mes):
+    return date(mes.year + mes.month // 12, mes.month % 12 + 1, 1)
+
+def limite():
+    # Primer día después del último mes archivado (None si no hay archivo): todas las
+    # bitácoras archivadas son anteriores.
+    version = cache_http.version('mes_archivado')
+    with _candado:
+        if version in _limite:
+            return _limite[version]
+    ultimo = db.session.query(func.max(MesArchivado.mes)).scalar()
+    valor = mes_siguiente(ultimo) if ultimo else None
+    with _candado:
+        _limite.clear()
+        _limite[version] = valor
+    return valor
+
+def alcanza(filtros):
+    fin = limite()
+    return fin is not None and (filtros['fecha_inicio'] is None or filtros['fecha_inicio'] < fin)
+
+def modelos(filtros):
+    # Tablas a leer con estos filtros: bitacora siempre, la archivada si el rango llega.
+    return [Bitacora, BitacoraArchivada] if alcanza(filtros) else [Bitacora]
+
+def total_archivado():
+    return int(db.session.query(func.coalesce(func.sum(MesArchivado.filas), 0)).scalar())
+
+# --- Archivado ---
+def corte(meses_activos, hoy=None):
+    # Primer día del mes más antiguo que se queda en bitacora
+    hoy = hoy or date.today()
+    indice = hoy.year * 12 + hoy.month - 1 - (meses_activos - 1)
+    return date(indice // 12, indice % 12 + 1, 1)
+
+def _crear_particion(conexion, mes):
+    sentencia = (f"CREATE TABLE IF NOT EXISTS bitacora_archivada_{mes:%Y_%m} PARTITION OF bitacora_archivada "
+                 f"FOR VALUES FROM ('{mes}') TO ('{mes_siguiente(mes)}')")
+    if app.config['ARCHIVO_TABLESPACE']:
+        sentencia += f" TABLESPACE {conexion.dialect.identifier_preparer.quote(app.config['ARCHIVO_TABLESPACE'])}"
+    conexion.execute(text(sentencia))
+
+def _reutiliza_ids(conexion):
+    # bitacora de SQLite creada sin AUTOINCREMENT (antes de models.Bitacora.__table_args__):
+    # el próximo id es el más alto que queda + 1, aunque ya esté en bitacora_archivada.
+    if conexion.dialect.name != 'sqlite':
+        return False
+    sql = conexion.execute(text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'bitacora'")).scalar()
+    return 'AUTOINCREMENT' not in (sql or '').upper()
+
+def archivar_mes(mes):
+    # Mueve las bitácoras de 'mes' y confirma. Devuelve cuántas movió.
+    origen = Bitacora.__table__
+    en_mes = (origen.c.fecha_salida >= datetime.combine(mes, time.min)) & \
+             (origen.c.fecha_salida < datetime.combine(mes_siguiente(mes), time.min))
+    conexion = db.session.connection()
+    if conexion.dialect.name == 'postgresql':
+        _crear_particion(conexion, mes)
+    elif _reutiliza_ids(conexion):
+        # La bitácora de id más alto se queda en bitacora: así ningún id nuevo repite uno
+        # archivado (pasa al archivo en una corrida posterior, cuando ya no sea la última).
+        maximo = conexion.execute(select(func.max(origen.c.id))).scalar()
+        if maximo is not None:
+            en_mes = en_mes & (origen.c.id < maximo)
+    movidas = conexion.execute(BitacoraArchivada.__table__.insert().from_select(
+        [columna.name for columna in origen.columns], select(*origen.columns).where(en_mes))).rowcount
+    if movidas:
+        # Sin pasar por la sesión ORM: los eventos de resumen.py y odometro.py no restan nada
+        conexion.execute(delete(origen).where(en_mes))
+        registro = db.session.get(MesArchivado, mes)
+        if registro is None:
+            db.session.add(MesArchivado(mes=mes, filas=movidas))
+        else:
+            registro.filas += movidas
+            registro.archivado = datetime.utcnow()
+    db.session.commit()
+    return movidas
+
+def archivar(meses_activos):
+    # {mes: bitácoras movidas} de los meses anteriores al corte que tenían alguna
+    hasta = corte(meses_activos)
+    primera = db.session.query(func.min(Bitacora.fecha_salida)).filter(
+        Bitacora.fecha_salida < datetime.combine(hasta, time.min)).scalar()
+    movidas = {}
+    mes = date(primera.year, primera.month, 1) if primera else hasta
+    while mes < hasta:
+        filas = archivar_mes(mes)
+        if filas:
+            movidas[mes] = filas
+        mes = mes_siguiente(mes)
+    if movidas:
+        # Estadísticas nuevas de las dos tablas (como indices.crear): sin ellas el
+        # planificador no sabe que bitacora_archivada tiene filas y ordena en memoria.
+        with db.engine.begin() as conexion:
+            conexion.execute(text('ANALYZE bitacora'))
+            conexion.execute(text('ANALYZE bitacora_archivada'))
+    return movidas
+
+@app.cli.command('archivar-bitacoras')
+@click.option('--meses', type=int, default=None,
+              help='Meses que se quedan en bitacora, contando el actual (por defecto ARCHIVO_MESES_ACTIVOS).')
+def archivar_bitacoras_comando(meses):
+    """Pasa las bitácoras de los meses cerrados a la tabla archivada, un mes por transacción."""
+    if meses is None:
+        meses = app.config['ARCHIVO_MESES_ACTIVOS']
+    if meses < 1:
+        raise click.BadParameter('Debe quedar al menos el mes actual.', param_hint='--meses')
+    db.create_all()
+    # Una BD de antes del archivo no tiene todavía la búsqueda de texto de la tabla archivada
+    with db.engine.begin() as conexion:
+        busqueda.crear(conexion)
+    movidas = archivar(meses)
+    for mes, filas in movidas.items():
+        print(f'{mes:%Y-%m}: {filas} bitácoras archivadas.')
+    print(f'Archivo hasta {corte(meses):%Y-%m} (sin incluirlo): {sum(movidas.values())} bitácoras movidas.')
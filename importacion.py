@@ -0,0 +1,198 @@
+# importacion.py
+# Carga masiva de bitácoras (JSON o CSV) para las planillas en papel de los sitios
+# remotos. Todas las filas se validan primero con las mismas reglas que BitacoraForm;
+# las válidas se insertan con executemany en lotes, cada lote en su propia transacción,
+# y se devuelve el detalle de errores por fila.
+import csv
+import io
+import json
+from datetime import datetime, time
+from sqlalchemy.exc import SQLAlchemyError
+from app import app, db
+from models import Bitacora
+import catalogos
+import cache_reportes
+import resumen
+import odometro
+import novedades
+
+CAMPOS = ('nombre_conductor', 'placa', 'area', 'fecha', 'kilometraje_salida',
+          'kilometraje_entrada', 'litros_combustible', 'descripcion_trabajo')
+
+# Encabezados del CSV exportado (exportacion.ENCABEZADOS): un archivo exportado se
+# puede volver a importar tal cual.
+ALIAS = {
+    'FECHA': 'fecha',
+    'RESPONSABLE DE USO': 'nombre_conductor',
+    'PLACA': 'placa',
+    'KM. INI': 'kilometraje_salida',
+    'KM. FIN': 'kilometraje_entrada',
+    'LITROS': 'litros_combustible',
+    'ACTIVIDAD / OBSERVACIONES': 'descripcion_trabajo',
+    'SECTOR': 'area',
+}
+
+OBLIGATORIO = 'Este campo es obligatorio.'
+
+class ErrorImportacion(ValueError):
+    pass
+
+# --- Lectura del archivo / cuerpo ---
+def _normalizar(registro):
+    normalizado = {}
+    for clave, valor in registro.items():
+        if clave is None:
+            continue
+        clave = clave.strip()
+        normalizado[ALIAS.get(clave.upper(), clave.lower())] = valor
+    return normalizado
+
+def leer_json(datos):
+    # Acepta una lista de objetos o {"bitacoras": [...]}.
+    if isinstance(datos, dict):
+        datos = datos.get('bitacoras')
+    if not isinstance(datos, list) or not all(isinstance(registro, dict) for registro in datos):
+        raise ErrorImportacion('Se esperaba una lista de bitácoras (objetos JSON).')
+    return [_normalizar(registro) for registro in datos]
+
+def leer_csv(contenido):
+    if isinstance(contenido, bytes):
+        try:
+            contenido = contenido.decode('utf-8-sig')
+        except UnicodeDecodeError:
+            raise ErrorImportacion('El CSV debe estar en UTF-8.')
+    try:
+        dialecto = csv.Sniffer().sniff(contenido[:4096], delimiters=',;\t')
+    except csv.Error:
+        dialecto = csv.excel
+    return [_normalizar(registro) for registro in csv.DictReader(io.StringIO(contenido), dialect=dialecto)]
+
+def leer_archivo(nombre, contenido):
+    if nombre.lower().endswith('.json'):
+        try:
+            return leer_json(json.loads(contenido.decode('utf-8-sig')))
+        except (UnicodeDecodeError, ValueError) as e:
+            raise ErrorImportacion(f'JSON inválido: {e}')
+    return leer_csv(contenido)
+
+# --- Validación (mismas reglas que forms.BitacoraForm) ---
+def _texto(valor):
+    return '' if valor is None else str(valor).strip()
+
+def _numero(valor):
+    if isinstance(valor, (int, float)) and not isinstance(valor, bool):
+        return float(valor)
+    texto = _texto(valor)
+    if not texto:
+        return None
+    if ',' in texto and '.' not in texto:
+        texto = texto.replace(',', '.')
+    return float(texto)
+
+def _validar(registro, vehiculos, areas):
+    valores = {}
+    errores = {}
+
+    for campo in ('nombre_conductor', 'descripcion_trabajo'):
+        valores[campo] = _texto(registro.get(campo))
+        if not valores[campo]:
+            errores[campo] = OBLIGATORIO
+
+    vehiculo_id = vehiculos.get(_texto(registro.get('placa')).upper())
+    if not _texto(registro.get('placa')):
+        errores['placa'] = OBLIGATORIO
+    elif vehiculo_id is None:
+        errores['placa'] = 'No existe un vehículo con esa placa.'
+    area_id = areas.get(_texto(registro.get('area')).lower())
+    if not _texto(registro.get('area')):
+        errores['area'] = OBLIGATORIO
+    elif area_id is None:
+        errores['area'] = 'No existe un área con ese nombre.'
+
+    fecha = None
+    try:
+        fecha = datetime.strptime(_texto(registro.get('fecha')), '%Y-%m-%d').date()
+    except ValueError:
+        errores['fecha'] = OBLIGATORIO if not _texto(registro.get('fecha')) else 'Fecha inválida (se espera AAAA-MM-DD).'
+
+    for campo, obligatorio in (('kilometraje_salida', True), ('kilometraje_entrada', True),
+                               ('litros_combustible', False)):
+        try:
+            valores[campo] = _numero(registro.get(campo))
+        except ValueError:
+            errores[campo] = 'No es un número válido.'
+            continue
+        # DataRequired de WTForms también rechaza el 0
+        if obligatorio and not valores[campo]:
+            errores[campo] = OBLIGATORIO
+
+    if 'kilometraje_salida' not in errores and 'kilometraje_entrada' not in errores:
+        if valores['kilometraje_entrada'] <= valores['kilometraje_salida']:
+            errores['kilometraje_entrada'] = 'El kilometraje final debe ser mayor al inicial.'
+
+    if errores:
+        return None, errores
+    return {
+        'nombre_conductor': valores['nombre_conductor'],
+        'vehiculo_id': vehiculo_id,
+        'area_id': area_id,
+        'fecha_salida': datetime.combine(fecha, time.min),
+        'kilometraje_salida': valores['kilometraje_salida'],
+        'fecha_entrada': datetime.combine(fecha, time.max),
+        'kilometraje_entrada': valores['kilometraje_entrada'],
+        'descripcion_trabajo': valores['descripcion_trabajo'],
+        'litros_combustible': valores['litros_combustible'],
+    }, None
+
+# --- Inserción ---
+def _insertar_lote(filas):
+    # executemany sobre la tabla: no pasa por el after_flush de resumen.py, odometro.py
+    # ni novedades.py, así que el resumen diario, los odómetros y el evento del panel en
+    # vivo se anotan aquí mismo, dentro de la misma transacción. Son datos históricos: no se valida la continuidad.
+    deltas = resumen.nuevos_deltas()
+    for fila in filas:
+        resumen.sumar(deltas, fila, +1)
+    try:
+        conexion = db.session.connection()
+        conexion.execute(Bitacora.__table__.insert(), filas)
+        resumen.aplicar_deltas(conexion, deltas)
+        odometro.recalcular(conexion, {fila['vehiculo_id'] for fila in filas})
+        novedades.anotar_importacion(deltas, len(filas))
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+def importar(registros, solo_validar=False):
+    # Devuelve {'recibidas', 'insertadas', 'errores': [{'fila', 'errores'}]}; 'fila' es
+    # 1 para el primer registro (en un CSV, la línea después del encabezado).
+    if len(registros) > app.config['IMPORTACION_MAX_FILAS']:
+        raise ErrorImportacion(f"Se admiten como máximo {app.config['IMPORTACION_MAX_FILAS']} filas por importación.")
+    vehiculos = {vehiculo.placa.strip().upper(): vehiculo.id for vehiculo in catalogos.vehiculos()}
+    areas = {area.nombre.strip().lower(): area.id for area in catalogos.areas()}
+
+    validas = []
+    errores = []
+    for numero, registro in enumerate(registros, 1):
+        fila, problemas = _validar(registro, vehiculos, areas)
+        if problemas:
+            errores.append({'fila': numero, 'errores': problemas})
+        else:
+            validas.append(fila)
+
+    insertadas = 0
+    error = None
+    if validas and not solo_validar:
+        lote = app.config['IMPORTACION_LOTE']
+        try:
+            for inicio in range(0, len(validas), lote):
+                _insertar_lote(validas[inicio:inicio + lote])
+                insertadas += len(validas[inicio:inicio + lote])
+        except SQLAlchemyError as e:
+            # Los lotes anteriores ya quedaron guardados; se informa desde dónde falta.
+            error = f'Error de base de datos después de {insertadas} filas insertadas: {getattr(e, "orig", None) or e}'
+        if insertadas:
+            cache_reportes.invalidar(*{(fila['fecha_salida'], fila['vehiculo_id'], fila['area_id'])
+                                       for fila in validas[:insertadas]})
+    return {'recibidas': len(registros), 'validas': len(validas), 'insertadas': insertadas,
+            'solo_validar': solo_validar, 'error': error, 'errores': errores}
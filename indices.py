@@ -0,0 +1,174 @@
+# indices.py
+# Índices de Bitacora (declarados en models.py) y control de los planes de consulta.
+# 'flask crear-indices' agrega los índices que falten en una BD ya existente (SQLite o
+# Postgres; db.create_all() no toca tablas que ya existen), incluido el de búsqueda de
+# texto (busqueda.py).
+# 'flask verificar-planes' corre EXPLAIN sobre cada forma de consulta de reportes,
+# exportaciones, analítica y paquetes con cada combinación de filtros, en bitacora y (si hay
+# meses archivados) en bitacora_archivada, y termina con código 1 si alguna vuelve a recorrer la tabla
+# completa o a ordenarla en memoria. tests/test_planes.py lo corre con pytest.
+import sys
+from datetime import date, datetime
+from sqlalchemy import select, func, text
+from app import app, db
+from models import Bitacora, BitacoraArchivada
+from consultas import FILTROS_VACIOS, aplicar_filtros, consulta_filas, consulta_pagina, codificar_cursor
+from analitica import consulta_columnas
+from paquetes import grupos_consulta
+import busqueda
+import historico
+
+# --- Migración ---
+def crear():
+    creados = []
+    with db.engine.begin() as conexion:
+        for indice in sorted(Bitacora.__table__.indexes, key=lambda indice: indice.name):
+            existentes = {i['name'] for i in db.inspect(conexion).get_indexes(Bitacora.__tablename__)}
+            if indice.name not in existentes:
+                indice.create(conexion)
+                creados.append(indice.name)
+        if busqueda.crear(conexion):
+            creados.append('búsqueda de texto')
+        if conexion.dialect.name == 'sqlite':
+            # Estadísticas para que el planificador elija entre los índices compuestos.
+            conexion.execute(text('ANALYZE'))
+        elif conexion.dialect.name == 'postgresql':
+            conexion.execute(text('ANALYZE bitacora'))
+            conexion.execute(text('ANALYZE bitacora_archivada'))
+    return creados
+
+@app.cli.command('crear-indices')
+def crear_indices_comando():
+    """Crea los índices de Bitacora que falten en la base de datos actual."""
+    db.create_all()
+    creados = crear()
+    print(f'Índices creados: {", ".join(creados)}' if creados else 'Todos los índices ya existían.')
+
+# --- Formas de consulta a verificar ---
+COMBINACIONES = {
+    'sin filtros': {},
+    'fechas': {'fecha_inicio': date(2025, 1, 1), 'fecha_fin': date(2025, 1, 31)},
+    'vehículo': {'vehiculo_id': 1},
+    'área': {'area_id': 1},
+    'vehículo + fechas': {'vehiculo_id': 1, 'fecha_inicio': date(2025, 1, 1), 'fecha_fin': date(2025, 1, 31)},
+    'área + fechas': {'area_id': 1, 'fecha_inicio': date(2025, 1, 1), 'fecha_fin': date(2025, 1, 31)},
+    'vehículo + área + fechas': {'vehiculo_id': 1, 'area_id': 1,
+                                 'fecha_inicio': date(2025, 1, 1), 'fecha_fin': date(2025, 1, 31)},
+    'texto': {'texto': 'salmuera'},
+    'texto + vehículo + fechas': {'texto': 'salmuera', 'vehiculo_id': 1,
+                                  'fecha_inicio': date(2025, 1, 1), 'fecha_fin': date(2025, 1, 31)},
+}
+
+def formas_de_consulta():
+    # (nombre, sentencia, ordenada); 'ordenada' = el ORDER BY debe salir del índice.
+    # Con texto las coincidencias salen del índice de búsqueda y se ordenan después
+    # (por relevancia o por fecha): eso es lo esperado.
+    # Las mismas formas sobre bitacora_archivada (historico.py), que los reportes leen
+    # cuando el rango de fechas llega a un mes archivado. Sin archivo no se leen nunca, y
+    # sin filas ni estadísticas el plan sobre la tabla vacía no dice nada.
+    tablas = [(Bitacora, '')]
+    if historico.limite() is not None:
+        tablas.append((BitacoraArchivada, ' (archivo)'))
+    for modelo, tabla in tablas:
+        for etiqueta, valores in COMBINACIONES.items():
+            filtros = dict(FILTROS_VACIOS, **valores)
+            etiqueta += tabla
+            sin_texto = not valores.get('texto')
+            cursor = codificar_cursor(datetime(2025, 6, 1), 1000) if sin_texto else codificar_cursor(-1.5, 1000)
+            yield (f'reportes, página 1 [{etiqueta}]',
+                   consulta_pagina(filtros, modelo=modelo).limit(51).statement, sin_texto)
+            yield (f'reportes, página siguiente [{etiqueta}]',
+                   consulta_pagina(filtros, cursor, modelo=modelo).limit(51).statement, sin_texto)
+            yield (f'reportes, página anterior [{etiqueta}]',
+                   consulta_pagina(filtros, cursor, hacia_atras=True, modelo=modelo).limit(51).statement, sin_texto)
+            yield f'conteo [{etiqueta}]', aplicar_filtros(select(func.count(modelo.id)), filtros, modelo), False
+            yield f'pdf/csv/xlsx [{etiqueta}]', consulta_filas(filtros, modelo).limit(1000), sin_texto
+            # Con fechas o área pero sin vehículo, analítica ordena por vehículo el subconjunto
+            # que ya eligió el índice: eso es lo esperado.
+            yield (f'analítica [{etiqueta}]', consulta_columnas(filtros, modelo), sin_texto and
+                   (bool(valores.get('vehiculo_id')) or not (valores.get('fecha_inicio') or valores.get('area_id'))))
+            if not valores.get('vehiculo_id'):
+                yield f'paquete por vehículo [{etiqueta}]', grupos_consulta(filtros, 'vehiculo', modelo), False
+            if not valores.get('area_id'):
+                yield f'paquete por área [{etiqueta}]', grupos_consulta(filtros, 'area', modelo), False
+        # Control de bajas en eliminar_vehiculo / eliminar_area (vehiculo.bitacoras, area.bitacoras
+        # y las archivadas)
+        yield f'bitácoras de un vehículo{tabla}', select(modelo.id).where(modelo.vehiculo_id == 1), False
+        yield f'bitácoras de un área{tabla}', select(modelo.id).where(modelo.area_id == 1), False
+
+# --- EXPLAIN por motor ---
+def _problemas_sqlite(conexion, sentencia, ordenada):
+    compilada = sentencia.compile(dialect=conexion.dialect)
+    valores = compilada.construct_params()
+    # El plan no depende de los valores: las fechas van como texto, igual que en la tabla.
+    parametros = tuple(str(valores[nombre]) if hasattr(valores[nombre], 'isoformat') else valores[nombre]
+                       for nombre in compilada.positiontup)
+    plan = conexion.exec_driver_sql('EXPLAIN QUERY PLAN ' + str(compilada), parametros).all()
+    detalles = [fila[3] for fila in plan]
+    problemas = []
+    for detalle in detalles:
+        if detalle in ('SCAN bitacora', 'SCAN bitacora_archivada'):
+            problemas.append(f'recorre la tabla {detalle[5:]} completa sin índice')
+        if ordenada and detalle.startswith('USE TEMP B-TREE FOR') and 'ORDER BY' in detalle:
+            problemas.append('ordena las filas en memoria en vez de usar un índice')
+    return problemas, detalles
+
+def _nodos(nodo):
+    yield nodo
+    for hijo in nodo.get('Plans', []):
+        yield from _nodos(hijo)
+
+def _problemas_postgresql(conexion, sentencia, ordenada):
+    # Con tablas chicas Postgres prefiere Seq Scan aunque exista el índice: se desalientan
+    # los recorridos y los ordenamientos para ver si hay un plan indexado posible.
+    conexion.execute(text('SET LOCAL enable_seqscan = off'))
+    conexion.execute(text('SET LOCAL enable_sort = off'))
+    compilada = sentencia.compile(dialect=conexion.dialect)
+    plan = conexion.exec_driver_sql('EXPLAIN (FORMAT JSON) ' + str(compilada),
+                                    compilada.construct_params()).scalar()
+    nodos = list(_nodos(plan[0]['Plan']))
+    problemas = []
+    for nodo in nodos:
+        # Las particiones de bitacora_archivada se llaman bitacora_archivada_AAAA_MM
+        if nodo['Node Type'] == 'Seq Scan' and (nodo.get('Relation Name') or '').startswith('bitacora'):
+            problemas.append(f"recorre la tabla {nodo['Relation Name']} completa sin índice")
+        if ordenada and nodo['Node Type'] in ('Sort', 'Incremental Sort'):
+            problemas.append('ordena las filas en memoria en vez de usar un índice')
+    return problemas, [f"{nodo['Node Type']} {nodo.get('Index Name') or nodo.get('Relation Name') or ''}".strip()
+                       for nodo in nodos]
+
+def verificar():
+    # Devuelve [(nombre, problemas, plan)] de todas las formas de consulta.
+    resultados = []
+    with db.engine.connect() as conexion:
+        dialecto = conexion.dialect.name
+        if dialecto not in ('sqlite', 'postgresql'):
+            raise RuntimeError(f'verificar-planes no soporta el motor {dialecto}')
+        analizar = _problemas_sqlite if dialecto == 'sqlite' else _problemas_postgresql
+        if dialecto == 'sqlite':
+            # SQLite lee las estadísticas (sqlite_stat1) al abrir la conexión: una del pool
+            # abierta antes del último ANALYZE planificaría con las viejas.
+            conexion.exec_driver_sql('ANALYZE sqlite_master')
+            conexion.commit()
+        for nombre, sentencia, ordenada in formas_de_consulta():
+            with conexion.begin():
+                problemas, plan = analizar(conexion, sentencia, ordenada)
+            resultados.append((nombre, problemas, plan))
+    return resultados
+
+@app.cli.command('verificar-planes')
+def verificar_planes_comando():
+    """Verifica con EXPLAIN que las consultas de reportes usen los índices de Bitacora."""
+    resultados = verificar()
+    fallas = 0
+    for nombre, problemas, plan in resultados:
+        if problemas:
+            fallas += 1
+            print(f'FALLA  {nombre}: {"; ".join(sorted(set(problemas)))}')
+            for paso in plan:
+                print(f'         {paso}')
+        else:
+            print(f'ok     {nombre}')
+    print(f'{len(resultados) - fallas} de {len(resultados)} consultas usan índices.')
+    if fallas:
+        sys.exit(1)
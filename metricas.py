@@ -0,0 +1,325 @@
+# metricas.py
+# Instrumentación opcional (METRICAS_ACTIVAS) por endpoint: solicitudes, latencia,
+# cantidad y tiempo de consultas SQL, tiempo de render de plantillas y de armado de PDF,
+# más las sentencias más lentas. Se expone en formato de texto de Prometheus en /metrics.
+#
+# Cada proceso (workers de gunicorn, pools de PDF) lleva sus propios números en memoria
+# y cada pocos segundos los vuelca a un archivo <pid>.json; /metrics suma todos los
+# archivos, así el resultado no depende de qué worker atiende la consulta. Los archivos
+# de procesos que ya terminaron (workers reciclados, pools de PDF) se borran al leer:
+# Prometheus toma la baja de esos contadores como un reinicio. METRICAS_DIR es por
+# máquina: los pid de otra no se pueden comprobar.
+import hmac
+import json
+import os
+import re
+import threading
+import time
+from flask import g, has_app_context, request, abort, Response
+from flask.signals import before_render_template, template_rendered
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+BUCKETS_SEGUNDOS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+BUCKETS_CONSULTAS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+MAX_LENTAS = 10
+LARGO_SENTENCIA = 300
+# Segundos entre volcados del archivo de cada proceso
+INTERVALO_VOLCADO = 5
+
+AYUDA = {
+    'bitacoras_solicitudes_total': ('counter', 'Solicitudes atendidas por endpoint, método y estado HTTP.'),
+    'bitacoras_solicitud_segundos': ('histogram', 'Duración de cada solicitud.'),
+    'bitacoras_sql_consultas_por_solicitud': ('histogram', 'Consultas SQL emitidas por solicitud.'),
+    'bitacoras_sql_consultas_total': ('counter', 'Consultas SQL emitidas.'),
+    'bitacoras_sql_segundos_total': ('counter', 'Tiempo total en consultas SQL.'),
+    'bitacoras_render_segundos_total': ('counter', 'Tiempo total renderizando plantillas.'),
+    'bitacoras_pdf_segundos': ('histogram', 'Tiempo de armado de cada PDF (pdf_reportes.construir_pdf).'),
+    'bitacoras_pdf_filas_total': ('counter', 'Filas escritas en PDF.'),
+    'bitacoras_arranque_segundos': ('histogram', 'Arranque de cada proceso: importación de app.py y hasta la primera respuesta.'),
+    'bitacoras_sql_lenta_segundos': ('gauge', 'Sentencias SQL más lentas vistas (máximo por sentencia).'),
+}
+
+_candado = threading.Lock()
+_contadores = {}
+_histogramas = {}
+_lentas = {}
+_estado = {'activo': False, 'directorio': None, 'lento_ms': 0, 'ultimo_volcado': 0.0, 'logger': None}
+
+# --- Registro en memoria ---
+def _sumar(nombre, etiquetas, valor=1):
+    clave = (nombre, etiquetas)
+    _contadores[clave] = _contadores.get(clave, 0) + valor
+
+def _observar(nombre, etiquetas, valor, buckets):
+    clave = (nombre, etiquetas)
+    datos = _histogramas.get(clave)
+    if datos is None:
+        datos = _histogramas[clave] = [[0] * len(buckets), 0.0, 0, buckets]
+    for i, limite in enumerate(buckets):
+        if valor <= limite:
+            datos[0][i] += 1
+            break
+    datos[1] += valor
+    datos[2] += 1
+
+def _anotar_lenta(endpoint, sentencia, segundos):
+    sentencia = re.sub(r'\s+', ' ', sentencia).strip()[:LARGO_SENTENCIA]
+    clave = (endpoint, sentencia)
+    if segundos <= _lentas.get(clave, 0):
+        return
+    if clave not in _lentas and len(_lentas) >= MAX_LENTAS:
+        menor = min(_lentas, key=_lentas.get)
+        if _lentas[menor] >= segundos:
+            return
+        del _lentas[menor]
+    _lentas[clave] = segundos
+
+def _reiniciar():
+    # En un proceso hijo (fork) se empieza de cero: lo heredado ya lo cuenta el padre.
+    _contadores.clear()
+    _histogramas.clear()
+    _lentas.clear()
+    _estado['ultimo_volcado'] = 0.0
+
+# --- Volcado a disco y suma entre procesos ---
+def _ruta_propia():
+    return os.path.join(_estado['directorio'], f'{os.getpid()}.json')
+
+def volcar():
+    with _candado:
+        datos = {
+            'contadores': [[nombre, list(etiquetas), valor] for (nombre, etiquetas), valor in _contadores.items()],
+            'histogramas': [[nombre, list(etiquetas), cuentas, suma, total, list(buckets)]
+                            for (nombre, etiquetas), (cuentas, suma, total, buckets) in _histogramas.items()],
+            'lentas': [[endpoint, sentencia, segundos] for (endpoint, sentencia), segundos in _lentas.items()],
+        }
+        _estado['ultimo_volcado'] = time.monotonic()
+    ruta = _ruta_propia()
+    temporal = f'{ruta}.{threading.get_ident()}.tmp'
+    with open(temporal, 'w') as archivo:
+        json.dump(datos, archivo)
+    os.replace(temporal, ruta)
+
+def _volcar_si_toca():
+    if time.monotonic() - _estado['ultimo_volcado'] >= INTERVALO_VOLCADO:
+        try:
+            volcar()
+        except OSError:
+            pass
+
+def _vivo(pid):
+    if pid == os.getpid() or os.name != 'posix':
+        # En Windows os.kill no comprueba: termina el proceso
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass  # existe, pero es de otro usuario
+    return True
+
+def _podar(nombre_archivo):
+    # Borra el volcado (o un temporal que quedó a medias) de un proceso que ya no existe.
+    # Devuelve True si lo borró.
+    pid = nombre_archivo.split('.')[0]
+    if not pid.isdigit() or _vivo(int(pid)):
+        return False
+    try:
+        os.remove(os.path.join(_estado['directorio'], nombre_archivo))
+    except OSError:
+        pass
+    return True
+
+def _leer_todos():
+    contadores = {}
+    histogramas = {}
+    lentas = {}
+    for nombre_archivo in os.listdir(_estado['directorio']):
+        if _podar(nombre_archivo) or not nombre_archivo.endswith('.json'):
+            continue
+        try:
+            with open(os.path.join(_estado['directorio'], nombre_archivo)) as archivo:
+                datos = json.load(archivo)
+        except (OSError, ValueError):
+            continue
+        for nombre, etiquetas, valor in datos.get('contadores', []):
+            clave = (nombre, tuple(map(tuple, etiquetas)))
+            contadores[clave] = contadores.get(clave, 0) + valor
+        for nombre, etiquetas, cuentas, suma, total, buckets in datos.get('histogramas', []):
+            clave = (nombre, tuple(map(tuple, etiquetas)))
+            if clave not in histogramas:
+                histogramas[clave] = [[0] * len(buckets), 0.0, 0, buckets]
+            acumulado = histogramas[clave]
+            acumulado[0] = [a + b for a, b in zip(acumulado[0], cuentas)]
+            acumulado[1] += suma
+            acumulado[2] += total
+        for endpoint, sentencia, segundos in datos.get('lentas', []):
+            lentas[(endpoint, sentencia)] = max(segundos, lentas.get((endpoint, sentencia), 0))
+    mayores = sorted(lentas.items(), key=lambda par: par[1], reverse=True)[:MAX_LENTAS]
+    return contadores, histogramas, dict(mayores)
+
+# --- Formato de texto de Prometheus ---
+def _escapar(valor):
+    return str(valor).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+def _etiquetas(etiquetas, extra=()):
+    pares = list(etiquetas) + list(extra)
+    if not pares:
+        return ''
+    return '{' + ','.join(f'{clave}="{_escapar(valor)}"' for clave, valor in pares) + '}'
+
+def texto_prometheus():
+    volcar()
+    contadores, histogramas, lentas = _leer_todos()
+    lineas = []
+    nombres = sorted({nombre for nombre, _ in contadores} | {nombre for nombre, _ in histogramas} |
+                     ({'bitacoras_sql_lenta_segundos'} if lentas else set()))
+    for nombre in nombres:
+        tipo, ayuda = AYUDA.get(nombre, ('untyped', nombre))
+        lineas.append(f'# HELP {nombre} {ayuda}')
+        lineas.append(f'# TYPE {nombre} {tipo}')
+        if nombre == 'bitacoras_sql_lenta_segundos':
+            for (endpoint, sentencia), segundos in lentas.items():
+                lineas.append(f'{nombre}{_etiquetas((("endpoint", endpoint), ("sentencia", sentencia)))} {segundos:.6f}')
+            continue
+        for (nombre_c, etiquetas), valor in sorted(contadores.items()):
+            if nombre_c == nombre:
+                lineas.append(f'{nombre}{_etiquetas(etiquetas)} {valor}')
+        for (nombre_h, etiquetas), (cuentas, suma, total, buckets) in sorted(histogramas.items()):
+            if nombre_h != nombre:
+                continue
+            acumulado = 0
+            for limite, cuenta in zip(buckets, cuentas):
+                acumulado += cuenta
+                lineas.append(f'{nombre}_bucket{_etiquetas(etiquetas, [("le", limite)])} {acumulado}')
+            lineas.append(f'{nombre}_bucket{_etiquetas(etiquetas, [("le", "+Inf")])} {total}')
+            lineas.append(f'{nombre}_sum{_etiquetas(etiquetas)} {suma:.6f}')
+            lineas.append(f'{nombre}_count{_etiquetas(etiquetas)} {total}')
+    return '\n'.join(lineas) + '\n'
+
+# --- Medición de cada solicitud ---
+def _datos_solicitud():
+    if has_app_context():
+        return g.get('_metricas')
+    return None
+
+def _antes_de_consulta(conn, cursor, statement, parameters, context, executemany):
+    conn.info['_metricas_inicio'] = time.perf_counter()
+
+def _despues_de_consulta(conn, cursor, statement, parameters, context, executemany):
+    inicio = conn.info.pop('_metricas_inicio', None)
+    if inicio is None:
+        return
+    segundos = time.perf_counter() - inicio
+    datos = _datos_solicitud()
+    if datos is not None:
+        datos['consultas'] += 1
+        datos['sql'] += segundos
+        endpoint = datos['endpoint']
+    else:
+        endpoint = 'fondo'
+        with _candado:
+            _sumar('bitacoras_sql_consultas_total', (('endpoint', endpoint),))
+            _sumar('bitacoras_sql_segundos_total', (('endpoint', endpoint),), segundos)
+    if _lentas_minimo() < segundos:
+        with _candado:
+            _anotar_lenta(endpoint, statement, segundos)
+
+def _lentas_minimo():
+    if len(_lentas) < MAX_LENTAS:
+        return 0
+    return min(_lentas.values())
+
+def _antes_de_solicitud():
+    g._metricas = {'inicio': time.perf_counter(), 'endpoint': request.endpoint or 'sin_ruta',
+                   'consultas': 0, 'sql': 0.0, 'render': 0.0, 'render_inicio': None}
+
+def _antes_de_render(sender, template, context, **extra):
+    datos = _datos_solicitud()
+    if datos is not None:
+        datos['render_inicio'] = time.perf_counter()
+
+def _despues_de_render(sender, template, context, **extra):
+    datos = _datos_solicitud()
+    if datos is not None and datos['render_inicio'] is not None:
+        datos['render'] += time.perf_counter() - datos['render_inicio']
+        datos['render_inicio'] = None
+
+def _al_terminar(respuesta):
+    datos = g.pop('_metricas', None)
+    if datos is None:
+        return respuesta
+    segundos = time.perf_counter() - datos['inicio']
+    endpoint = (('endpoint', datos['endpoint']),)
+    with _candado:
+        _sumar('bitacoras_solicitudes_total',
+               endpoint + (('metodo', request.method), ('estado', respuesta.status_code)))
+        _observar('bitacoras_solicitud_segundos', endpoint, segundos, BUCKETS_SEGUNDOS)
+        _observar('bitacoras_sql_consultas_por_solicitud', endpoint, datos['consultas'], BUCKETS_CONSULTAS)
+        _sumar('bitacoras_sql_consultas_total', endpoint, datos['consultas'])
+        _sumar('bitacoras_sql_segundos_total', endpoint, datos['sql'])
+        _sumar('bitacoras_render_segundos_total', endpoint, datos['render'])
+    if _estado['lento_ms'] and segundos * 1000 >= _estado['lento_ms']:
+        _estado['logger'].warning(
+            'Solicitud lenta: %s %s (%s) %.0f ms, %d consultas SQL en %.0f ms, render %.0f ms',
+            request.method, request.path, datos['endpoint'], segundos * 1000,
+            datos['consultas'], datos['sql'] * 1000, datos['render'] * 1000)
+    _volcar_si_toca()
+    return respuesta
+
+def observar_pdf(segundos, filas):
+    # La llama pdf_reportes.construir_pdf (también dentro de los pools de procesos).
+    if not _estado['activo']:
+        return
+    datos = _datos_solicitud()
+    endpoint = (('endpoint', datos['endpoint'] if datos else 'fondo'),)
+    with _candado:
+        _observar('bitacoras_pdf_segundos', endpoint, segundos, BUCKETS_SEGUNDOS)
+        _sumar('bitacoras_pdf_filas_total', endpoint, filas)
+    if datos is None:
+        # En un proceso de fondo puede no haber otra oportunidad de volcar pronto.
+        try:
+            volcar()
+        except OSError:
+            pass
+
+def observar_arranque(etapa, segundos):
+    # La llama arranque.py una vez por proceso, tras su primera solicitud.
+    if not _estado['activo']:
+        return
+    with _candado:
+        _observar('bitacoras_arranque_segundos', (('etapa', etapa),), segundos, BUCKETS_SEGUNDOS)
+
+# --- Instalación (la llama app.py) ---
+def instalar(app):
+    if not app.config['METRICAS_ACTIVAS']:
+        return
+    directorio = app.config['METRICAS_DIR'] or os.path.join(app.instance_path, 'metricas')
+    os.makedirs(directorio, exist_ok=True)
+    _estado.update(activo=True, directorio=directorio, lento_ms=app.config['METRICAS_LENTO_MS'],
+                   logger=app.logger)
+    os.register_at_fork(after_in_child=_reiniciar)
+
+    event.listen(Engine, 'before_cursor_execute', _antes_de_consulta)
+    event.listen(Engine, 'after_cursor_execute', _despues_de_consulta)
+    app.before_request(_antes_de_solicitud)
+    app.after_request(_al_terminar)
+    before_render_template.connect(_antes_de_render, app)
+    template_rendered.connect(_despues_de_render, app)
+
+    @app.route('/metrics')
+    def metrics():
+        # Con METRICAS_TOKEN, Prometheus envía 'Authorization: Bearer <token>'; sin token
+        # configurado solo un admin con sesión iniciada puede verlas.
+        token = app.config['METRICAS_TOKEN']
+        if token:
+            recibido = request.headers.get('Authorization', '').encode('utf-8')
+            if not hmac.compare_digest(recibido, f'Bearer {token}'.encode('utf-8')):
+                abort(403)
+        else:
+            from flask_login import current_user
+            if not current_user.is_authenticated or current_user.role != 'admin':
+                abort(403)
+        return Response(texto_prometheus(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -1,13 +1,11 @@
 # models.py
-from app import db, login_manager
+from app import app, db
 from flask_login import UserMixin
 from datetime import datetime
+import hashlib
+import hmac
 
-# --- User (Sin cambios) ---
-@login_manager.user_loader
-def load_user(user_id):
-    return User.query.get(int(user_id))
-
+# --- User (el user_loader de Flask-Login está en usuarios.py) ---
 class User(db.Model, UserMixin):
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(20), unique=True, nullable=False)
@@ -15,6 +13,16 @@ class User(db.Model, UserMixin):
     password = db.Column(db.String(60), nullable=False)
     role = db.Column(db.String(20), nullable=False, default='admin')
 
+    def sello_sesion(self):
+        # Cambia si cambia la contraseña o el rol: las sesiones abiertas con el sello
+        # anterior dejan de valer (ver usuarios.cargar_usuario).
+        return hmac.new(app.config['SECRET_KEY'].encode(), f'{self.password}|{self.role}'.encode(),
+                        hashlib.sha256).hexdigest()[:16]
+
+    def get_id(self):
+        # Lo que Flask-Login guarda en la sesión y en la cookie 'recordarme'
+        return f'{self.id}:{self.sello_sesion()}'
+
 # --- Vehiculo (Sin cambios) ---
 class Vehiculo(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -57,6 +65,114 @@ class Bitacora(db.Model):
     litros_combustible = db.Column(db.Float, nullable=True, default=0)
     
     # ¡¡CAMPO 'observaciones' ELIMINADO!!
+
+    # Las de meses cerrados pasan a BitacoraArchivada (ver historico.py)
+    archivada = False
+
+    # Índices para los filtros de reportes/exportaciones y el orden (fecha_salida, id) del
+    # cursor de páginas. Los de vehículo y área también sirven a las búsquedas por clave
+    # foránea (vehiculo.bitacoras, area.bitacoras). En BD existentes: flask crear-indices.
+    # AUTOINCREMENT en SQLite: sin él, los ids más altos que pasan a bitacora_archivada
+    # se volverían a dar (ver historico.archivar_mes).
+    __table_args__ = (
+        db.Index('ix_bitacora_fecha_salida_id', 'fecha_salida', 'id'),
+        db.Index('ix_bitacora_vehiculo_fecha', 'vehiculo_id', 'fecha_salida', 'id'),
+        db.Index('ix_bitacora_area_fecha', 'area_id', 'fecha_salida', 'id'),
+        {'sqlite_autoincrement': True},
+    )
     
     def __repr__(self):
-        return f"Bitacora('{self.nombre_conductor}', '{self.vehiculo_usado.placa}')"
\ No newline at end of file
+        return f"Bitacora('{self.nombre_conductor}', '{self.vehiculo_usado.placa}')"
+
+# --- TrabajoReporte (PDF generados en segundo plano, ver trabajos.py) ---
+class TrabajoReporte(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    # pendiente -> procesando -> terminado | error
+    estado = db.Column(db.String(20), nullable=False, default='pendiente')
+    filtros = db.Column(db.Text, nullable=False) # JSON con los parámetros de /reporte/pdf
+    filas_procesadas = db.Column(db.Integer, nullable=False, default=0)
+    filas_totales = db.Column(db.Integer, nullable=True)
+    archivo = db.Column(db.String(255), nullable=True)
+    error = db.Column(db.Text, nullable=True)
+    usuario_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)
+    creado = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    terminado = db.Column(db.DateTime, nullable=True)
+
+    def __repr__(self):
+        return f"TrabajoReporte('{self.id}', '{self.estado}')"
+
+
+# --- ResumenDiario (totales por día x vehículo x área, ver resumen.py) ---
+# Se actualiza en la misma transacción que cada alta, edición o baja de Bitacora.
+class ResumenDiario(db.Model):
+    fecha = db.Column(db.Date, primary_key=True)
+    vehiculo_id = db.Column(db.Integer, db.ForeignKey('vehiculo.id'), primary_key=True)
+    area_id = db.Column(db.Integer, db.ForeignKey('area.id'), primary_key=True)
+    viajes = db.Column(db.Integer, nullable=False, default=0)
+    km_recorridos = db.Column(db.Float, nullable=False, default=0)
+    litros = db.Column(db.Float, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"ResumenDiario('{self.fecha}', '{self.vehiculo_id}', '{self.area_id}', '{self.viajes}')"
+
+# --- OdometroVehiculo (última lectura del odómetro por vehículo, ver odometro.py) ---
+# Sin clave foránea a bitacora: al eliminar ese viaje la fila se recalcula en el mismo flush.
+class OdometroVehiculo(db.Model):
+    vehiculo_id = db.Column(db.Integer, db.ForeignKey('vehiculo.id'), primary_key=True)
+    bitacora_id = db.Column(db.Integer, nullable=False)
+    fecha_salida = db.Column(db.DateTime, nullable=False)
+    km = db.Column(db.Float, nullable=False)
+
+    def __repr__(self):
+        return f"OdometroVehiculo('{self.vehiculo_id}', '{self.km}')"
+
+
+# --- BitacoraArchivada (meses cerrados de Bitacora, ver historico.py) ---
+# Mismas columnas y mismos ids que tenían en bitacora. En Postgres es una tabla
+# particionada por mes de fecha_salida (una partición por mes archivado), por eso la
+# clave primaria incluye la fecha. Solo lectura: no se edita ni se elimina desde la app.
+class BitacoraArchivada(db.Model):
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    nombre_conductor = db.Column(db.String(100), nullable=False)
+    vehiculo_id = db.Column(db.Integer, db.ForeignKey('vehiculo.id'), nullable=False)
+    area_id = db.Column(db.Integer, db.ForeignKey('area.id'), nullable=False)
+    fecha_salida = db.Column(db.DateTime, primary_key=True)
+    kilometraje_salida = db.Column(db.Float, nullable=False)
+    fecha_entrada = db.Column(db.DateTime, nullable=True)
+    kilometraje_entrada = db.Column(db.Float, nullable=True)
+    descripcion_trabajo = db.Column(db.Text, nullable=False)
+    litros_combustible = db.Column(db.Float, nullable=True, default=0)
+
+    vehiculo_usado = db.relationship('Vehiculo', backref=db.backref('bitacoras_archivadas', lazy=True))
+    area_asignada = db.relationship('Area', backref=db.backref('bitacoras_archivadas', lazy=True))
+
+    archivada = True
+
+    __table_args__ = (
+        db.Index('ix_bitacora_archivada_fecha_salida_id', 'fecha_salida', 'id'),
+        db.Index('ix_bitacora_archivada_vehiculo_fecha', 'vehiculo_id', 'fecha_salida', 'id'),
+        db.Index('ix_bitacora_archivada_area_fecha', 'area_id', 'fecha_salida', 'id'),
+        {'postgresql_partition_by': 'RANGE (fecha_salida)'},
+    )
+
+    def __repr__(self):
+        return f"BitacoraArchivada('{self.nombre_conductor}', '{self.vehiculo_usado.placa}')"
+
+# --- MesArchivado (meses ya pasados a BitacoraArchivada y cuántas filas tienen) ---
+class MesArchivado(db.Model):
+    mes = db.Column(db.Date, primary_key=True) # primer día del mes
+    filas = db.Column(db.Integer, nullable=False, default=0)
+    archivado = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f"MesArchivado('{self.mes}', '{self.filas}')"
+
+# --- EventoCambio (novedades en vivo del panel y /reportes, ver novedades.py) ---
+class EventoCambio(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    creado = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, index=True)
+    tipo = db.Column(db.String(20), nullable=False) # bitacora, vehiculo, area, importacion
+    datos = db.Column(db.Text, nullable=False) # JSON
+
+    def __repr__(self):
+        return f"EventoCambio('{self.id}', '{self.tipo}')"
@@ -0,0 +1,330 @@
+# novedades.py
+# Novedades en vivo para el panel de admin y /reportes (Server-Sent Events en
+# /api/novedades). Las páginas abiertas reciben las altas, ediciones y bajas de
+# bitácoras, vehículos y áreas como deltas de los totales y filas nuevas, y se
+# actualizan sin recargar ni volver a consultar.
+#  - Cada flush que toca esas tablas anota un EventoCambio en la misma transacción (como
+#    resumen.py): el evento existe solo si el cambio se confirmó, y todos los workers lo
+#    leen de la BD. Vale también para las altas agrupadas del kiosko (registro_agrupado.py)
+#    y las importaciones (importacion.py).
+#  - Un hilo por worker (el repartidor) lee cada evento nuevo una sola vez y lo deja ya
+#    armado en un buffer en memoria; las conexiones solo esperan en una Condition, sin
+#    sesión de BD abierta. Un commit del mismo worker lo despierta enseguida; los de
+#    otros workers los ve por la marca de versión de evento_cambio (cache_http.py), que
+#    revisa cada NOVEDADES_INTERVALO_MS sin consultar la BD.
+#  - Cada conexión abierta ocupa un hilo de gunicorn: por eso hay un tope por worker
+#    (NOVEDADES_MAX_CONEXIONES; las demás reciben 503 y el navegador reintenta) y cada
+#    flujo se corta a los NOVEDADES_DURACION segundos. EventSource vuelve a conectar solo
+#    y retoma desde el último evento recibido (Last-Event-ID).
+import json
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime, timedelta
+from flask import Response
+from sqlalchemy import event, func, inspect, select, delete
+from app import app, db
+from models import Bitacora, Vehiculo, Area, EventoCambio
+import cache_http
+import catalogos
+import resumen
+
+# Eventos que cada worker guarda en memoria, y cuántos se repiten como mucho al
+# reconectar (si faltan más, la página recarga)
+BUFFER = 1000
+REPETIR_MAX = 500
+# Ids hacia atrás que se vuelven a mirar: en Postgres dos commits simultáneos pueden
+# confirmarse en otro orden que el de sus ids
+VENTANA_IDS = 100
+# Segundos entre latidos (comentarios SSE: mantienen viva la conexión en los proxies y
+# detectan al navegador que se fue) y milisegundos que espera EventSource para reconectar
+LATIDO = 15
+RECONEXION_MS = 3000
+
+CAMPOS_FILA = ('fecha_salida', 'nombre_conductor', 'vehiculo_id', 'area_id', 'kilometraje_salida',
+               'kilometraje_entrada', 'litros_combustible', 'descripcion_trabajo')
+
+# --- Anotación de eventos (en la transacción del cambio) ---
+def _valores(objeto, campos, anteriores=False):
+    if not anteriores:
+        return {campo: getattr(objeto, campo) for campo in campos}
+    estado = inspect(objeto)
+    valores = {}
+    for campo in campos:
+        historia = estado.attrs[campo].history
+        if historia.deleted:
+            valores[campo] = historia.deleted[0]
+        elif historia.unchanged:
+            valores[campo] = historia.unchanged[0]
+        else:
+            valores[campo] = getattr(objeto, campo)
+    return valores
+
+def _fila(bitacora_id, valores):
+    return dict(valores, id=bitacora_id, fecha_salida=valores['fecha_salida'].isoformat())
+
+def lista_deltas(deltas):
+    # Deltas de resumen.py (por día x vehículo x área) como lista para el JSON
+    return [{'fecha': fecha.isoformat(), 'vehiculo_id': vehiculo_id, 'area_id': area_id,
+             'viajes': viajes, 'km': km, 'litros': litros}
+            for (fecha, vehiculo_id, area_id), (viajes, km, litros) in deltas.items()
+            if viajes or km or litros]
+
+def _evento_bitacora(accion, bitacora_id, antes=None, despues=None):
+    deltas = resumen.nuevos_deltas()
+    if antes:
+        resumen.sumar(deltas, antes, -1)
+    if despues:
+        resumen.sumar(deltas, despues, +1)
+    return ('bitacora', {'accion': accion,
+                         'fila': _fila(bitacora_id, despues) if despues else None,
+                         'anterior': _fila(bitacora_id, antes) if antes else None,
+                         'deltas': lista_deltas(deltas)})
+
+def _evento_catalogo(objeto, accion, anterior=None):
+    # Vehículos y áreas: lo que muestran las páginas es su nombre (placa o nombre)
+    if isinstance(objeto, Vehiculo):
+        return ('vehiculo', {'accion': accion, 'id': objeto.id, 'nombre': objeto.placa, 'anterior': anterior})
+    return ('area', {'accion': accion, 'id': objeto.id, 'nombre': objeto.nombre, 'anterior': anterior})
+
+def anotar(eventos):
+    # eventos: [(tipo, datos)]. Se escriben en la transacción en curso de db.session.
+    ahora = datetime.utcnow()
+    db.session.connection().execute(EventoCambio.__table__.insert(), [
+        {'creado': ahora, 'tipo': tipo, 'datos': json.dumps(datos, ensure_ascii=False)}
+        for tipo, datos in eventos])
+    db.session.info['novedades'] = True
+
+def anotar_importacion(deltas, filas):
+    # Las cargas masivas no pasan por el after_flush: solo los totales, sin las filas.
+    anotar([('importacion', {'filas': filas, 'deltas': lista_deltas(deltas)})])
+
+@event.listens_for(db.session, 'after_flush')
+def anotar_cambios(session, flush_context):
+    eventos = []
+    for objeto in session.new:
+        if isinstance(objeto, Bitacora):
+            eventos.append(_evento_bitacora('alta', objeto.id, despues=_valores(objeto, CAMPOS_FILA)))
+        elif isinstance(objeto, (Vehiculo, Area)):
+            eventos.append(_evento_catalogo(objeto, 'alta'))
+    for objeto in session.deleted:
+        if isinstance(objeto, Bitacora):
+            eventos.append(_evento_bitacora('baja', objeto.id, antes=_valores(objeto, CAMPOS_FILA, True)))
+        elif isinstance(objeto, (Vehiculo, Area)):
+            eventos.append(_evento_catalogo(objeto, 'baja'))
+    for objeto in session.dirty:
+        if not session.is_modified(objeto, include_collections=False):
+            continue
+        if isinstance(objeto, Bitacora):
+            antes, despues = _valores(objeto, CAMPOS_FILA, True), _valores(objeto, CAMPOS_FILA)
+            if antes != despues:
+                eventos.append(_evento_bitacora('edicion', objeto.id, antes, despues))
+        elif isinstance(objeto, (Vehiculo, Area)):
+            campo = 'placa' if isinstance(objeto, Vehiculo) else 'nombre'
+            anterior = _valores(objeto, (campo,), True)[campo]
+            if anterior != getattr(objeto, campo):
+                eventos.append(_evento_catalogo(objeto, 'edicion', anterior))
+    if eventos:
+        anotar(eventos)
+
+@event.listens_for(db.session, 'after_commit')
+def _despertar_repartidor(session):
+    # Bus en proceso: lo confirmado en este worker se reparte sin esperar a la marca
+    if session.info.pop('novedades', None):
+        _aviso.set()
+
+@event.listens_for(db.session, 'after_rollback')
+def _descartar(session):
+    session.info.pop('novedades', None)
+
+def ultimo_id():
+    return db.session.query(func.max(EventoCambio.id)).scalar() or 0
+
+def con_ultimo_id(leer, intentos=3):
+    # (leer(), id del último evento que ya incluye lo leído). Las páginas lo mandan en
+    # ?desde= para recibir solo lo posterior. Si se confirma un cambio mientras se lee,
+    # se vuelve a leer: si no, la página lo sumaría dos veces o nunca.
+    for _ in range(intentos):
+        desde = ultimo_id()
+        resultado = leer()
+        if ultimo_id() == desde:
+            break
+    return resultado, desde
+
+# --- Repartidor (un hilo por worker) ---
+# Buffer de (secuencia local, id del evento, texto SSE). Las conexiones siguen la
+# secuencia local: los ids pueden llegar fuera de orden (ver VENTANA_IDS).
+_eventos = deque()
+_vistos = set()
+_condicion = threading.Condition()
+_aviso = threading.Event()
+# 'ultimo' y 'piso': mayor id leído y id desde el que se lee (None sin conexiones)
+_estado = {'pid': None, 'secuencia': 0, 'conexiones': 0, 'ultimo': None, 'piso': None,
+           'marca': None, 'limpieza': 0}
+
+def _texto(evento_id, tipo, datos):
+    # El evento listo para enviar, con los nombres de vehículo y área del momento
+    datos = json.loads(datos)
+    placas = {vehiculo.id: vehiculo.placa for vehiculo in catalogos.vehiculos()}
+    areas = {area.id: area.nombre for area in catalogos.areas()}
+    for elemento in [datos.get('fila'), datos.get('anterior')] + datos.get('deltas', []):
+        if isinstance(elemento, dict) and 'vehiculo_id' in elemento:
+            elemento['placa'] = placas.get(elemento['vehiculo_id'])
+            elemento['area'] = areas.get(elemento['area_id'])
+    return f'id: {evento_id}\nevent: {tipo}\ndata: {json.dumps(datos, ensure_ascii=False)}\n\n'
+
+def _leer(desde, excluir=(), limite=None):
+    consulta = (select(EventoCambio.id, EventoCambio.tipo, EventoCambio.datos)
+                .where(EventoCambio.id > desde).order_by(EventoCambio.id))
+    if excluir:
+        consulta = consulta.where(EventoCambio.id.notin_(excluir))
+    if limite:
+        consulta = consulta.limit(limite)
+    return [(fila.id, _texto(fila.id, fila.tipo, fila.datos)) for fila in db.session.execute(consulta)]
+
+def _leer_nuevos():
+    with _condicion:
+        if not _estado['conexiones']:
+            # Nadie escucha: no se lee nada. La próxima conexión vuelve a fijar el piso.
+            _estado['ultimo'] = _estado['piso'] = None
+            return
+        if _estado['ultimo'] is None:
+            # Una conexión recién abierta todavía no fijó el piso (_registrar)
+            return
+        desde = max(_estado['piso'], _estado['ultimo'] - VENTANA_IDS)
+        vistos = [evento_id for evento_id in _vistos if evento_id > desde]
+    nuevos = _leer(desde, vistos)
+    if not nuevos:
+        return
+    with _condicion:
+        for evento_id, texto in nuevos:
+            if evento_id in _vistos:
+                continue
+            if len(_eventos) >= BUFFER:
+                _vistos.discard(_eventos.popleft()[1])
+            _estado['secuencia'] += 1
+            _eventos.append((_estado['secuencia'], evento_id, texto))
+            _vistos.add(evento_id)
+            _estado['ultimo'] = max(_estado['ultimo'] or 0, evento_id)
+        _condicion.notify_all()
+
+def _limpiar_si_toca():
+    if time.monotonic() < _estado['limpieza']:
+        return
+    _estado['limpieza'] = time.monotonic() + 3600
+    limite = datetime.utcnow() - timedelta(hours=app.config['NOVEDADES_RETENCION_HORAS'])
+    db.session.execute(delete(EventoCambio).where(EventoCambio.creado < limite))
+    db.session.commit()
+
+def _repartir():
+    intervalo = app.config['NOVEDADES_INTERVALO_MS'] / 1000
+    while True:
+        despertado = _aviso.wait(intervalo)
+        _aviso.clear()
+        try:
+            with app.app_context():
+                marca = cache_http.version('evento_cambio')
+                if despertado or marca != _estado['marca']:
+                    _estado['marca'] = marca
+                    _leer_nuevos()
+                _limpiar_si_toca()
+        except Exception:
+            app.logger.exception('Error al leer las novedades')
+
+def _asegurar_repartidor():
+    # Un hilo por proceso: con preload_app los workers nacen por fork sin el del maestro
+    with _condicion:
+        if _estado['pid'] == os.getpid():
+            return
+        _eventos.clear()
+        _vistos.clear()
+        _estado.update(pid=os.getpid(), secuencia=0, conexiones=0, ultimo=None, piso=None)
+    threading.Thread(target=_repartir, name='novedades', daemon=True).start()
+
+# --- Conexiones SSE ---
+def _registrar(desde):
+    # (secuencia desde la que sigue esta conexión, eventos a repetir o None si son demasiados)
+    with _condicion:
+        if _estado['ultimo'] is None:
+            # Primera conexión: lo anterior a este id lo trae cada una de la BD (abajo)
+            _estado['ultimo'] = _estado['piso'] = ultimo_id()
+            _estado['marca'] = cache_http.version('evento_cambio')
+        secuencia = _estado['secuencia']
+    if desde is None:
+        return secuencia, []
+    repetidos = _leer(desde, limite=REPETIR_MAX + 1)
+    return secuencia, (repetidos if len(repetidos) <= REPETIR_MAX else None)
+
+def _reservar():
+    # Cuenta la conexión antes de responder: la comparación con el tope y el aumento van
+    # juntos, si no dos solicitudes simultáneas pasarían las dos con el último lugar.
+    # Devuelve la función que lo libera (una sola vez) o None si no hay lugar.
+    with _condicion:
+        if _estado['conexiones'] >= app.config['NOVEDADES_MAX_CONEXIONES']:
+            return None
+        _estado['conexiones'] += 1
+    liberada = []
+    def liberar():
+        with _condicion:
+            if not liberada:
+                liberada.append(True)
+                _estado['conexiones'] -= 1
+    return liberar
+
+def _flujo(desde, liberar):
+    try:
+        with app.app_context():
+            secuencia, repetidos = _registrar(desde)
+        yield f'retry: {RECONEXION_MS}\n\n'
+        if repetidos is None:
+            yield 'event: recarga\ndata: {}\n\n'
+            return
+        # Lo repetido desde la BD puede volver a aparecer en el buffer
+        enviados = set()
+        for evento_id, texto in repetidos:
+            enviados.add(evento_id)
+            yield texto
+        fin = time.monotonic() + app.config['NOVEDADES_DURACION']
+        latido = time.monotonic() + LATIDO
+        while time.monotonic() < fin:
+            with _condicion:
+                if _estado['secuencia'] == secuencia:
+                    _condicion.wait(max(0, min(latido, fin) - time.monotonic()))
+                if _eventos and _eventos[0][0] > secuencia + 1:
+                    # El buffer ya descartó eventos que esta conexión no envió
+                    pendientes = None
+                else:
+                    pendientes = [(evento_id, texto) for numero, evento_id, texto in _eventos if numero > secuencia]
+                secuencia = _estado['secuencia']
+            if pendientes is None:
+                yield 'event: recarga\ndata: {}\n\n'
+                return
+            for evento_id, texto in pendientes:
+                if evento_id not in enviados:
+                    yield texto
+            if time.monotonic() >= latido:
+                yield ': latido\n\n'
+                latido = time.monotonic() + LATIDO
+    finally:
+        liberar()
+
+def respuesta(desde):
+    # 'desde': Last-Event-ID del navegador o el id con el que se armó la página
+    try:
+        desde = int(desde) if desde not in (None, '') else None
+    except ValueError:
+        desde = None
+    _asegurar_repartidor()
+    liberar = _reservar()
+    if liberar is None:
+        return Response('Demasiadas conexiones abiertas, reintente más tarde.', 503,
+                        {'Retry-After': '30'}, mimetype='text/plain')
+    # Sin la sesión de la solicitud: la conexión espera sin retener nada de la BD
+    db.session.remove()
+    flujo = Response(_flujo(desde, liberar), mimetype='text/event-stream',
+                     headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+    # Si el navegador se va antes del primer envío el generador nunca arranca y su
+    # finally no corre: el lugar se libera también al cerrar la respuesta.
+    flujo.call_on_close(liberar)
+    return flujo
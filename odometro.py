@@ -0,0 +1,148 @@
+# odometro.py
+# Última lectura del odómetro de cada vehículo (tabla OdometroVehiculo): el km final del
+# viaje más reciente por (fecha_salida, id). Con ella el kiosko rechaza un viaje que
+# empieza por debajo de donde terminó el anterior y /vehiculos muestra el odómetro de
+# toda la flota, sin recorrer Bitacora.
+# Se mantiene en la misma transacción que cada alta, edición o baja (after_flush, igual
+# que resumen.py):
+#  - Un alta avanza la lectura con un UPSERT condicional (solo si el viaje es más
+#    reciente): dos registros simultáneos del mismo vehículo dejan siempre el último.
+#  - Una edición o baja recalcula el vehículo con una sola lectura por índice
+#    (ix_bitacora_vehiculo_fecha).
+#  - El control del kiosko se hace después de insertar el viaje, con la fila del
+#    vehículo bloqueada (FOR UPDATE en Postgres; en SQLite la escritura ya tiene la BD
+#    tomada): otro registro simultáneo espera y se valida contra la lectura nueva.
+from sqlalchemy import event, inspect, select, delete, update, and_, or_, func
+from app import app, db
+from models import Bitacora, BitacoraArchivada, Vehiculo, OdometroVehiculo
+
+CAMPOS = ('vehiculo_id', 'fecha_salida', 'kilometraje_salida', 'kilometraje_entrada')
+
+class OdometroRetrocede(ValueError):
+    def __init__(self, lectura):
+        super().__init__(
+            f'El kilometraje inicial no puede ser menor a {lectura.km:,.1f} km, la lectura del último '
+            f'viaje registrado para este vehículo ({lectura.fecha_salida.strftime("%Y-%m-%d")}).')
+        self.lectura = lectura
+
+def retrocede(lectura, fecha_salida, km_salida):
+    # Los viajes con fecha anterior al último registrado (cargados tarde) no se validan.
+    return lectura is not None and fecha_salida >= lectura.fecha_salida and km_salida < lectura.km
+
+def _lectura(bitacora_id, valores):
+    km = valores['kilometraje_entrada'] if valores['kilometraje_entrada'] is not None else valores['kilometraje_salida']
+    return {'vehiculo_id': valores['vehiculo_id'], 'bitacora_id': bitacora_id,
+            'fecha_salida': valores['fecha_salida'], 'km': km}
+
+# --- Escritura en la BD ---
+def _upsert(conexion):
+    dialecto = conexion.dialect.name
+    if dialecto == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialecto == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        return None
+    tabla = OdometroVehiculo.__table__
+    sentencia = insert(tabla)
+    nuevo = sentencia.excluded
+    return sentencia.on_conflict_do_update(
+        index_elements=[tabla.c.vehiculo_id],
+        set_={'bitacora_id': nuevo.bitacora_id, 'fecha_salida': nuevo.fecha_salida, 'km': nuevo.km},
+        where=or_(nuevo.fecha_salida > tabla.c.fecha_salida,
+                  and_(nuevo.fecha_salida == tabla.c.fecha_salida, nuevo.bitacora_id > tabla.c.bitacora_id))
+    )
+
+def avanzar(conexion, lecturas):
+    # Deja en cada vehículo la lectura más reciente entre la guardada y las nuevas.
+    ultimas = {}
+    for lectura in lecturas:
+        previa = ultimas.get(lectura['vehiculo_id'])
+        if previa is None or (lectura['fecha_salida'], lectura['bitacora_id']) > (previa['fecha_salida'], previa['bitacora_id']):
+            ultimas[lectura['vehiculo_id']] = lectura
+    if not ultimas:
+        return
+    sentencia = _upsert(conexion)
+    if sentencia is not None:
+        conexion.execute(sentencia, list(ultimas.values()))
+        return
+    # Otros motores: se compara con la guardada (bloqueada) y se reemplaza.
+    tabla = OdometroVehiculo.__table__
+    for lectura in ultimas.values():
+        guardada = leer(conexion, lectura['vehiculo_id'], bloquear=True)
+        if guardada is None:
+            conexion.execute(tabla.insert().values(**lectura))
+        elif (lectura['fecha_salida'], lectura['bitacora_id']) > (guardada.fecha_salida, guardada.bitacora_id):
+            conexion.execute(update(tabla).where(tabla.c.vehiculo_id == lectura['vehiculo_id']).values(**lectura))
+
+def recalcular(conexion, vehiculo_ids):
+    # Vuelve a leer el último viaje de cada vehículo (también lo usan las cargas masivas).
+    tabla = OdometroVehiculo.__table__
+    for vehiculo_id in vehiculo_ids:
+        # Si ya no le quedan viajes en bitacora, el último puede estar archivado (historico.py)
+        for modelo in (Bitacora, BitacoraArchivada):
+            ultimo = conexion.execute(
+                select(modelo.id, modelo.fecha_salida,
+                       func.coalesce(modelo.kilometraje_entrada, modelo.kilometraje_salida))
+                .where(modelo.vehiculo_id == vehiculo_id)
+                .order_by(modelo.fecha_salida.desc(), modelo.id.desc())
+                .limit(1)
+            ).first()
+            if ultimo is not None:
+                break
+        conexion.execute(delete(tabla).where(tabla.c.vehiculo_id == vehiculo_id))
+        if ultimo is not None:
+            conexion.execute(tabla.insert().values(vehiculo_id=vehiculo_id, bitacora_id=ultimo[0],
+                                                   fecha_salida=ultimo[1], km=ultimo[2]))
+
+def leer(conexion, vehiculo_id, bloquear=False):
+    tabla = OdometroVehiculo.__table__
+    consulta = select(tabla).where(tabla.c.vehiculo_id == vehiculo_id)
+    if bloquear:
+        consulta = consulta.with_for_update()
+    return conexion.execute(consulta).first()
+
+def _vehiculos_anteriores_y_actuales(bitacora):
+    historia = inspect(bitacora).attrs.vehiculo_id.history
+    return set(historia.deleted or historia.unchanged or ()) | {bitacora.vehiculo_id}
+
+@event.listens_for(db.session, 'after_flush')
+def actualizar_odometros(session, flush_context):
+    nuevas = [objeto for objeto in session.new if isinstance(objeto, Bitacora)]
+    a_recalcular = set()
+    for objeto in session.deleted:
+        if isinstance(objeto, Bitacora):
+            a_recalcular |= _vehiculos_anteriores_y_actuales(objeto)
+    for objeto in session.dirty:
+        if isinstance(objeto, Bitacora) and any(inspect(objeto).attrs[campo].history.has_changes()
+                                                for campo in CAMPOS):
+            a_recalcular |= _vehiculos_anteriores_y_actuales(objeto)
+    if not nuevas and not a_recalcular:
+        return
+    conexion = session.connection()
+    for bitacora in nuevas:
+        lectura = leer(conexion, bitacora.vehiculo_id, bloquear=True)
+        if retrocede(lectura, bitacora.fecha_salida, bitacora.kilometraje_salida):
+            raise OdometroRetrocede(lectura)
+    avanzar(conexion, [_lectura(bitacora.id, {campo: getattr(bitacora, campo) for campo in CAMPOS})
+                       for bitacora in nuevas if bitacora.vehiculo_id not in a_recalcular])
+    recalcular(conexion, a_recalcular)
+
+# --- Reconstrucción completa (carga inicial o corrección) ---
+def reconstruir():
+    vehiculo_ids = [fila[0] for fila in db.session.execute(select(Vehiculo.id))]
+    recalcular(db.session.connection(), vehiculo_ids)
+    db.session.commit()
+    return db.session.query(func.count()).select_from(OdometroVehiculo).scalar()
+
+@app.cli.command('reconstruir-odometros')
+def reconstruir_odometros_comando():
+    """Recalcula la última lectura del odómetro de cada vehículo a partir de sus bitácoras."""
+    db.create_all()
+    filas = reconstruir()
+    print(f'Odómetros reconstruidos: {filas} vehículos con viajes.')
+
+# --- Lecturas para las vistas ---
+def lecturas():
+    # {vehiculo_id: OdometroVehiculo} de toda la flota
+    return {lectura.vehiculo_id: lectura for lectura in OdometroVehiculo.query.all()}
@@ -0,0 +1,101 @@
+# paquetes.py
+# Paquete ZIP con un PDF por vehículo (o por área) para las firmas de fin de mes.
+# Cada PDF se renderiza en paralelo en un pool de procesos con el mismo diseño de
+# pdf_reportes.py, y el ZIP se envía al cliente a medida que cada parte termina.
+import re
+import threading
+import zipfile
+from flask import g
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from sqlalchemy import select, func
+from app import app, db
+from models import Bitacora, Vehiculo, Area
+from consultas import leer_filtros, aplicar_filtros, parametros_url, filas_por_lotes
+from exportacion import Tuberia
+from pdf_reportes import construir_pdf
+from trabajos import iniciar_proceso
+import cache_reportes
+import historico
+
+# Por qué columna se separa el paquete: (columna en Bitacora, modelo, etiqueta, filtro)
+AGRUPACIONES = {
+    'vehiculo': (Bitacora.vehiculo_id, Vehiculo, Vehiculo.placa, 'vehiculo_id'),
+    'area': (Bitacora.area_id, Area, Area.nombre, 'area_id'),
+}
+
+_ejecutor = None
+_candado = threading.Lock()
+
+def _obtener_ejecutor():
+    global _ejecutor
+    with _candado:
+        if _ejecutor is None:
+            _ejecutor = ProcessPoolExecutor(max_workers=app.config['REPORTES_PAQUETE_PROCESOS'],
+                                            initializer=iniciar_proceso)
+        return _ejecutor
+
+def grupos_consulta(filtros, por, origen=Bitacora):
+    # 'origen': Bitacora o BitacoraArchivada (historico.py)
+    columna, modelo, etiqueta, _ = AGRUPACIONES[por]
+    columna = getattr(origen, columna.key)
+    consulta = select(columna, etiqueta).join(modelo, columna == modelo.id).group_by(columna, etiqueta)
+    return aplicar_filtros(consulta, filtros, origen).order_by(etiqueta)
+
+def grupos(filtros, por):
+    # [(id, etiqueta)] de los vehículos/áreas que tienen bitácoras con estos filtros.
+    encontrados = set()
+    for origen in historico.modelos(filtros):
+        encontrados.update(tuple(fila) for fila in db.session.execute(grupos_consulta(filtros, por, origen)))
+    return sorted(encontrados, key=lambda grupo: grupo[1])
+
+def nombre_archivo(etiqueta):
+    # Conserva letras con acento y ñ (zipfile guarda el nombre en UTF-8); solo se quitan
+    # separadores de ruta y otros símbolos.
+    return re.sub(r'[^\w.-]+', '_', str(etiqueta)).strip('_.') or 'sin_nombre'
+
+def nombres_archivo(grupos_encontrados):
+    # {id: nombre del PDF en el ZIP}. Dos etiquetas que quedan iguales al limpiarlas
+    # llevan además el id del vehículo/área, para no repetir entradas en el ZIP.
+    nombres = {grupo_id: nombre_archivo(etiqueta) for grupo_id, etiqueta in grupos_encontrados}
+    repetidos = {nombre for nombre in nombres.values() if list(nombres.values()).count(nombre) > 1}
+    return {grupo_id: f'{nombre}_{grupo_id}' if nombre in repetidos else nombre
+            for grupo_id, nombre in nombres.items()}
+
+# --- Lo que corre dentro del proceso hijo ---
+def _renderizar_parte(parametros, usar_replica=False):
+    with app.app_context():
+        g.usar_replica = usar_replica
+        try:
+            filtros = leer_filtros(parametros)
+            generacion = cache_reportes.generacion()
+            contenido = cache_reportes.obtener(filtros)
+            if contenido is None:
+                contenido = construir_pdf(filas_por_lotes(filtros))
+                cache_reportes.guardar(filtros, contenido, generacion)
+            return contenido
+        finally:
+            db.session.remove()
+
+# --- Generador del ZIP (usado por routes.reporte_paquete) ---
+def generar_zip(filtros, por):
+    _, _, _, clave_filtro = AGRUPACIONES[por]
+    pendientes = {}
+    ejecutor = _obtener_ejecutor()
+    # Los hijos leen de la misma base que la vista (réplica o principal, ver replica.py)
+    usar_replica = g.get('usar_replica', False)
+    for grupo_id, nombre in nombres_archivo(grupos(filtros, por)).items():
+        parametros = dict(parametros_url(filtros), **{clave_filtro: str(grupo_id)})
+        pendientes[ejecutor.submit(_renderizar_parte, parametros, usar_replica)] = nombre
+
+    tuberia = Tuberia()
+    try:
+        with zipfile.ZipFile(tuberia, 'w', zipfile.ZIP_STORED) as paquete:
+            # Los PDF ya vienen comprimidos: se guardan sin volver a comprimir.
+            for futuro in as_completed(pendientes):
+                paquete.writestr(f'{pendientes[futuro]}.pdf', futuro.result())
+                yield tuberia.vaciar()
+        yield tuberia.vaciar()
+    finally:
+        # Si el cliente cancela la descarga no se siguen renderizando las partes que faltan.
+        for futuro in pendientes:
+            futuro.cancel()
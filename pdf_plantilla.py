@@ -0,0 +1,194 @@
+# pdf_plantilla.py
+# Diseño de la página del reporte (encabezado con logo y pie) sobre fpdf2. Separado de
+# pdf_reportes.py para que fpdf, fontTools y Pillow se importen recién al armar el
+# primer PDF de cada proceso y no al arrancar cada worker.
+from fpdf import FPDF
+from fpdf.fonts import TTFFont, SubsetMap
+from fpdf.util import escape_parens
+from fpdf.image_parsing import preload_image
+from fpdf.image_datastructures import ImageCache
+from fontTools import ttLib, subset as ftsubset
+from io import BytesIO
+import copy
+import os
+import threading
+from app import app
+
+# -----------------------------------------------------------------
+# LOGO (se lee y decodifica una sola vez por proceso)
+# -----------------------------------------------------------------
+RUTA_LOGO = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static', 'img', 'logo.png')
+_logo = None
+
+def logo_preparado():
+    # Devuelve la imagen ya decodificada (PNG -> datos comprimidos + máscara alfa) o None.
+    # fpdf2 solo la reutiliza dentro del mismo documento; así se comparte entre todos.
+    global _logo
+    if _logo is None:
+        try:
+            _logo = preload_image(ImageCache(), RUTA_LOGO)[2]
+        except Exception:
+            _logo = False
+    return _logo or None
+
+# -----------------------------------------------------------------
+# FUENTE UNICODE (se analiza una sola vez por proceso)
+# add_font() de fpdf2 vuelve a leer el TTF y a calcular anchos y glifos de todos sus
+# caracteres (~50 ms) en cada documento. Acá se analiza una vez por proceso y cada PDF
+# recibe una copia liviana: métricas, cmap y anchos compartidos; propio solo el
+# subconjunto de glifos (crece a medida que el documento usa caracteres nuevos y al
+# final se incrustan solo esos).
+# Al generar el archivo fpdf recorta el TTF a ese subconjunto, y recortar el archivo
+# completo (~6000 glifos) cuesta ~100 ms por estilo. Por eso recibe un TTF ya recortado
+# a latin-1 + los glifos del documento, guardado por proceso (_recortes): casi todos los
+# reportes caen en el mismo y fpdf solo lo achica a lo justo (~10 ms).
+# Sin los TTF (PDF_FUENTE, PDF_FUENTE_NEGRITA) se usa Helvetica, solo latin-1.
+# -----------------------------------------------------------------
+FAMILIA = 'DejaVu'
+# Caracteres que entran siempre en el recorte previo: latin-1 y la puntuación tipográfica común
+CARACTERES_BASE = [*range(0x20, 0x7F), *range(0xA0, 0x100), *map(ord, '€‘’‚“”„–—…•')]
+# Tablas que fpdf descarta igual al incrustar la fuente
+TABLAS_DESCARTADAS = ['FFTM', 'GDEF', 'GPOS', 'GSUB', 'MATH', 'hdmx', 'meta', 'sbix', 'CBDT',
+                      'CBLC', 'EBDT', 'EBLC', 'EBSC', 'SVG ', 'CPAL', 'COLR']
+RECORTES_MAX = 16
+_fuentes = {}  # estilo -> (TTFFont analizada, bytes del archivo, glifos de CARACTERES_BASE)
+_recortes = {}  # (estilo, glifos) -> bytes del TTF recortado, con sus nombres de glifo
+_candado_fuentes = threading.Lock()
+
+class FuenteUnicode(TTFFont):
+    __slots__ = ('_traduccion', '_estilo')
+
+    def encode_text(self, text):
+        # Igual que TTFFont.encode_text, pero cada carácter se busca en el subconjunto
+        # solo la primera vez en el documento; después es un str.translate directo a su
+        # código de glifo ya escrito como en el PDF (dos bytes UTF-16BE, con escapes).
+        traduccion = self._traduccion
+        for caracter in dict.fromkeys(text):
+            codigo = ord(caracter)
+            if codigo not in traduccion:
+                # Sin glifo en la fuente: .notdef (fpdf lo anota en missing_glyphs)
+                glifo = chr(self.subset.pick(codigo) or 0)
+                traduccion[codigo] = escape_parens(glifo.encode('utf-16-be').decode('latin-1'))
+        return f'({text.translate(traduccion)}) Tj'
+
+    def preparar_recorte(self):
+        # Antes de generar el archivo: el TTF que fpdf recorta e incrusta
+        base = _fuente_analizada(self._estilo)[2]
+        glifos = base.union(self.subset.get_all_glyph_names())
+        self.ttfont = ttLib.TTFont(BytesIO(_recorte(self._estilo, glifos)), recalcTimestamp=False, lazy=True)
+
+def _archivos_fuente():
+    return {'': app.config['PDF_FUENTE'], 'B': app.config['PDF_FUENTE_NEGRITA']}
+
+def fuente_unicode_disponible():
+    return all(ruta and os.path.isfile(ruta) for ruta in _archivos_fuente().values())
+
+def _fuente_analizada(estilo):
+    with _candado_fuentes:
+        if estilo not in _fuentes:
+            ruta = _archivos_fuente()[estilo]
+            analizador = FPDF()
+            analizador.add_font(FAMILIA, estilo, ruta)
+            analizada = analizador.fonts[f'{FAMILIA.lower()}{estilo}']
+            with open(ruta, 'rb') as archivo:
+                contenido = archivo.read()
+            glifos = frozenset(analizada.cmap[codigo] for codigo in CARACTERES_BASE if codigo in analizada.cmap)
+            _fuentes[estilo] = (analizada, contenido, glifos)
+        return _fuentes[estilo]
+
+def _recorte(estilo, glifos):
+    clave = (estilo, glifos)
+    with _candado_fuentes:
+        if clave in _recortes:
+            return _recortes[clave]
+    fuente = ttLib.TTFont(BytesIO(_fuente_analizada(estilo)[1]), recalcTimestamp=False, lazy=True)
+    # Con los nombres de glifo: fpdf vuelve a recortar y a buscar los glifos por nombre
+    opciones = ftsubset.Options(notdef_outline=True, recommended_glyphs=True, glyph_names=True)
+    opciones.drop_tables += TABLAS_DESCARTADAS
+    recortador = ftsubset.Subsetter(opciones)
+    recortador.populate(glyphs=glifos)
+    recortador.subset(fuente)
+    salida = BytesIO()
+    fuente.save(salida)
+    with _candado_fuentes:
+        if len(_recortes) >= RECORTES_MAX:
+            _recortes.pop(next(iter(_recortes)))
+        _recortes[clave] = salida.getvalue()
+    return _recortes[clave]
+
+def agregar_fuente(pdf, estilo):
+    base = _fuente_analizada(estilo)[0]
+    fuente = FuenteUnicode.__new__(FuenteUnicode)
+    for atributo in TTFFont.__slots__:
+        if hasattr(base, atributo):
+            setattr(fuente, atributo, getattr(base, atributo))
+    fuente.i = len(pdf.fonts) + 1
+    # El TTF a incrustar se arma al generar el archivo (preparar_recorte)
+    fuente.ttfont = None
+    fuente.missing_glyphs = []
+    fuente.biggest_size_pt = 0
+    fuente.subset = SubsetMap(fuente)
+    fuente._traduccion = {}
+    fuente._estilo = estilo
+    pdf.fonts[fuente.fontkey] = fuente
+
+# -----------------------------------------------------------------
+# CLASE PDF ESTILIZADA
+# -----------------------------------------------------------------
+class PDF(FPDF):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.unicode = fuente_unicode_disponible()
+        if self.unicode:
+            agregar_fuente(self, '')
+            agregar_fuente(self, 'B')
+        # Familia del reporte: el encabezado, el pie y la tabla (pdf_reportes.py)
+        self.fuente = FAMILIA if self.unicode else 'Helvetica'
+
+    def output(self, *args, **kwargs):
+        for fuente in self.fonts.values():
+            if isinstance(fuente, FuenteUnicode):
+                fuente.preparar_recorte()
+        return super().output(*args, **kwargs)
+
+    def safe_str(self, text):
+        if self.unicode:
+            return str(text or '')
+        return str(text or '').encode('latin-1', 'replace').decode('latin-1')
+
+    def header(self):
+        # 1. Fondo del Encabezado (Azul Oscuro)
+        self.set_fill_color(28, 40, 51)
+        # Altura 25mm para que quepa el logo
+        self.rect(0, 0, 297, 25, 'F') 
+        
+        # 2. LOGO DE LA INSTITUCIÓN
+        logo = logo_preparado()
+        if logo:
+            if RUTA_LOGO not in self.image_cache.images and not logo.get('iccp'):
+                # Copia del logo ya decodificado, numerada como la primera imagen de este documento.
+                self.image_cache.images[RUTA_LOGO] = copy.copy(logo)
+                self.image_cache.images[RUTA_LOGO].update(i=len(self.image_cache.images), usages=0)
+            # Logo a la izquierda
+            self.image(RUTA_LOGO, x=10, y=2.5, h=20)
+        
+        # 3. Título (CENTRADO PERFECTO)
+        self.set_font(self.fuente, 'B', 14)
+        self.set_text_color(255, 255, 255)
+        
+        # Movemos el cursor verticalmente para centrar el texto en la barra azul
+        self.set_y(8) 
+        
+        # width=0 significa "todo el ancho de la página"
+        # align='C' significa Centrado
+        self.cell(0, 10, self.safe_str('REPORTE DE BITÁCORAS VEHICULARES - YLB'), 0, 1, 'C')
+        
+        # Salto de línea para salir del header azul
+        self.ln(15)
+
+    def footer(self):
+        self.set_y(-15)
+        # La fuente Unicode no trae cursiva
+        self.set_font(self.fuente, '' if self.unicode else 'I', 8)
+        self.set_text_color(128, 128, 128)
+        self.cell(0, 10, self.safe_str(f'Página {self.page_no()}/{{nb}}'), 0, 0, 'C')
@@ -0,0 +1,195 @@
+# pdf_reportes.py
+# Construcción del PDF de bitácoras. Vive fuera de routes.py para que lo usen tanto
+# la descarga directa (/reporte/pdf) como los procesos de trabajos.py.
+# fpdf se importa dentro de construir_pdf (ver pdf_plantilla.py).
+from itertools import accumulate
+import time
+import metricas
+
+# Cada cuántas filas se informa el avance al callback 'progreso'
+PROGRESO_CADA = 200
+
+# -----------------------------------------------------------------
+# RENDERIZADOR DE TABLAS
+# Offsets de columna calculados una vez, una sola pasada de corte de líneas por celda
+# (que sirve para medir y para dibujar) y salto de página ANTES de una fila que no
+# cabe, así las filas nunca se parten entre páginas.
+# Se dibuja con rect() + text(): cell()/multi_cell() de fpdf2 rehacen el cálculo de
+# anchos carácter por carácter en cada llamada y eran el grueso del tiempo.
+# columnas: lista de (titulo, ancho, alineacion, multilinea)
+# La familia es la del documento (pdf.fuente: DejaVu con Unicode o Helvetica).
+# -----------------------------------------------------------------
+TAMANO_FUENTE = 8
+# {(fuente, tamaño): anchos por carácter en mm}, por proceso: la fuente Unicode trae
+# miles de caracteres y escalarlos en cada documento costaba ~5 ms
+_anchos_por_fuente = {}
+
+def anchos_caracter(pdf):
+    clave = (pdf.current_font.name, pdf.font_size)
+    if clave not in _anchos_por_fuente:
+        # Las fuentes TTF indexan sus anchos por código, las de fpdf por carácter
+        escala = pdf.font_size / 1000
+        _anchos_por_fuente[clave] = {chr(c) if isinstance(c, int) else c: w * escala
+                                     for c, w in pdf.current_font.cw.items()}
+    return _anchos_por_fuente[clave]
+
+class TablaPDF:
+    def __init__(self, pdf, columnas, alto_linea=8):
+        self.pdf = pdf
+        self.columnas = columnas
+        self.alto_linea = alto_linea
+        anchos = [ancho for _, ancho, _, _ in columnas]
+        self.posiciones = [pdf.l_margin + x for x in accumulate([0] + anchos[:-1])]
+        # Ancho útil para texto dentro de cada celda (descontando el margen interno)
+        self.ancho_texto = [ancho - 2 * pdf.c_margin for ancho in anchos]
+        # El salto de página lo decide la tabla, no fpdf a mitad de una celda.
+        pdf.set_auto_page_break(False, margin=pdf.b_margin)
+        pdf.set_font(pdf.fuente, '', TAMANO_FUENTE)
+        # Tabla de anchos por carácter de la fuente del cuerpo, ya escalada a mm
+        self._anchos_caracter = anchos_caracter(pdf)
+        self._ancho_espacio = self._anchos_caracter.get(' ', 0)
+        self._baseline = 0.5 * alto_linea + 0.3 * pdf.font_size
+
+    def encabezado(self):
+        pdf = self.pdf
+        pdf.set_font(pdf.fuente, 'B', TAMANO_FUENTE)
+        pdf.set_fill_color(220, 220, 220)
+        pdf.set_draw_color(0, 0, 0)
+        pdf.set_text_color(0, 0, 0)
+        pdf.set_x(pdf.l_margin)
+        for titulo, ancho, _, _ in self.columnas:
+            pdf.cell(ancho, self.alto_linea, titulo, border=1, align='C', fill=True)
+        pdf.ln(self.alto_linea)
+        pdf.set_font(pdf.fuente, '', TAMANO_FUENTE)
+        pdf.set_draw_color(200, 200, 200)
+        self.lineas_por_pagina = max(1, int((pdf.page_break_trigger - pdf.get_y()) // self.alto_linea))
+
+    def ancho(self, texto):
+        anchos = self._anchos_caracter
+        return sum(anchos.get(c, 0) for c in texto)
+
+    def partir(self, texto, disponible):
+        # Corte por palabras (y por caracteres si una palabra no cabe sola).
+        lineas = []
+        for parrafo in texto.replace('\r', '').split('\n'):
+            actual, ancho_actual = '', 0
+            for palabra in parrafo.split(' '):
+                ancho_palabra = self.ancho(palabra)
+                if actual and ancho_actual + self._ancho_espacio + ancho_palabra <= disponible:
+                    actual += ' ' + palabra
+                    ancho_actual += self._ancho_espacio + ancho_palabra
+                    continue
+                if actual:
+                    lineas.append(actual)
+                while ancho_palabra > disponible and len(palabra) > 1:
+                    corte, ancho_corte = 0, 0
+                    while corte < len(palabra) and ancho_corte + self._anchos_caracter.get(palabra[corte], 0) <= disponible:
+                        ancho_corte += self._anchos_caracter.get(palabra[corte], 0)
+                        corte += 1
+                    corte = max(corte, 1)
+                    lineas.append(palabra[:corte])
+                    palabra = palabra[corte:]
+                    ancho_palabra = self.ancho(palabra)
+                actual, ancho_actual = palabra, ancho_palabra
+            lineas.append(actual)
+        return lineas
+
+    def fila(self, valores, relleno):
+        # 'valores' ya vienen como texto seguro para la fuente (uno por columna).
+        pdf = self.pdf
+        celdas = []
+        lineas_fila = 1
+        for (_, _, _, multilinea), disponible, texto in zip(self.columnas, self.ancho_texto, valores):
+            lineas = self.partir(texto, disponible) if multilinea else [texto]
+            lineas_fila = max(lineas_fila, len(lineas))
+            celdas.append(lineas)
+        if pdf.get_y() + lineas_fila * self.alto_linea > pdf.page_break_trigger:
+            self._nueva_pagina()
+        # Solo una fila más alta que una página entera se reparte entre páginas.
+        while lineas_fila > self.lineas_por_pagina:
+            corte = self.lineas_por_pagina
+            self._dibujar([lineas[:corte] for lineas in celdas], corte, relleno)
+            celdas = [lineas[corte:] for lineas in celdas]
+            lineas_fila -= corte
+            self._nueva_pagina()
+        self._dibujar(celdas, lineas_fila, relleno)
+
+    def _nueva_pagina(self):
+        self.pdf.add_page()
+        self.encabezado()
+
+    def _dibujar(self, celdas, lineas_fila, relleno):
+        pdf = self.pdf
+        alto = lineas_fila * self.alto_linea
+        y = pdf.get_y()
+        pdf.set_fill_color(*relleno)
+        for (_, ancho, alineacion, _), x, lineas in zip(self.columnas, self.posiciones, celdas):
+            pdf.rect(x, y, ancho, alto, 'DF')
+            y_linea = y + self._baseline
+            for linea in lineas:
+                if linea:
+                    if alineacion == 'L':
+                        x_texto = x + pdf.c_margin
+                    elif alineacion == 'R':
+                        x_texto = x + ancho - pdf.c_margin - self.ancho(linea)
+                    else:
+                        x_texto = x + (ancho - self.ancho(linea)) / 2
+                    pdf.text(x_texto, y_linea, linea)
+                y_linea += self.alto_linea
+        pdf.set_xy(pdf.l_margin, y + alto)
+
+# -----------------------------------------------------------------
+# CONSTRUCCIÓN DEL DOCUMENTO
+# 'filas' es cualquier iterable de filas de consultas.filas_reporte().
+# 'progreso(n)' se llama cada PROGRESO_CADA filas con el total procesado.
+# -----------------------------------------------------------------
+COLUMNAS = [
+    ('FECHA', 18, 'C', False),
+    ('RESPONSABLE DE USO', 40, 'L', True),
+    ('KM. INI', 15, 'R', False),
+    ('KM. FIN', 15, 'R', False),
+    ('KM. REC', 15, 'R', False),
+    ('LITROS', 15, 'R', False),
+    ('ACTIVIDAD / OBSERVACIONES', 105, 'L', True),
+    ('SECTOR', 34, 'L', True),
+    ('FIRMA', 20, 'C', False),
+]
+RELLENOS = [(255, 255, 255), (245, 245, 245)]
+
+def safe_str(text):
+    # Para fuentes de fpdf sin Unicode (Helvetica): lo que no es latin-1 sale como '?'
+    return str(text or '').encode('latin-1', 'replace').decode('latin-1')
+
+def valores_pdf(fila, texto=safe_str):
+    # 'texto': cómo se pasan los campos libres a la fuente del documento (PDF.safe_str)
+    km_recorrido = fila.kilometraje_entrada - fila.kilometraje_salida
+    return [
+        fila.fecha_salida.strftime('%Y-%m-%d'),
+        texto(fila.nombre_conductor),
+        str(fila.kilometraje_salida),
+        str(fila.kilometraje_entrada),
+        str(round(km_recorrido, 2)),
+        str(fila.litros_combustible or 0),
+        texto(fila.descripcion_trabajo),
+        texto(fila.area),
+        ''
+    ]
+
+def construir_pdf(filas, progreso=None):
+    from pdf_plantilla import PDF
+    inicio = time.perf_counter()
+    pdf = PDF(orientation='L', unit='mm', format='A4')
+    pdf.add_page()
+    tabla = TablaPDF(pdf, COLUMNAS)
+    tabla.encabezado()
+
+    procesadas = 0
+    for procesadas, fila in enumerate(filas, 1):
+        tabla.fila(valores_pdf(fila, pdf.safe_str), RELLENOS[procesadas % 2 == 0])
+        if progreso and procesadas % PROGRESO_CADA == 0:
+            progreso(procesadas)
+    if progreso:
+        progreso(procesadas)
+    contenido = bytes(pdf.output())
+    metricas.observar_pdf(time.perf_counter() - inicio, procesadas)
+    return contenido
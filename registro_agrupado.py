@@ -0,0 +1,115 @@
+# registro_agrupado.py
+# Alta de bitácoras del kiosko con commit agrupado (KIOSKO_COMMIT_AGRUPADO): en el cambio
+# de turno muchos conductores envían a la vez y cada commit es una escritura sincrónica
+# a disco; en SQLite además cada uno espera el bloqueo de la base. Con el modo activo las
+# altas que llegan a un mismo worker dentro de KIOSKO_AGRUPAR_MS se confirman juntas en
+# una sola transacción.
+#  - Sirve con gunicorn en hilos (GUNICORN_THREADS): se agrupan las solicitudes del mismo
+#    worker. Con workers de un solo hilo no hay nada que juntar.
+#  - No hay hilo aparte: la primera solicitud que encuentra la cola libre hace de líder,
+#    espera la ventana, confirma el lote y le pasa la posta a la siguiente que quedó en
+#    cola. Cada solicitud responde recién cuando su fila está confirmada.
+#  - Cada fila se envía (flush) por separado dentro de la transacción, así los controles
+#    de after_flush (odómetro, resumen) ven las filas anteriores del lote igual que si
+#    llegaran una por una. Si una fila falla, se deshace el lote, esa solicitud recibe su
+#    propio error (p. ej. OdometroRetrocede) y las demás se confirman sin ella.
+import threading
+import time
+from app import app, db
+from models import Bitacora
+
+class _Pendiente:
+    def __init__(self, valores):
+        self.valores = valores
+        self.bitacora_id = None
+        self.error = None
+        self.lider = False
+        self.terminada = False
+        # Se activa cuando la fila quedó confirmada (o falló) o cuando le toca ser líder
+        self.aviso = threading.Event()
+
+_cola = []
+_estado = {'lider': False, 'ultimo_lote': 0}
+_candado = threading.Lock()
+
+def registrar(valores):
+    # Crea la bitácora con 'valores' (columnas de Bitacora), la confirma y devuelve su id.
+    # Lanza el error de esa fila (OdometroRetrocede, errores de la BD).
+    if not app.config['KIOSKO_COMMIT_AGRUPADO']:
+        return _insertar(valores)
+    pendiente = _Pendiente(valores)
+    with _candado:
+        _cola.append(pendiente)
+        if not _estado['lider']:
+            _estado['lider'] = pendiente.lider = True
+    if not pendiente.lider:
+        pendiente.aviso.wait()
+    elif _estado['ultimo_lote'] > 1:
+        # Ventana para que se sumen las altas que llegan casi juntas. Si el lote anterior
+        # fue de una sola alta no hay concurrencia que esperar y se confirma enseguida;
+        # las que lleguen mientras tanto forman el lote siguiente.
+        time.sleep(app.config['KIOSKO_AGRUPAR_MS'] / 1000)
+    if not pendiente.terminada:
+        # Líder desde el principio o por posta: siempre es la primera de la cola, así que
+        # su propia fila va en el lote que confirma.
+        _confirmar_lote()
+    if pendiente.error is not None:
+        raise pendiente.error
+    return pendiente.bitacora_id
+
+def _insertar(valores):
+    bitacora = Bitacora(**valores)
+    db.session.add(bitacora)
+    db.session.flush()
+    bitacora_id = bitacora.id
+    db.session.commit()
+    return bitacora_id
+
+def _confirmar_lote():
+    with _candado:
+        lote = _cola[:app.config['KIOSKO_LOTE_MAX']]
+        del _cola[:len(lote)]
+        _estado['ultimo_lote'] = len(lote)
+    try:
+        _guardar(lote)
+    finally:
+        for pendiente in lote:
+            if pendiente.bitacora_id is None and pendiente.error is None:
+                pendiente.error = RuntimeError('No se pudo confirmar el lote de bitácoras.')
+            pendiente.terminada = True
+            pendiente.aviso.set()
+        with _candado:
+            if _cola:
+                _cola[0].lider = True
+                _cola[0].aviso.set()
+            else:
+                _estado['lider'] = False
+
+def _guardar(lote):
+    # Un solo commit para todo el lote. Si el alta de una fila falla (su flush lanza el
+    # error), esa fila se queda con el error y las demás se reintentan en otra
+    # transacción. Si lo que falla es el commit, el error es de todas.
+    restantes = list(lote)
+    while restantes:
+        ids = []
+        fila = None
+        try:
+            for fila in restantes:
+                bitacora = Bitacora(**fila.valores)
+                db.session.add(bitacora)
+                db.session.flush()
+                ids.append(bitacora.id)
+            fila = None
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            if fila is None:
+                for pendiente in restantes:
+                    pendiente.error = e
+                return
+            fila.error = e
+            restantes.remove(fila)
+            continue
+        for pendiente, bitacora_id in zip(restantes, ids):
+            pendiente.bitacora_id = bitacora_id
+        return
@@ -0,0 +1,67 @@
+# replica.py
+# Lecturas pesadas (reportes, exportaciones, panel, listados) en una réplica de solo
+# lectura cuando DATABASE_REPLICA_URL está definida (SQLALCHEMY_BINDS['replica']).
+# Solo se desvían los SELECT de las vistas marcadas con @solo_lectura; las escrituras,
+# el login, el kiosko y todo lo demás siguen en la base principal.
+#  - Quien acaba de escribir (cualquier POST) lee de la principal durante
+#    REPLICA_RETRASO_MAX segundos, para ver su propio cambio aunque la réplica vaya atrasada.
+#  - Si la réplica no responde, la vista se repite contra la principal y la réplica
+#    queda fuera de uso por REPLICA_REINTENTO segundos.
+import time
+from functools import wraps
+from flask import g, session, request, current_app, has_app_context
+from flask_sqlalchemy.session import Session
+from sqlalchemy.exc import OperationalError, InterfaceError
+
+BIND = 'replica'
+_estado = {'caida_hasta': 0.0}
+
+def configurada():
+    return BIND in (current_app.config.get('SQLALCHEMY_BINDS') or {})
+
+def disponible():
+    return configurada() and time.monotonic() >= _estado['caida_hasta']
+
+def _usar_replica():
+    return has_app_context() and g.get('usar_replica', False)
+
+class SesionConReplica(Session):
+    # Sesión de db (ver app.py): con la marca de @solo_lectura, los SELECT van a la réplica.
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if (bind is None and not self._flushing and clause is not None
+                and getattr(clause, 'is_select', False) and _usar_replica()):
+            return self._db.engines[BIND]
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+def _marcar_caida(error):
+    _estado['caida_hasta'] = time.monotonic() + current_app.config['REPLICA_REINTENTO']
+    current_app.logger.warning('Réplica de lectura no disponible, se usa la principal: %s', error)
+
+def solo_lectura(f):
+    # Para vistas que solo leen. Va debajo de login_required/admin_required.
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if not disponible() or time.time() < session.get('leer_principal_hasta', 0):
+            return f(*args, **kwargs)
+        from app import db
+        # La marca dura toda la solicitud: también la usan las respuestas en streaming.
+        g.usar_replica = True
+        try:
+            return f(*args, **kwargs)
+        except (OperationalError, InterfaceError) as e:
+            # La vista solo lee: repetirla contra la principal no tiene efectos secundarios.
+            db.session.rollback()
+            _marcar_caida(e.orig)
+            g.usar_replica = False
+            return f(*args, **kwargs)
+    return decorated_function
+
+def _despues_de_escribir(respuesta):
+    if request.method not in ('GET', 'HEAD', 'OPTIONS') and respuesta.status_code < 400:
+        session['leer_principal_hasta'] = time.time() + current_app.config['REPLICA_RETRASO_MAX']
+    return respuesta
+
+def instalar(app):
+    # La llama app.py. Sin réplica configurada no registra nada.
+    if BIND in (app.config.get('SQLALCHEMY_BINDS') or {}):
+        app.after_request(_despues_de_escribir)
@@ -0,0 +1,162 @@
+# resumen.py
+# Mantiene la tabla ResumenDiario (viajes, km recorridos y litros por día x vehículo x área)
+# para que el panel de admin no tenga que recorrer toda la tabla Bitacora.
+# Cada flush de la sesión que crea, edita o elimina bitácoras suma/resta su aporte con un
+# UPSERT atómico en la misma transacción: si el commit falla, el resumen tampoco cambia.
+from collections import defaultdict
+from sqlalchemy import event, inspect, func, select, delete, update, and_, union_all
+from app import app, db
+from models import Bitacora, BitacoraArchivada, ResumenDiario
+
+CAMPOS = ('fecha_salida', 'vehiculo_id', 'area_id', 'kilometraje_salida',
+          'kilometraje_entrada', 'litros_combustible')
+
+def _aporte(valores):
+    # (clave, (viajes, km, litros)) de una bitácora dada como dict de CAMPOS
+    clave = (valores['fecha_salida'].date(), valores['vehiculo_id'], valores['area_id'])
+    km = (valores['kilometraje_entrada'] or 0) - (valores['kilometraje_salida'] or 0)
+    return clave, (1, km, valores['litros_combustible'] or 0)
+
+def _valores_actuales(bitacora):
+    return {campo: getattr(bitacora, campo) for campo in CAMPOS}
+
+def _valores_anteriores(bitacora):
+    estado = inspect(bitacora)
+    valores = {}
+    for campo in CAMPOS:
+        historia = estado.attrs[campo].history
+        if historia.deleted:
+            valores[campo] = historia.deleted[0]
+        elif historia.unchanged:
+            valores[campo] = historia.unchanged[0]
+        else:
+            valores[campo] = getattr(bitacora, campo)
+    return valores
+
+def sumar(deltas, valores, signo):
+    clave, (viajes, km, litros) = _aporte(valores)
+    delta = deltas[clave]
+    delta[0] += signo * viajes
+    delta[1] += signo * km
+    delta[2] += signo * litros
+
+def nuevos_deltas():
+    return defaultdict(lambda: [0, 0.0, 0.0])
+
+# --- Escritura en la BD ---
+def _upsert(conexion):
+    dialecto = conexion.dialect.name
+    if dialecto == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialecto == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        return None
+    tabla = ResumenDiario.__table__
+    sentencia = insert(tabla)
+    return sentencia.on_conflict_do_update(
+        index_elements=[tabla.c.fecha, tabla.c.vehiculo_id, tabla.c.area_id],
+        set_={
+            'viajes': tabla.c.viajes + sentencia.excluded.viajes,
+            'km_recorridos': tabla.c.km_recorridos + sentencia.excluded.km_recorridos,
+            'litros': tabla.c.litros + sentencia.excluded.litros,
+        }
+    )
+
+def aplicar_deltas(conexion, deltas):
+    # También lo usan las cargas masivas que insertan sin pasar por la sesión ORM.
+    filas = [
+        {'fecha': fecha, 'vehiculo_id': vehiculo_id, 'area_id': area_id,
+         'viajes': viajes, 'km_recorridos': km, 'litros': litros}
+        for (fecha, vehiculo_id, area_id), (viajes, km, litros) in deltas.items()
+        if viajes or km or litros
+    ]
+    if not filas:
+        return
+    tabla = ResumenDiario.__table__
+    sentencia = _upsert(conexion)
+    if sentencia is not None:
+        conexion.execute(sentencia, filas)
+    else:
+        # Otros motores: UPDATE y, si no había fila, INSERT.
+        for fila in filas:
+            clave = and_(tabla.c.fecha == fila['fecha'], tabla.c.vehiculo_id == fila['vehiculo_id'],
+                         tabla.c.area_id == fila['area_id'])
+            resultado = conexion.execute(update(tabla).where(clave).values(
+                viajes=tabla.c.viajes + fila['viajes'],
+                km_recorridos=tabla.c.km_recorridos + fila['km_recorridos'],
+                litros=tabla.c.litros + fila['litros']))
+            if resultado.rowcount == 0:
+                conexion.execute(tabla.insert().values(**fila))
+    # Días que quedaron sin viajes (por bajas o ediciones) se eliminan del resumen.
+    for fila in filas:
+        if fila['viajes'] < 0:
+            conexion.execute(delete(tabla).where(
+                tabla.c.fecha == fila['fecha'], tabla.c.vehiculo_id == fila['vehiculo_id'],
+                tabla.c.area_id == fila['area_id'], tabla.c.viajes <= 0))
+
+@event.listens_for(db.session, 'after_flush')
+def actualizar_resumen(session, flush_context):
+    deltas = nuevos_deltas()
+    for objeto in session.new:
+        if isinstance(objeto, Bitacora):
+            sumar(deltas, _valores_actuales(objeto), +1)
+    for objeto in session.deleted:
+        if isinstance(objeto, Bitacora):
+            sumar(deltas, _valores_anteriores(objeto), -1)
+    for objeto in session.dirty:
+        if isinstance(objeto, Bitacora) and session.is_modified(objeto, include_collections=False):
+            sumar(deltas, _valores_anteriores(objeto), -1)
+            sumar(deltas, _valores_actuales(objeto), +1)
+    if deltas:
+        aplicar_deltas(session.connection(), deltas)
+
+# --- Reconstrucción completa (carga inicial o corrección) ---
+def reconstruir():
+    # También cuentan las bitácoras archivadas (historico.py): el resumen es de todo el historial.
+    tabla = ResumenDiario.__table__
+    todas = union_all(*[select(modelo.id, modelo.fecha_salida, modelo.vehiculo_id, modelo.area_id,
+                               modelo.kilometraje_salida, modelo.kilometraje_entrada, modelo.litros_combustible)
+                        for modelo in (Bitacora, BitacoraArchivada)]).subquery('todas')
+    dia = func.date(todas.c.fecha_salida)
+    consulta = select(
+        dia,
+        todas.c.vehiculo_id,
+        todas.c.area_id,
+        func.count(todas.c.id),
+        func.coalesce(func.sum(func.coalesce(todas.c.kilometraje_entrada, 0) - todas.c.kilometraje_salida), 0),
+        func.coalesce(func.sum(func.coalesce(todas.c.litros_combustible, 0)), 0)
+    ).group_by(dia, todas.c.vehiculo_id, todas.c.area_id)
+    db.session.execute(delete(tabla))
+    db.session.execute(tabla.insert().from_select(
+        ['fecha', 'vehiculo_id', 'area_id', 'viajes', 'km_recorridos', 'litros'], consulta))
+    db.session.commit()
+    return db.session.query(func.count()).select_from(tabla).scalar()
+
+@app.cli.command('reconstruir-resumen')
+def reconstruir_resumen_comando():
+    """Recalcula la tabla ResumenDiario a partir de todas las bitácoras."""
+    db.create_all()
+    filas = reconstruir()
+    print(f'Resumen diario reconstruido: {filas} filas.')
+
+# --- Lecturas para el panel ---
+def totales(desde=None):
+    consulta = db.session.query(
+        func.coalesce(func.sum(ResumenDiario.viajes), 0),
+        func.coalesce(func.sum(ResumenDiario.km_recorridos), 0),
+        func.coalesce(func.sum(ResumenDiario.litros), 0)
+    )
+    if desde is not None:
+        consulta = consulta.filter(ResumenDiario.fecha >= desde)
+    viajes, km, litros = consulta.one()
+    return {'viajes': int(viajes), 'km_recorridos': round(km, 1), 'litros': round(litros, 1)}
+
+def viajes_por(modelo, etiqueta, columna, limite=None):
+    consulta = (db.session.query(etiqueta, func.sum(ResumenDiario.viajes).label('viajes'))
+                .join(modelo, modelo.id == columna)
+                .group_by(etiqueta)
+                .order_by(func.sum(ResumenDiario.viajes).desc()))
+    if limite:
+        consulta = consulta.limit(limite)
+    return consulta.all()
@@ -1,57 +1,32 @@
 # routes.py
-from flask import render_template, url_for, flash, redirect, request, abort, make_response
+from flask import (render_template, url_for, flash, redirect, request, abort, make_response, Response,
+                   stream_with_context, jsonify, send_from_directory)
 from app import app, db, bcrypt
 from forms import (LoginForm, VehiculoForm, BitacoraForm, 
                    ReportForm, AreaForm) 
-from models import User, Vehiculo, Bitacora, Area
+from models import User, Vehiculo, Bitacora, Area, TrabajoReporte, ResumenDiario
+from consultas import (FILTROS_VACIOS, leer_filtros, parametros_url,
+                       pagina_bitacoras, contar_bitacoras, filas_reporte, filas_por_lotes, validar_cursor)
+from exportacion import generar_csv, generar_xlsx
+from pdf_reportes import construir_pdf
+import trabajos
+import cache_reportes
+import paquetes
+import resumen
+import catalogos
+import importacion
+import analitica
+import series
+import replica
+import busqueda
+import odometro
+import cache_http
+import usuarios
+import registro_agrupado
+import novedades
 from flask_login import login_user, current_user, logout_user, login_required
 from functools import wraps
 from datetime import datetime, time
-from fpdf import FPDF
-import io
-import os
-
-# -----------------------------------------------------------------
-# CLASE PDF ESTILIZADA
-# -----------------------------------------------------------------
-class PDF(FPDF):
-    def safe_str(self, text):
-        return str(text or '').encode('latin-1', 'replace').decode('latin-1')
-
-    def header(self):
-        # 1. Fondo del Encabezado (Azul Oscuro)
-        self.set_fill_color(28, 40, 51)
-        # Altura 25mm para que quepa el logo
-        self.rect(0, 0, 297, 25, 'F') 
-        
-        # 2. LOGO DE LA INSTITUCIÓN
-        logo_path = os.path.join(app.root_path, 'static', 'img', 'logo.png')
-        if os.path.exists(logo_path):
-            try:
-                # Logo a la izquierda
-                self.image(logo_path, x=10, y=2.5, h=20)
-            except:
-                pass
-        
-        # 3. Título (CENTRADO PERFECTO)
-        self.set_font('Arial', 'B', 14)
-        self.set_text_color(255, 255, 255)
-        
-        # Movemos el cursor verticalmente para centrar el texto en la barra azul
-        self.set_y(8) 
-        
-        # width=0 significa "todo el ancho de la página"
-        # align='C' significa Centrado
-        self.cell(0, 10, self.safe_str('REPORTE DE BITACORAS VEHICULARES - YLB'), 0, 1, 'C')
-        
-        # Salto de línea para salir del header azul
-        self.ln(15)
-
-    def footer(self):
-        self.set_y(-15)
-        self.set_font('Arial', 'I', 8)
-        self.set_text_color(128, 128, 128)
-        self.cell(0, 10, f'Pagina {self.page_no()}/{{nb}}', 0, 0, 'C')
 
 # --- Decorador de Admin ---
 def admin_required(f):
@@ -74,10 +49,10 @@ def procesar_bitacora():
     if form.validate_on_submit():
         fecha_salida_dt = datetime.combine(form.fecha_viaje.data, time.min) 
         fecha_entrada_dt = datetime.combine(form.fecha_viaje.data, time.max) 
-        bitacora = Bitacora(
+        valores = dict(
             nombre_conductor=form.nombre_conductor.data,
-            vehiculo_id=form.vehiculo.data.id,
-            area_id=form.area.data.id,
+            vehiculo_id=form.vehiculo.data,
+            area_id=form.area.data,
             fecha_salida=fecha_salida_dt,
             kilometraje_salida=form.kilometraje_salida.data,
             fecha_entrada=fecha_entrada_dt,
@@ -85,9 +60,16 @@ def procesar_bitacora():
             descripcion_trabajo=form.descripcion_trabajo.data,
             litros_combustible=form.litros_combustible.data
         )
-        db.session.add(bitacora)
-        db.session.commit()
-        flash(f'¡Bitácora para {bitacora.nombre_conductor} registrada exitosamente! Gracias.', 'success')
+        try:
+            # Alta sola o en un lote con otras simultáneas (ver registro_agrupado.py)
+            registro_agrupado.registrar(valores)
+        except odometro.OdometroRetrocede as e:
+            # El kilometraje inicial queda por debajo del último viaje del vehículo
+            db.session.rollback()
+            form.kilometraje_salida.errors.append(str(e))
+            return render_template('kiosko_formulario_unico.html', title='Registrar Bitácora', form=form, legend='Registro de Bitácora')
+        cache_reportes.invalidar((valores['fecha_salida'], valores['vehiculo_id'], valores['area_id']))
+        flash(f'¡Bitácora para {valores["nombre_conductor"]} registrada exitosamente! Gracias.', 'success')
         return redirect(url_for('registrar_bitacora'))
     return render_template('kiosko_formulario_unico.html', title='Registrar Bitácora', form=form, legend='Registro de Bitácora')
 
@@ -115,22 +97,107 @@ def logout():
 @app.route("/dashboard")
 @login_required
 @admin_required
+@cache_http.condicional('resumen_diario', 'vehiculo', 'area')
+@replica.solo_lectura
 def dashboard():
+    # Conteos y totales salen de ResumenDiario (ver resumen.py), no de recorrer Bitacora.
+    # 'desde': último evento que ya incluyen, para que la página siga en vivo (novedades.py)
+    (totales, hoy, por_area, por_vehiculo), desde = novedades.con_ultimo_id(lambda: (
+        resumen.totales(),
+        resumen.totales(desde=datetime.utcnow().date()),
+        resumen.viajes_por(Area, Area.id, ResumenDiario.area_id),
+        resumen.viajes_por(Vehiculo, Vehiculo.id, ResumenDiario.vehiculo_id)))
     stats = {
-        'total_bitacoras': Bitacora.query.count(),
-        'bitacoras_hoy': Bitacora.query.filter(Bitacora.fecha_salida >= datetime.combine(datetime.utcnow().date(), time.min)).count(),
-        'total_vehiculos': Vehiculo.query.count(),
-        'total_areas': Area.query.count()
+        'total_bitacoras': totales['viajes'],
+        'bitacoras_hoy': hoy['viajes'],
+        'total_vehiculos': len(catalogos.vehiculos()),
+        'total_areas': len(catalogos.areas()),
+        'km_recorridos': totales['km_recorridos'],
+        'litros': totales['litros']
     }
-    return render_template('dashboard_admin.html', title='Panel de Admin', stats=stats)
+    areas = {area.id: area.nombre for area in catalogos.areas()}
+    placas = {vehiculo.id: vehiculo.placa for vehiculo in catalogos.vehiculos()}
+    chart_data = {
+        'area_labels': [areas.get(area_id, '') for area_id, _ in por_area],
+        'area_values': [int(viajes) for _, viajes in por_area],
+        'vehiculo_labels': [placas.get(vehiculo_id, '') for vehiculo_id, _ in por_vehiculo[:10]],
+        'vehiculo_values': [int(viajes) for _, viajes in por_vehiculo[:10]]
+    }
+    # Lo que necesita la página para aplicar los deltas: viajes de todos los vehículos
+    # (el top 10 puede cambiar), ids de las áreas del gráfico y la fecha de 'hoy'
+    en_vivo = {
+        'url': url_for('api_novedades'),
+        'desde': desde,
+        'hoy': datetime.utcnow().date().isoformat(),
+        'areas': [area_id for area_id, _ in por_area],
+        'vehiculos': [{'id': vehiculo_id, 'placa': placas.get(vehiculo_id, ''), 'viajes': int(viajes)}
+                      for vehiculo_id, viajes in por_vehiculo],
+    }
+    return render_template('dashboard_admin.html', title='Panel de Admin', stats=stats, chart_data=chart_data,
+                           en_vivo=en_vivo)
+
+# --- NOVEDADES EN VIVO (ver novedades.py) ---
+# Server-Sent Events para el panel y /reportes; ?desde= es el id con el que se armó la
+# página (al reconectar, el navegador manda Last-Event-ID)
+@app.route("/api/novedades")
+@login_required
+@admin_required
+def api_novedades():
+    return novedades.respuesta(request.headers.get('Last-Event-ID') or request.args.get('desde'))
+
+# --- ANALÍTICA DE COMBUSTIBLE (ver analitica.py) ---
+@app.route("/analitica")
+@login_required
+@admin_required
+@replica.solo_lectura
+def ver_analitica():
+    try:
+        filtros = leer_filtros(request.args)
+    except ValueError:
+        flash('Error en los parámetros del filtro.', 'danger')
+        return redirect(url_for('ver_analitica'))
+    return render_template('analitica.html', title='Rendimiento de Combustible', analisis=analitica.calcular(filtros))
+
+@app.route("/api/analitica")
+@login_required
+@admin_required
+@replica.solo_lectura
+def api_analitica():
+    try:
+        filtros = leer_filtros(request.args)
+    except ValueError:
+        return jsonify(error='Error en los parámetros del filtro.'), 400
+    return jsonify(analitica.calcular(filtros))
+
+# --- SERIES DE TIEMPO PARA GRÁFICOS (ver series.py) ---
+# /api/series?periodo=mes&por=area&fecha_inicio=...: mismos filtros que /reportes.
+@app.route("/api/series")
+@login_required
+@admin_required
+@cache_http.condicional('resumen_diario', 'bitacora', 'vehiculo', 'area')
+@replica.solo_lectura
+def api_series():
+    try:
+        filtros = leer_filtros(request.args)
+    except ValueError:
+        return jsonify(error='Error en los parámetros del filtro.'), 400
+    try:
+        resultado = series.series(filtros, request.args.get('periodo', 'mes'), request.args.get('por') or None,
+                                  ttl=app.config['SERIES_TTL'])
+    except ValueError as e:
+        return jsonify(error=str(e)), 400
+    return jsonify(resultado)
 
 # --- CRUD VEHÍCULOS ---
 @app.route("/vehiculos")
 @login_required
 @admin_required
+@cache_http.condicional('vehiculo', 'odometro_vehiculo')
+@replica.solo_lectura
 def listar_vehiculos():
     vehiculos = Vehiculo.query.all()
-    return render_template('vehiculos.html', vehiculos=vehiculos, title='Gestión de Vehículos')
+    return render_template('vehiculos.html', vehiculos=vehiculos, odometros=odometro.lecturas(),
+                           title='Gestión de Vehículos')
 @app.route("/vehiculo/nuevo", methods=['GET', 'POST'])
 @login_required
 @admin_required
@@ -192,7 +259,7 @@ def editar_vehiculo(vehiculo_id):
 @admin_required
 def eliminar_vehiculo(vehiculo_id):
     vehiculo = Vehiculo.query.get_or_404(vehiculo_id)
-    if vehiculo.bitacoras:
+    if vehiculo.bitacoras or vehiculo.bitacoras_archivadas:
         flash(f'No se puede eliminar el vehículo {vehiculo.placa} porque tiene bitácoras asociadas.', 'danger')
         return redirect(url_for('listar_vehiculos'))
     flash(f'Vehículo {vehiculo.placa} eliminado.', 'warning')
@@ -204,6 +271,8 @@ def eliminar_vehiculo(vehiculo_id):
 @app.route("/areas")
 @login_required
 @admin_required
+@cache_http.condicional('area')
+@replica.solo_lectura
 def listar_areas():
     areas = Area.query.all()
     return render_template('areas.html', areas=areas, title='Gestión de Áreas')
@@ -239,7 +308,7 @@ def editar_area(area_id):
 @admin_required
 def eliminar_area(area_id):
     area = Area.query.get_or_404(area_id)
-    if area.bitacoras:
+    if area.bitacoras or area.bitacoras_archivadas:
         flash(f'No se puede eliminar el área "{area.nombre}" porque está siendo usada por bitácoras.', 'danger')
         return redirect(url_for('listar_areas'))
     db.session.delete(area)
@@ -251,33 +320,54 @@ def eliminar_area(area_id):
 @app.route("/reportes", methods=['GET', 'POST'])
 @login_required
 @admin_required
+@cache_http.condicional('bitacora', 'bitacora_archivada', 'vehiculo', 'area')
+@replica.solo_lectura
 def reportes():
     form = ReportForm()
-    form.vehiculo.choices = [('', 'Todos')] + [(v.id, v.placa) for v in Vehiculo.query.order_by(Vehiculo.placa)]
-    form.area.choices = [('', 'Todos')] + [(a.id, a.nombre) for a in Area.query.order_by(Area.nombre)]
-    query = Bitacora.query
-    filters = {
-        'fecha_inicio': request.form.get('fecha_inicio', ''),
-        'fecha_fin': request.form.get('fecha_fin', ''),
-        'vehiculo_id': request.form.get('vehiculo', ''),
-        'area_id': request.form.get('area', '')
-    }
     if form.validate_on_submit():
-        if form.fecha_inicio.data:
-            start_datetime = datetime.combine(form.fecha_inicio.data, time.min)
-            query = query.filter(Bitacora.fecha_salida >= start_datetime)
-        if form.fecha_fin.data:
-            end_datetime = datetime.combine(form.fecha_fin.data, time.max)
-            query = query.filter(Bitacora.fecha_salida <= end_datetime)
-        if form.vehiculo.data:
-            query = query.filter(Bitacora.vehiculo_id == form.vehiculo.data.id)
-            filters['vehiculo_id'] = form.vehiculo.data.id
-        if form.area.data:
-            query = query.filter(Bitacora.area_id == form.area.data.id)
-            filters['area_id'] = form.area.data.id
-        flash(f'Reporte filtrado. Se encontraron {query.count()} registros.', 'success')
-    bitacoras = query.order_by(Bitacora.fecha_salida.desc()).all()
-    return render_template('reportes.html', title='Generar Reportes', form=form, bitacoras=bitacoras, filters=filters)
+        # Los filtros viajan en la URL (GET) para que los cursores de página los conserven.
+        filtros = dict(FILTROS_VACIOS,
+                       fecha_inicio=form.fecha_inicio.data,
+                       fecha_fin=form.fecha_fin.data,
+                       vehiculo_id=form.vehiculo.data,
+                       area_id=form.area.data,
+                       texto=busqueda.normalizar(form.texto.data))
+        total = contar_bitacoras(filtros, app.config['REPORTES_CONTEO_TTL'])
+        flash(f'Reporte filtrado. Se encontraron {total} registros.', 'success')
+        return redirect(url_for('reportes', **parametros_url(filtros)))
+    try:
+        filtros = leer_filtros(request.args)
+    except ValueError:
+        flash('Error en los parámetros del filtro.', 'danger')
+        filtros = dict(FILTROS_VACIOS)
+    if request.method == 'GET':
+        form.fecha_inicio.data = filtros['fecha_inicio']
+        form.fecha_fin.data = filtros['fecha_fin']
+        form.vehiculo.data = filtros['vehiculo_id']
+        form.area.data = filtros['area_id']
+        form.texto.data = filtros['texto']
+
+    por_pagina = request.args.get('por_pagina', app.config['REPORTES_POR_PAGINA'], type=int)
+    por_pagina = max(1, min(por_pagina, app.config['REPORTES_MAX_POR_PAGINA']))
+    despues, antes = request.args.get('despues'), request.args.get('antes')
+    try:
+        validar_cursor(filtros, despues)
+        validar_cursor(filtros, antes)
+    except ValueError:
+        # Enlace de página cortado o editado: se muestra la primera
+        flash('El enlace de página no es válido; se muestra la primera página.', 'danger')
+        despues = antes = None
+    (pagina, total), desde = novedades.con_ultimo_id(lambda: (
+        pagina_bitacoras(filtros, despues=despues, antes=antes, por_pagina=por_pagina),
+        contar_bitacoras(filtros, app.config['REPORTES_CONTEO_TTL'])))
+    # 'filters' alimenta el enlace al PDF; 'parametros' los enlaces de página (sin filtros vacíos).
+    parametros = parametros_url(filtros)
+    filters = {clave: parametros.get(clave, '') for clave in FILTROS_VACIOS}
+    if por_pagina != app.config['REPORTES_POR_PAGINA']:
+        parametros['por_pagina'] = por_pagina
+    return render_template('reportes.html', title='Generar Reportes', form=form, bitacoras=pagina.bitacoras,
+                           filters=filters, pagina=pagina, parametros=parametros, total=total,
+                           desde=desde)
 
 @app.route("/bitacora/<int:bitacora_id>/editar", methods=['GET', 'POST'])
 @login_required
@@ -286,9 +376,10 @@ def editar_bitacora(bitacora_id):
     bitacora = Bitacora.query.get_or_404(bitacora_id)
     form = BitacoraForm()
     if form.validate_on_submit():
+        anterior = (bitacora.fecha_salida, bitacora.vehiculo_id, bitacora.area_id)
         bitacora.nombre_conductor = form.nombre_conductor.data
-        bitacora.vehiculo_id = form.vehiculo.data.id
-        bitacora.area_id = form.area.data.id
+        bitacora.vehiculo_id = form.vehiculo.data
+        bitacora.area_id = form.area.data
         bitacora.fecha_salida = datetime.combine(form.fecha_viaje.data, time.min)
         bitacora.fecha_entrada = datetime.combine(form.fecha_viaje.data, time.max)
         bitacora.kilometraje_salida = form.kilometraje_salida.data
@@ -296,12 +387,13 @@ def editar_bitacora(bitacora_id):
         bitacora.descripcion_trabajo = form.descripcion_trabajo.data
         bitacora.litros_combustible = form.litros_combustible.data
         db.session.commit()
+        cache_reportes.invalidar(anterior, (bitacora.fecha_salida, bitacora.vehiculo_id, bitacora.area_id))
         flash('¡Bitácora actualizada exitosamente!', 'success')
         return redirect(url_for('reportes'))
     elif request.method == 'GET':
         form.nombre_conductor.data = bitacora.nombre_conductor
-        form.vehiculo.data = bitacora.vehiculo_usado
-        form.area.data = bitacora.area_asignada
+        form.vehiculo.data = bitacora.vehiculo_id
+        form.area.data = bitacora.area_id
         form.fecha_viaje.data = bitacora.fecha_salida.date()
         form.kilometraje_salida.data = bitacora.kilometraje_salida
         form.kilometraje_entrada.data = bitacora.kilometraje_entrada
@@ -314,129 +406,151 @@ def editar_bitacora(bitacora_id):
 @admin_required
 def eliminar_bitacora(bitacora_id):
     bitacora = Bitacora.query.get_or_404(bitacora_id)
+    anterior = (bitacora.fecha_salida, bitacora.vehiculo_id, bitacora.area_id)
     db.session.delete(bitacora)
     db.session.commit()
+    cache_reportes.invalidar(anterior)
     flash('La bitácora ha sido eliminada.', 'warning')
     return redirect(url_for('reportes'))
 
+# --- IMPORTACIÓN MASIVA (ver importacion.py) ---
+# JSON en el cuerpo (lista de bitácoras) o archivo .csv/.json en el campo 'archivo'.
+# Con ?solo_validar=1 se devuelve el informe de errores sin insertar nada.
+@app.route("/bitacoras/importar", methods=['GET', 'POST'])
+@login_required
+@admin_required
+def importar_bitacoras():
+    if request.method == 'GET':
+        return render_template('importar.html', title='Importar Bitácoras', campos=importacion.CAMPOS)
+    solo_validar = request.values.get('solo_validar') in ('1', 'on', 'true')
+    try:
+        if request.is_json:
+            registros = importacion.leer_json(request.get_json(silent=True))
+        else:
+            archivo = request.files.get('archivo')
+            if archivo is None or not archivo.filename:
+                raise importacion.ErrorImportacion('Seleccione un archivo CSV o JSON.')
+            registros = importacion.leer_archivo(archivo.filename, archivo.read())
+        informe = importacion.importar(registros, solo_validar=solo_validar)
+    except importacion.ErrorImportacion as e:
+        if request.is_json:
+            return jsonify(error=str(e)), 400
+        flash(str(e), 'danger')
+        return redirect(url_for('importar_bitacoras'))
+    if request.is_json:
+        return jsonify(informe), (500 if informe['error'] else 200)
+    return render_template('importar.html', title='Importar Bitácoras', campos=importacion.CAMPOS, informe=informe)
+
 # -----------------------------------------------------------------
 # RUTA PDF CON HEADER CENTRADO (Y Safe Strings)
 # -----------------------------------------------------------------
 @app.route("/reporte/pdf")
 @login_required
 @admin_required
+@replica.solo_lectura
 def reporte_pdf():
-    fecha_inicio_str = request.args.get('fecha_inicio')
-    fecha_fin_str = request.args.get('fecha_fin')
-    vehiculo_id = request.args.get('vehiculo_id')
-    area_id = request.args.get('area_id')
-
-    query = Bitacora.query
     try:
-        if fecha_inicio_str:
-            fecha_inicio = datetime.strptime(fecha_inicio_str, '%Y-%m-%d').date()
-            query = query.filter(Bitacora.fecha_salida >= datetime.combine(fecha_inicio, time.min))
-        if fecha_fin_str:
-            fecha_fin = datetime.strptime(fecha_fin_str, '%Y-%m-%d').date()
-            query = query.filter(Bitacora.fecha_salida <= datetime.combine(fecha_fin, time.max))
-        if vehiculo_id:
-            query = query.filter(Bitacora.vehiculo_id == int(vehiculo_id))
-        if area_id:
-            query = query.filter(Bitacora.area_id == int(area_id))
+        filtros = leer_filtros(request.args)
     except ValueError:
         flash('Error en los parámetros del filtro.', 'danger')
         return redirect(url_for('reportes'))
 
-    bitacoras = query.order_by(Bitacora.fecha_salida.asc()).all()
     fecha_hoy = datetime.utcnow().strftime('%Y-%m-%d')
+    generacion = cache_reportes.generacion()
+    pdf_output = cache_reportes.obtener(filtros)
+    if pdf_output is None:
+        # La conexión no queda tomada mientras se dibuja el PDF (ver filas_por_lotes)
+        pdf_output = construir_pdf(filas_por_lotes(filtros, liberar=True))
+        cache_reportes.guardar(filtros, pdf_output, generacion)
+    response = make_response(pdf_output)
+    response.headers['Content-Type'] = 'application/pdf'
+    response.headers['Content-Disposition'] = f'attachment; filename=reporte_bitacoras_{fecha_hoy}.pdf'
+    return response
 
-    pdf = PDF(orientation='L', unit='mm', format='A4')
-    pdf.add_page()
-    pdf.set_font('Arial', '', 8)
-    
-    col_width = {
-        "fecha": 18, "nombre": 40, "km_inicial": 15, "km_final": 15,
-        "km_recorridos": 15, "litros": 15, "actividad": 105, 
-        "sector": 34, "firma": 20
-    }
-
-    def safe_str(text):
-        return str(text or '').encode('latin-1', 'replace').decode('latin-1')
+@app.route("/reporte/paquete")
+@login_required
+@admin_required
+@replica.solo_lectura
+def reporte_paquete():
+    por = request.args.get('por', 'vehiculo')
+    if por not in paquetes.AGRUPACIONES:
+        abort(400)
+    try:
+        filtros = leer_filtros(request.args)
+    except ValueError:
+        flash('Error en los parámetros del filtro.', 'danger')
+        return redirect(url_for('reportes'))
+    fecha_hoy = datetime.utcnow().strftime('%Y-%m-%d')
+    response = Response(stream_with_context(paquetes.generar_zip(filtros, por)), content_type='application/zip')
+    response.headers['Content-Disposition'] = f'attachment; filename=reportes_por_{por}_{fecha_hoy}.zip'
+    return response
 
-    pdf.set_fill_color(220, 220, 220)
-    pdf.set_font('Arial', 'B', 8)
-    pdf.cell(col_width["fecha"], 8, safe_str('FECHA'), 1, 0, 'C', fill=True)
-    pdf.cell(col_width["nombre"], 8, safe_str('RESPONSABLE DE USO'), 1, 0, 'C', fill=True)
-    pdf.cell(col_width["km_inicial"], 8, safe_str('KM. INI'), 1, 0, 'C', fill=True)
-    pdf.cell(col_width["km_final"], 8, safe_str('KM. FIN'), 1, 0, 'C', fill=True)
-    pdf.cell(col_width["km_recorridos"], 8, safe_str('KM. REC'), 1, 0, 'C', fill=True)
-    pdf.cell(col_width["litros"], 8, safe_str('LITROS'), 1, 0, 'C', fill=True)
-    pdf.cell(col_width["actividad"], 8, safe_str('ACTIVIDAD / OBSERVACIONES'), 1, 0, 'C', fill=True)
-    pdf.cell(col_width["sector"], 8, safe_str('SECTOR'), 1, 0, 'C', fill=True)
-    pdf.cell(col_width["firma"], 8, safe_str('FIRMA'), 1, 1, 'C', fill=True)
-    
-    pdf.set_font('Arial', '', 8)
-    fill = False 
-    
-    for bitacora in bitacoras:
-        km_recorrido = bitacora.kilometraje_entrada - bitacora.kilometraje_salida
-        nombre = safe_str(bitacora.nombre_conductor)
-        placa = safe_str(bitacora.vehiculo_usado.placa)
-        area = safe_str(bitacora.area_asignada.nombre)
-        actividad = safe_str(bitacora.descripcion_trabajo)
+@app.route("/reporte/cache")
+@login_required
+@admin_required
+def estado_cache_reportes():
+    return jsonify(cache_reportes.estado())
 
-        if fill: pdf.set_fill_color(245, 245, 245)
-        else: pdf.set_fill_color(255, 255, 255)
+# --- PDF EN SEGUNDO PLANO (ver trabajos.py) ---
+@app.route("/reporte/pdf/trabajos", methods=['POST'])
+@login_required
+@admin_required
+def encolar_reporte_pdf():
+    try:
+        filtros = leer_filtros(request.values)
+    except ValueError:
+        return jsonify(error='Error en los parámetros del filtro.'), 400
+    trabajo = trabajos.encolar(parametros_url(filtros), usuario_id=current_user.id)
+    if trabajo is None:
+        return jsonify(error='Hay demasiados reportes en proceso. Intenta en unos minutos.'), 429
+    return jsonify(trabajos.resumen(trabajo)), 202
 
-        y_inicial = pdf.get_y()
-        pdf.multi_cell(col_width["fecha"], 8, bitacora.fecha_salida.strftime('%Y-%m-%d'), 1, 'C', fill=True)
-        y_despues_fecha = pdf.get_y()
-        pdf.set_y(y_inicial); pdf.set_x(pdf.get_x() + col_width["fecha"])
-        
-        pdf.multi_cell(col_width["nombre"], 8, nombre, 1, 'L', fill=True)
-        y_despues_nombre = pdf.get_y()
-        pdf.set_y(y_inicial); pdf.set_x(pdf.get_x() + col_width["fecha"] + col_width["nombre"])
-        
-        pdf.multi_cell(col_width["km_inicial"], 8, str(bitacora.kilometraje_salida), 1, 'R', fill=True)
-        y_despues_km_i = pdf.get_y()
-        pdf.set_y(y_inicial); pdf.set_x(pdf.get_x() + col_width["fecha"] + col_width["nombre"] + col_width["km_inicial"])
+@app.route("/reporte/pdf/trabajos/<int:trabajo_id>")
+@login_required
+@admin_required
+def estado_reporte_pdf(trabajo_id):
+    trabajo = TrabajoReporte.query.get_or_404(trabajo_id)
+    return jsonify(trabajos.resumen(trabajo))
 
-        pdf.multi_cell(col_width["km_final"], 8, str(bitacora.kilometraje_entrada), 1, 'R', fill=True)
-        y_despues_km_f = pdf.get_y()
-        pdf.set_y(y_inicial); pdf.set_x(pdf.get_x() + col_width["fecha"] + col_width["nombre"] + col_width["km_inicial"] + col_width["km_final"])
+@app.route("/reporte/pdf/trabajos/<int:trabajo_id>/descargar")
+@login_required
+@admin_required
+def descargar_reporte_pdf(trabajo_id):
+    trabajo = TrabajoReporte.query.get_or_404(trabajo_id)
+    if trabajo.estado != 'terminado':
+        abort(404)
+    fecha = trabajo.creado.strftime('%Y-%m-%d')
+    return send_from_directory(trabajos.directorio_reportes(), trabajo.archivo, as_attachment=True,
+                               download_name=f'reporte_bitacoras_{fecha}.pdf', mimetype='application/pdf')
 
-        pdf.multi_cell(col_width["km_recorridos"], 8, str(round(km_recorrido, 2)), 1, 'R', fill=True)
-        y_despues_km_r = pdf.get_y()
-        pdf.set_y(y_inicial); pdf.set_x(pdf.get_x() + col_width["fecha"] + col_width["nombre"] + col_width["km_inicial"] + col_width["km_final"] + col_width["km_recorridos"])
-        
-        pdf.multi_cell(col_width["litros"], 8, str(bitacora.litros_combustible or 0), 1, 'R', fill=True)
-        y_despues_litros = pdf.get_y()
-        pdf.set_y(y_inicial); pdf.set_x(pdf.get_x() + col_width["fecha"] + col_width["nombre"] + col_width["km_inicial"] + col_width["km_final"] + col_width["km_recorridos"] + col_width["litros"])
-        
-        pdf.multi_cell(col_width["actividad"], 8, actividad, 1, 'L', fill=True)
-        y_despues_actividad = pdf.get_y()
-        pdf.set_y(y_inicial); pdf.set_x(pdf.get_x() + col_width["fecha"] + col_width["nombre"] + col_width["km_inicial"] + col_width["km_final"] + col_width["km_recorridos"] + col_width["litros"] + col_width["actividad"])
-        
-        pdf.multi_cell(col_width["sector"], 8, area, 1, 'L', fill=True)
-        y_despues_sector = pdf.get_y()
-        pdf.set_y(y_inicial); pdf.set_x(pdf.get_x() + col_width["fecha"] + col_width["nombre"] + col_width["km_inicial"] + col_width["km_final"] + col_width["km_recorridos"] + col_width["litros"] + col_width["actividad"] + col_width["sector"])
-        
-        pdf.multi_cell(col_width["firma"], 8, '', 1, 'C', fill=True)
-        y_despues_firma = pdf.get_y()
+# -----------------------------------------------------------------
+# EXPORTACIONES EN STREAMING (CSV / XLSX)
+# -----------------------------------------------------------------
+def respuesta_exportacion(generador, content_type, extension):
+    try:
+        filtros = leer_filtros(request.args)
+    except ValueError:
+        flash('Error en los parámetros del filtro.', 'danger')
+        return redirect(url_for('reportes'))
+    fecha_hoy = datetime.utcnow().strftime('%Y-%m-%d')
+    # stream_with_context mantiene viva la sesión de la BD mientras el generador lee filas.
+    response = Response(stream_with_context(generador(filas_reporte(filtros))), content_type=content_type)
+    response.headers['Content-Disposition'] = f'attachment; filename=reporte_bitacoras_{fecha_hoy}.{extension}'
+    return response
 
-        max_y = max(y_despues_fecha, y_despues_nombre, y_despues_km_i, y_despues_km_f, y_despues_km_r, y_despues_litros, y_despues_actividad, y_despues_sector, y_despues_firma)
-        
-        pdf.set_draw_color(200, 200, 200)
-        pdf.line(10, max_y, 287, max_y)
-        pdf.set_y(max_y)
-        
-        fill = not fill
+@app.route("/reporte/csv")
+@login_required
+@admin_required
+@replica.solo_lectura
+def reporte_csv():
+    return respuesta_exportacion(generar_csv, 'text/csv; charset=utf-8', 'csv')
 
-    pdf_output = bytes(pdf.output()) 
-    response = make_response(pdf_output)
-    response.headers['Content-Type'] = 'application/pdf'
-    response.headers['Content-Disposition'] = f'attachment; filename=reporte_bitacoras_{fecha_hoy}.pdf'
-    return response
+@app.route("/reporte/xlsx")
+@login_required
+@admin_required
+@replica.solo_lectura
+def reporte_xlsx():
+    return respuesta_exportacion(generar_xlsx, 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet', 'xlsx')
 
 # --- RUTA MÁGICA DE INSTALACIÓN ---
 @app.route("/instalar_sistema_ahora")
@@ -0,0 +1,133 @@
+# series.py
+# Series de tiempo para gráficos (/api/series): viajes, km recorridos, litros y km/l por
+# día, semana o mes, en total o por vehículo o área. Todo se agrupa en SQL (GROUP BY
+# sobre la fecha truncada) y a Python solo llega una fila por punto del gráfico.
+#  - Sin búsqueda de texto se suma sobre ResumenDiario (ver resumen.py), que ya tiene un
+#    renglón por día x vehículo x área y admite los demás filtros de ReportForm.
+#  - Con búsqueda de texto hay que ir a Bitacora, porque el resumen no guarda descripciones
+#    (y a BitacoraArchivada si el rango llega al archivo, ver historico.py).
+# Cada combinación de filtros se reutiliza SERIES_TTL segundos en cada proceso, mientras
+# no cambie ninguna de las tablas que lee (versiones de cache_http.py): /api/series arma
+# su ETag con esas versiones y no puede responder con una serie de antes del cambio.
+import time as reloj
+from datetime import date
+from sqlalchemy import select, func, cast, Date, union_all
+from app import db
+from models import ResumenDiario
+from consultas import aplicar_filtros
+import cache_http
+import catalogos
+import historico
+
+PERIODOS = ('dia', 'semana', 'mes')
+AGRUPACIONES = ('vehiculo', 'area')
+MAX_EN_CACHE = 128
+# Tablas de las que sale una serie (con texto, las bitácoras y el archivo)
+TABLAS = ('resumen_diario', 'bitacora', 'bitacora_archivada', 'mes_archivado', 'vehiculo', 'area')
+
+_cache = {}
+
+# --- Truncado de fechas ---
+def _truncar(columna, periodo):
+    # Inicio del período (semana de lunes a domingo), como fecha.
+    if db.engine.dialect.name == 'sqlite':
+        if periodo == 'dia':
+            return func.date(columna)
+        if periodo == 'semana':
+            # 'weekday 0' avanza al domingo (o lo deja si ya lo es); 6 días antes es el lunes
+            return func.date(columna, 'weekday 0', '-6 days')
+        return func.strftime('%Y-%m-01', columna)
+    unidad = {'dia': 'day', 'semana': 'week', 'mes': 'month'}[periodo]
+    return cast(func.date_trunc(unidad, columna), Date)
+
+# --- Consulta ---
+def _bitacoras_con_texto(filtros):
+    # Las bitácoras que coinciden con todos los filtros, de una o de las dos tablas
+    partes = [aplicar_filtros(select(modelo.id, modelo.fecha_salida, modelo.vehiculo_id, modelo.area_id,
+                                     modelo.kilometraje_salida, modelo.kilometraje_entrada,
+                                     modelo.litros_combustible), filtros, modelo)
+              for modelo in historico.modelos(filtros)]
+    return (union_all(*partes) if len(partes) > 1 else partes[0]).subquery('bitacoras')
+
+def consulta(filtros, periodo, por=None):
+    if filtros['texto']:
+        origen = _bitacoras_con_texto(filtros)
+        km = func.coalesce(origen.c.kilometraje_entrada, 0) - origen.c.kilometraje_salida
+        fecha, viajes = origen.c.fecha_salida, func.count(origen.c.id)
+        litros = func.coalesce(origen.c.litros_combustible, 0)
+        grupos = {'vehiculo': origen.c.vehiculo_id, 'area': origen.c.area_id}
+    else:
+        origen, fecha, viajes = ResumenDiario, ResumenDiario.fecha, func.sum(ResumenDiario.viajes)
+        km, litros = ResumenDiario.km_recorridos, ResumenDiario.litros
+        grupos = {'vehiculo': ResumenDiario.vehiculo_id, 'area': ResumenDiario.area_id}
+    inicio = _truncar(fecha, periodo).label('periodo')
+    suma_km = func.coalesce(func.sum(km), 0)
+    suma_litros = func.coalesce(func.sum(litros), 0)
+    columnas = [inicio, viajes, suma_km, suma_litros,
+                suma_km / func.nullif(suma_litros, 0)]
+    orden = [inicio]
+    if por:
+        columnas.insert(1, grupos[por])
+        orden.append(grupos[por])
+    sentencia = select(*columnas).select_from(origen)
+    if not filtros['texto']:
+        sentencia = _filtrar_resumen(sentencia, filtros)
+    return sentencia.group_by(*orden).order_by(*orden)
+
+def _filtrar_resumen(sentencia, filtros):
+    if filtros['fecha_inicio']:
+        sentencia = sentencia.where(ResumenDiario.fecha >= filtros['fecha_inicio'])
+    if filtros['fecha_fin']:
+        sentencia = sentencia.where(ResumenDiario.fecha <= filtros['fecha_fin'])
+    if filtros['vehiculo_id']:
+        sentencia = sentencia.where(ResumenDiario.vehiculo_id == filtros['vehiculo_id'])
+    if filtros['area_id']:
+        sentencia = sentencia.where(ResumenDiario.area_id == filtros['area_id'])
+    return sentencia
+
+# --- Resultado en columnas ---
+def _texto_fecha(valor):
+    return valor.isoformat() if isinstance(valor, date) else str(valor)
+
+def calcular(filtros, periodo, por=None):
+    # Columnas paralelas (una lista por métrica) en lugar de una lista de objetos: el
+    # JSON pesa menos y Chart.js las usa tal cual como labels/data.
+    if periodo not in PERIODOS:
+        raise ValueError(f'Período no válido: {periodo}')
+    if por is not None and por not in AGRUPACIONES:
+        raise ValueError(f'Agrupación no válida: {por}')
+    columnas = {'periodo': [], 'viajes': [], 'km_recorridos': [], 'litros': [], 'km_por_litro': []}
+    if por:
+        columnas['grupo'] = []
+    for fila in db.session.execute(consulta(filtros, periodo, por)):
+        if por:
+            inicio, grupo, viajes, km, litros, rendimiento = fila
+            columnas['grupo'].append(grupo)
+        else:
+            inicio, viajes, km, litros, rendimiento = fila
+        columnas['periodo'].append(_texto_fecha(inicio))
+        columnas['viajes'].append(int(viajes))
+        columnas['km_recorridos'].append(round(km, 1))
+        columnas['litros'].append(round(litros, 1))
+        columnas['km_por_litro'].append(round(rendimiento, 2) if rendimiento is not None else None)
+    resultado = {'periodo': periodo, 'por': por, 'columnas': columnas}
+    if por == 'vehiculo':
+        resultado['grupos'] = {vehiculo.id: vehiculo.placa for vehiculo in catalogos.vehiculos()}
+    elif por == 'area':
+        resultado['grupos'] = {area.id: area.nombre for area in catalogos.areas()}
+    return resultado
+
+def series(filtros, periodo, por=None, ttl=30):
+    # calcular() con caché por combinación de filtros (mismo esquema que consultas.contar_bitacoras).
+    # Las versiones se leen antes de consultar: si cambian durante el cálculo, el
+    # resultado queda bajo las viejas y no se vuelve a usar.
+    clave = (tuple(sorted(filtros.items())), periodo, por, tuple(cache_http.version(tabla) for tabla in TABLAS))
+    ahora = reloj.monotonic()
+    en_cache = _cache.get(clave)
+    if en_cache and ahora - en_cache[1] < ttl:
+        return en_cache[0]
+    resultado = calcular(filtros, periodo, por)
+    if len(_cache) >= MAX_EN_CACHE:
+        _cache.clear()
+    _cache[clave] = (resultado, ahora)
+    return resultado
@@ -0,0 +1,48 @@
+// static/js/novedades.js
+// Cliente de /api/novedades (Server-Sent Events, ver novedades.py) para el panel y /reportes.
+// escucharNovedades(url, desde, manejadores): 'desde' es el id de evento con el que se armó
+// la página y 'manejadores' un objeto {tipo: función(datos, id)} con los tipos bitacora,
+// vehiculo, area, importacion y recarga.
+//  - Cada evento se aplica una sola vez (por id), aunque llegue de nuevo al reconectar.
+//  - Cuando el servidor corta el flujo el navegador vuelve a conectar solo y manda
+//    Last-Event-ID. Si lo rechaza (503: el worker ya tiene el máximo de conexiones) la
+//    conexión queda cerrada y se reintenta acá, esperando cada vez más.
+function escucharNovedades(url, desde, manejadores) {
+    const aplicados = new Set();
+    let ultimo = desde;
+    let espera = 5000;
+
+    function conectar() {
+        const separador = url.includes('?') ? '&' : '?';
+        const fuente = new EventSource(`${url}${separador}desde=${ultimo}`);
+        fuente.onopen = () => { espera = 5000; };
+        fuente.onerror = () => {
+            if (fuente.readyState === EventSource.CLOSED) {
+                setTimeout(conectar, espera + Math.random() * 1000);
+                espera = Math.min(espera * 2, 60000);
+            }
+        };
+        Object.keys(manejadores).forEach(tipo => {
+            fuente.addEventListener(tipo, evento => {
+                if (tipo === 'recarga') {
+                    fuente.close();
+                    manejadores.recarga();
+                    return;
+                }
+                const id = Number(evento.lastEventId);
+                if (aplicados.has(id)) return;
+                aplicados.add(id);
+                ultimo = Math.max(ultimo, id);
+                manejadores[tipo](JSON.parse(evento.data), id);
+            });
+        });
+    }
+
+    if (window.EventSource) conectar();
+}
+
+// Números como los escribe Jinja (repr de float de Python): 12.0, 12.5, 0
+function numeroPython(valor) {
+    if (valor === null || valor === undefined) return 'None';
+    return Number.isInteger(valor) ? valor.toFixed(1) : String(valor);
+}
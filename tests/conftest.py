@@ -0,0 +1,93 @@
+# tests/conftest.py
+# Base SQLite temporal y directorios de trabajo propios: se fijan antes de importar la
+# app, porque config.py lee el entorno al importarse. Nunca se toca instance/ ni la base
+# de DATABASE_URL.
+import os
+import sys
+import tempfile
+import threading
+
+import pytest
+
+_RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_TEMPORAL = tempfile.mkdtemp(prefix='bitacoras_tests_')
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(_TEMPORAL, 'tests.db')
+os.environ.pop('DATABASE_REPLICA_URL', None)
+for variable, carpeta in (('REPORTES_DIR', 'reportes'), ('REPORTES_CACHE_DIR', 'cache_reportes'),
+                          ('METRICAS_DIR', 'metricas')):
+    os.environ[variable] = os.path.join(_TEMPORAL, carpeta)
+sys.path.insert(0, _RAIZ)
+sys.path.insert(0, os.path.join(_RAIZ, 'benchmarks'))
+
+from app import app as _app, db  # noqa: E402
+
+_app.instance_path = os.path.join(_TEMPORAL, 'instance')
+_app.config.update(TESTING=True, WTF_CSRF_ENABLED=False)
+
+@pytest.fixture
+def app():
+    with _app.app_context():
+        yield _app
+
+@pytest.fixture
+def bd(app):
+    # Tablas vacías. Se suben las versiones de todas (cache_http.py) para que ningún
+    # caché del proceso (catálogos, conteos, límite del archivo) sirva datos de otro test.
+    import cache_http
+    import flota_sintetica
+    db.session.remove()
+    flota_sintetica.vaciar()
+    cache_http.subir(*db.metadata.tables)
+    yield db
+    db.session.remove()
+
+ADMIN = ('admin@ylb.gob.bo', 'clave-de-prueba')
+
+@pytest.fixture
+def flota(bd):
+    # Un admin, dos vehículos y un área, dados de alta por el ORM (con sus eventos)
+    from app import bcrypt
+    from models import User, Vehiculo, Area
+    db.session.add(User(username='admin', email=ADMIN[0], role='admin',
+                        password=bcrypt.generate_password_hash(ADMIN[1]).decode('utf-8')))
+    vehiculos = [Vehiculo(codigo=f'V-{n}', codigo_interno=f'YLB-{n}', nr_chasis=f'CH{n}', placa=f'{n:04d}-ABC',
+                          marca='Toyota', modelo='Hilux') for n in (1, 2)]
+    area = Area(nombre='Planta Industrial')
+    db.session.add_all(vehiculos + [area])
+    db.session.commit()
+    return [vehiculo.id for vehiculo in vehiculos], area.id
+
+@pytest.fixture
+def cliente_admin(app, flota):
+    cliente = app.test_client()
+    respuesta = cliente.post('/login', data={'email': ADMIN[0], 'password': ADMIN[1]})
+    assert respuesta.status_code == 302
+    return cliente
+
+@pytest.fixture
+def simultaneas(app):
+    # simultaneas(lista_valores): una alta del kiosko (registro_agrupado.registrar) por
+    # hilo, cada una con su contexto y su sesión, todas a la vez. Devuelve el id o el
+    # error de cada una, en el orden de lista_valores.
+    import registro_agrupado
+    def altas(lista_valores):
+        resultados = [None] * len(lista_valores)
+        barrera = threading.Barrier(len(lista_valores))
+        def alta(posicion, valores):
+            with _app.app_context():
+                barrera.wait()
+                try:
+                    resultados[posicion] = registro_agrupado.registrar(valores)
+                except Exception as e:
+                    db.session.rollback()
+                    resultados[posicion] = e
+                finally:
+                    db.session.remove()
+        hilos = [threading.Thread(target=alta, args=(posicion, valores))
+                 for posicion, valores in enumerate(lista_valores)]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+        return resultados
+    return altas
@@ -0,0 +1,41 @@
+# tests/test_cache_reportes.py
+# Caché de PDF (cache_reportes.py): un PDF armado antes de una invalidación no queda
+# publicado bajo la clave vigente.
+import os
+from datetime import date
+
+import pytest
+
+import cache_reportes
+
+FILTROS = {'fecha_inicio': None, 'fecha_fin': None, 'vehiculo_id': '1', 'area_id': None, 'texto': None}
+
+@pytest.fixture
+def cache(app, tmp_path, monkeypatch):
+    monkeypatch.setitem(app.config, 'REPORTES_CACHE_DIR', str(tmp_path))
+    return tmp_path
+
+def test_guarda_y_obtiene(cache):
+    cache_reportes.guardar(FILTROS, b'%PDF-1', cache_reportes.generacion())
+    assert cache_reportes.obtener(FILTROS) == b'%PDF-1'
+
+def test_generacion_vieja_no_se_guarda(cache):
+    generacion = cache_reportes.generacion()
+    cache_reportes.invalidar()
+    cache_reportes.guardar(FILTROS, b'%PDF-viejo', generacion)
+    assert cache_reportes.obtener(FILTROS) is None
+
+def test_invalidacion_durante_la_publicacion(cache, monkeypatch):
+    # La invalidación llega después del control de guardar() y antes de os.replace
+    reemplazar = os.replace
+    pendiente = [True]
+    def reemplazar_e_invalidar(origen, destino):
+        if pendiente and destino.endswith('.json'):
+            pendiente.clear()
+            cache_reportes.invalidar((date(2025, 3, 1), 1, 1))
+        return reemplazar(origen, destino)
+    monkeypatch.setattr(cache_reportes.os, 'replace', reemplazar_e_invalidar)
+    cache_reportes.guardar(FILTROS, b'%PDF-viejo', cache_reportes.generacion())
+    monkeypatch.setattr(cache_reportes.os, 'replace', reemplazar)
+    assert cache_reportes.obtener(FILTROS) is None
+    assert not [nombre for nombre in os.listdir(cache) if nombre.endswith('.pdf')]
@@ -0,0 +1,25 @@
+# tests/test_catalogos.py
+# catalogos.py recarga vehículos y áreas cuando cambia la versión de sus tablas
+# (cache_http.py), sin que nadie tenga que invalidarla a mano.
+from app import db
+from models import Area
+import cache_reportes
+import catalogos
+
+def test_recarga_tras_el_commit(flota):
+    _, area_id = flota
+    assert [area.nombre for area in catalogos.areas()] == ['Planta Industrial']
+    version = catalogos.version()
+    clave = cache_reportes.clave({'area_id': str(area_id)})
+
+    db.session.get(Area, area_id).nombre = 'Pozas de Evaporación'
+    db.session.commit()
+    assert catalogos.version() != version
+    assert [area.nombre for area in catalogos.areas()] == ['Pozas de Evaporación']
+    # Los PDF en caché imprimían el nombre viejo
+    assert cache_reportes.clave({'area_id': str(area_id)}) != clave
+
+def test_sin_cambios_no_recarga(flota):
+    cargados = catalogos._cargar()
+    db.session.rollback()
+    assert catalogos._cargar() is cargados
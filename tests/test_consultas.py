@@ -0,0 +1,28 @@
+# tests/test_consultas.py
+# Conteo de /reportes (consultas.contar_bitacoras) con su caché por proceso.
+from datetime import datetime
+
+from app import db
+from consultas import FILTROS_VACIOS, contar_bitacoras
+from models import Bitacora
+
+def _alta(flota, dia):
+    (vehiculo_id, _), area_id = flota
+    db.session.add(Bitacora(nombre_conductor='Conductor', vehiculo_id=vehiculo_id, area_id=area_id,
+                            fecha_salida=datetime(2025, 3, dia), kilometraje_salida=100 * dia,
+                            kilometraje_entrada=100 * dia + 50, descripcion_trabajo='Traslado de personal'))
+    db.session.commit()
+
+def test_conteo_en_cache_hasta_el_proximo_cambio(flota):
+    _alta(flota, 1)
+    assert contar_bitacoras(dict(FILTROS_VACIOS), ttl=3600) == 1
+    _alta(flota, 2)
+    # Dentro del TTL, pero la tabla cambió: no se usa el total guardado
+    assert contar_bitacoras(dict(FILTROS_VACIOS), ttl=3600) == 2
+
+def test_conteo_en_cache_sin_cambios(flota, monkeypatch):
+    _alta(flota, 1)
+    assert contar_bitacoras(dict(FILTROS_VACIOS), ttl=3600) == 1
+    # Sin escrituras el segundo pedido no consulta
+    monkeypatch.setattr('consultas.contar_filas', lambda filtros: 1 / 0)
+    assert contar_bitacoras(dict(FILTROS_VACIOS), ttl=3600) == 1
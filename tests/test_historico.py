@@ -0,0 +1,36 @@
+# tests/test_historico.py
+# Archivo de meses cerrados (historico.py): los ids de bitacora no se repiten en
+# bitacora_archivada aunque el mes archivado tenga los más altos.
+from datetime import date, datetime
+
+from app import db
+from models import Bitacora, BitacoraArchivada
+import historico
+
+def _alta(flota, mes, dia):
+    (vehiculo_id, _), area_id = flota
+    bitacora = Bitacora(nombre_conductor='Conductor', vehiculo_id=vehiculo_id, area_id=area_id,
+                        fecha_salida=datetime(2025, mes, dia), kilometraje_salida=1000 * mes + 10 * dia,
+                        kilometraje_entrada=1000 * mes + 10 * dia + 5, descripcion_trabajo='Traslado de personal')
+    db.session.add(bitacora)
+    db.session.commit()
+    return bitacora.id
+
+def _archivados():
+    return set(db.session.scalars(db.select(BitacoraArchivada.id)))
+
+def test_archivar_todo_no_reutiliza_ids(flota):
+    ids = {_alta(flota, 3, dia) for dia in (1, 2, 3)}
+    assert historico.archivar_mes(date(2025, 3, 1)) == 3
+    assert _archivados() == ids
+    assert db.session.query(Bitacora).count() == 0
+    assert not historico._reutiliza_ids(db.session.connection())
+    assert _alta(flota, 4, 1) > max(ids)
+
+def test_tabla_sin_autoincrement_deja_la_ultima(flota, monkeypatch):
+    # BD de SQLite creada antes de AUTOINCREMENT: la de id más alto se queda en bitacora
+    monkeypatch.setattr(historico, '_reutiliza_ids', lambda conexion: True)
+    ids = [_alta(flota, 3, dia) for dia in (1, 2, 3)]
+    assert historico.archivar_mes(date(2025, 3, 1)) == 2
+    assert _archivados() == set(ids[:2])
+    assert [b.id for b in db.session.query(Bitacora)] == [ids[2]]
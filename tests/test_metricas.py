@@ -0,0 +1,40 @@
+# tests/test_metricas.py
+# Suma de los volcados por proceso de metricas.py y poda de los de procesos terminados.
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+import metricas
+
+@pytest.fixture
+def directorio(tmp_path, monkeypatch):
+    monkeypatch.setitem(metricas._estado, 'directorio', str(tmp_path))
+    return tmp_path
+
+def _pid_terminado():
+    proceso = subprocess.Popen([sys.executable, '-c', 'pass'])
+    proceso.wait()
+    return proceso.pid
+
+def _volcado(directorio, nombre, valor):
+    datos = {'contadores': [['bitacoras_solicitudes_total', [['endpoint', 'login']], valor]]}
+    (directorio / nombre).write_text(json.dumps(datos))
+
+def test_suma_los_vivos_y_borra_los_terminados(directorio):
+    muerto = _pid_terminado()
+    _volcado(directorio, f'{os.getpid()}.json', 3)
+    _volcado(directorio, f'{os.getppid()}.json', 4)
+    _volcado(directorio, f'{muerto}.json', 100)
+    (directorio / f'{muerto}.json.1234.tmp').write_text('{')
+    contadores, _, _ = metricas._leer_todos()
+    assert contadores == {('bitacoras_solicitudes_total', (('endpoint', 'login'),)): 7}
+    assert sorted(os.listdir(directorio)) == sorted([f'{os.getpid()}.json', f'{os.getppid()}.json'])
+
+def test_ignora_archivos_ajenos(directorio):
+    (directorio / 'notas.txt').write_text('x')
+    (directorio / 'roto.json').write_text('{')
+    assert metricas._leer_todos() == ({}, {}, {})
+    assert sorted(os.listdir(directorio)) == ['notas.txt', 'roto.json']
@@ -0,0 +1,99 @@
+# tests/test_novedades.py
+# /api/novedades (novedades.py): reanudar desde Last-Event-ID y tope de conexiones.
+import re
+import threading
+from datetime import datetime
+
+import pytest
+
+from app import app, db
+from models import Bitacora, EventoCambio
+import novedades
+
+@pytest.fixture
+def sin_espera(app):
+    # Los flujos terminan después de repetir lo pendiente
+    duracion = app.config['NOVEDADES_DURACION']
+    app.config['NOVEDADES_DURACION'] = 0
+    yield
+    app.config['NOVEDADES_DURACION'] = duracion
+
+def _altas(flota, cantidad):
+    (vehiculo_id, _), area_id = flota
+    for n in range(cantidad):
+        db.session.add(Bitacora(nombre_conductor=f'Conductor {n}', vehiculo_id=vehiculo_id, area_id=area_id,
+                                fecha_salida=datetime(2025, 3, 1, 8 + n), kilometraje_salida=1000 + 100 * n,
+                                kilometraje_entrada=1050 + 100 * n, descripcion_trabajo='Traslado de personal'))
+        db.session.commit()
+    return [evento_id for evento_id, in db.session.query(EventoCambio.id)
+            .filter(EventoCambio.tipo == 'bitacora').order_by(EventoCambio.id)]
+
+def _eventos(respuesta):
+    texto = respuesta.get_data(as_text=True)
+    return [(int(evento_id), tipo) for evento_id, tipo in re.findall(r'^id: (\d+)\nevent: (\w+)', texto, re.M)]
+
+def test_reanuda_desde_last_event_id(cliente_admin, flota, sin_espera):
+    ids = _altas(flota, 4)
+    respuesta = cliente_admin.get('/api/novedades', headers={'Last-Event-ID': str(ids[1])})
+    assert respuesta.status_code == 200
+    assert respuesta.mimetype == 'text/event-stream'
+    assert _eventos(respuesta) == [(ids[2], 'bitacora'), (ids[3], 'bitacora')]
+
+def test_last_event_id_tiene_prioridad_sobre_desde(cliente_admin, flota, sin_espera):
+    ids = _altas(flota, 3)
+    respuesta = cliente_admin.get(f'/api/novedades?desde={ids[0]}', headers={'Last-Event-ID': str(ids[1])})
+    assert _eventos(respuesta) == [(ids[2], 'bitacora')]
+
+def test_al_dia_no_repite_nada(cliente_admin, flota, sin_espera):
+    ids = _altas(flota, 2)
+    respuesta = cliente_admin.get('/api/novedades', headers={'Last-Event-ID': str(ids[-1])})
+    assert _eventos(respuesta) == []
+    assert respuesta.get_data(as_text=True).startswith('retry: ')
+
+def test_demasiado_atras_pide_recargar(cliente_admin, flota, sin_espera, monkeypatch):
+    ids = _altas(flota, 3)
+    monkeypatch.setattr(novedades, 'REPETIR_MAX', 1)
+    respuesta = cliente_admin.get('/api/novedades', headers={'Last-Event-ID': str(ids[0] - 1)})
+    texto = respuesta.get_data(as_text=True)
+    assert 'event: recarga' in texto
+    assert _eventos(respuesta) == []
+
+def test_tope_de_conexiones(cliente_admin, sin_espera, monkeypatch):
+    monkeypatch.setitem(app.config, 'NOVEDADES_MAX_CONEXIONES', 1)
+    abierta = cliente_admin.get('/api/novedades', buffered=False)
+    assert abierta.status_code == 200
+    rechazada = cliente_admin.get('/api/novedades')
+    assert rechazada.status_code == 503
+    assert rechazada.headers['Retry-After'] == '30'
+    abierta.close()
+    assert cliente_admin.get('/api/novedades').status_code == 200
+
+def test_respuesta_cerrada_sin_leer_libera_el_lugar(app, monkeypatch):
+    # El servidor cierra la respuesta antes de pedir el primer envío: el generador nunca
+    # arranca y su finally no corre
+    monkeypatch.setitem(app.config, 'NOVEDADES_MAX_CONEXIONES', 1)
+    with app.test_request_context('/api/novedades'):
+        abierta = novedades.respuesta(None)
+        assert novedades.respuesta(None).status_code == 503
+        abierta.close()
+        assert novedades._estado['conexiones'] == 0
+
+def test_reserva_sin_carreras(app, monkeypatch):
+    novedades._asegurar_repartidor()
+    monkeypatch.setitem(app.config, 'NOVEDADES_MAX_CONEXIONES', 3)
+    barrera = threading.Barrier(16)
+    reservas = []
+    def reservar():
+        barrera.wait()
+        reservas.append(novedades._reservar())
+    hilos = [threading.Thread(target=reservar) for _ in range(16)]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+    concedidas = [liberar for liberar in reservas if liberar is not None]
+    assert len(concedidas) == 3
+    for liberar in concedidas:
+        liberar()
+        liberar()  # liberar dos veces no descuenta de más
+    assert novedades._estado['conexiones'] == 0
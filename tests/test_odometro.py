@@ -0,0 +1,54 @@
+# tests/test_odometro.py
+# Control del odómetro del kiosko (odometro.py) con altas simultáneas del mismo vehículo.
+from datetime import datetime
+
+from app import db
+from models import Bitacora, OdometroVehiculo
+import odometro
+import registro_agrupado
+
+HILOS = 8
+
+def _valores(vehiculo_id, area_id, dia, km_salida, km_entrada):
+    return dict(nombre_conductor='Conductor', vehiculo_id=vehiculo_id, area_id=area_id,
+                fecha_salida=datetime(2025, 3, dia), kilometraje_salida=km_salida,
+                kilometraje_entrada=km_entrada, descripcion_trabajo='Traslado de personal')
+
+def test_retrocede_rechaza_y_no_guarda(flota):
+    (vehiculo_id, _), area_id = flota
+    registro_agrupado.registrar(_valores(vehiculo_id, area_id, 2, 500, 1000))
+    try:
+        registro_agrupado.registrar(_valores(vehiculo_id, area_id, 3, 900, 950))
+    except odometro.OdometroRetrocede as e:
+        assert e.lectura.km == 1000
+    else:
+        raise AssertionError('se aceptó un viaje que empieza por debajo del último')
+    db.session.rollback()
+    assert Bitacora.query.count() == 1
+    # Un viaje cargado tarde (fecha anterior al último) no se valida
+    registro_agrupado.registrar(_valores(vehiculo_id, area_id, 1, 100, 200))
+    assert db.session.get(OdometroVehiculo, vehiculo_id).km == 1000
+
+def test_altas_simultaneas_validan_contra_la_lectura_nueva(flota, simultaneas):
+    # Todas salen de 1000 km el mismo día: la primera que se confirma sube la lectura y
+    # las demás quedan por debajo. Sin el bloqueo, dos podrían validarse contra la vieja.
+    (vehiculo_id, _), area_id = flota
+    registro_agrupado.registrar(_valores(vehiculo_id, area_id, 1, 500, 1000))
+    resultados = simultaneas([_valores(vehiculo_id, area_id, 2, 1000, 1100 + n) for n in range(HILOS)])
+
+    aceptadas = [resultado for resultado in resultados if isinstance(resultado, int)]
+    rechazadas = [resultado for resultado in resultados if isinstance(resultado, odometro.OdometroRetrocede)]
+    assert len(aceptadas) == 1
+    assert len(rechazadas) == HILOS - 1
+    ganadora = db.session.get(Bitacora, aceptadas[0])
+    lectura = db.session.get(OdometroVehiculo, vehiculo_id)
+    assert (lectura.bitacora_id, lectura.km) == (ganadora.id, ganadora.kilometraje_entrada)
+    assert Bitacora.query.filter_by(vehiculo_id=vehiculo_id).count() == 2
+
+def test_altas_simultaneas_de_otros_vehiculos_no_se_cruzan(flota, simultaneas):
+    vehiculo_ids, area_id = flota
+    resultados = simultaneas([_valores(vehiculo_ids[n % 2], area_id, 2 + n // 2, 1000 * (n // 2), 1000 * (n // 2) + 500)
+                               for n in range(HILOS)])
+    assert all(isinstance(resultado, int) for resultado in resultados)
+    for vehiculo_id in vehiculo_ids:
+        assert db.session.get(OdometroVehiculo, vehiculo_id).km == 1000 * (HILOS // 2 - 1) + 500
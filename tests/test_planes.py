@@ -0,0 +1,36 @@
+# tests/test_planes.py
+# Lo mismo que 'flask verificar-planes' (indices.py): cada forma de consulta de los
+# reportes, sobre bitacora y sobre bitacora_archivada, usa un índice y, si va ordenada,
+# no ordena en memoria.
+import historico
+import indices
+import flota_sintetica
+
+def _fallas(resultados):
+    return {nombre: plan for nombre, problemas, plan in resultados if problemas}
+
+def test_planes_sin_problemas(bd):
+    flota_sintetica.sembrar(3000, anios=2)
+    historico.archivar(6)
+    resultados = indices.verificar()
+    assert _fallas(resultados) == {}
+    # Las formas del archivo también se revisaron
+    nombres = [nombre for nombre, _, _ in resultados]
+    assert any(nombre.endswith('(archivo)]') for nombre in nombres)
+    assert len([n for n in nombres if '(archivo)' in n]) == len([n for n in nombres if '(archivo)' not in n])
+
+def test_sin_archivo_no_revisa_bitacora_archivada(bd):
+    flota_sintetica.sembrar(500, anios=1)
+    resultados = indices.verificar()
+    assert _fallas(resultados) == {}
+    assert not [nombre for nombre, _, _ in resultados if '(archivo)' in nombre]
+
+def test_planes_estables_entre_conexiones(bd):
+    # Las conexiones del pool abiertas antes de archivar planifican con las estadísticas
+    # nuevas (ANALYZE de historico.archivar)
+    flota_sintetica.sembrar(3000, anios=2)
+    for _ in range(3):
+        assert _fallas(indices.verificar()) == {}
+    historico.archivar(6)
+    for _ in range(3):
+        assert _fallas(indices.verificar()) == {}
@@ -0,0 +1,75 @@
+# tests/test_registro_agrupado.py
+# Commit agrupado del kiosko (registro_agrupado.py): las altas simultáneas se confirman
+# juntas y cada solicitud recibe su propio resultado.
+from datetime import datetime
+
+import pytest
+from sqlalchemy import event
+
+from app import app, db
+from models import Bitacora
+import odometro
+import registro_agrupado
+
+@pytest.fixture
+def lotes(monkeypatch):
+    # Modo agrupado con una ventana amplia; devuelve el tamaño de cada lote confirmado
+    monkeypatch.setitem(app.config, 'KIOSKO_COMMIT_AGRUPADO', True)
+    monkeypatch.setitem(app.config, 'KIOSKO_AGRUPAR_MS', 200)
+    # Como si el lote anterior hubiera sido de varias: el líder espera la ventana
+    monkeypatch.setitem(registro_agrupado._estado, 'ultimo_lote', 2)
+    tamanos = []
+    guardar = registro_agrupado._guardar
+    def contar(lote):
+        tamanos.append(len(lote))
+        return guardar(lote)
+    monkeypatch.setattr(registro_agrupado, '_guardar', contar)
+    return tamanos
+
+def _valores(vehiculo_id, area_id, dia, km_salida, nombre='Conductor'):
+    return dict(nombre_conductor=nombre, vehiculo_id=vehiculo_id, area_id=area_id,
+                fecha_salida=datetime(2025, 3, dia), kilometraje_salida=km_salida,
+                kilometraje_entrada=km_salida + 100, descripcion_trabajo='Cambio de turno')
+
+def test_un_error_no_arrastra_al_lote(flota, lotes, simultaneas):
+    (vehiculo_id, otro_id), area_id = flota
+    registro_agrupado.registrar(_valores(otro_id, area_id, 1, 900))
+    lotes.clear()
+    buenas = [_valores(vehiculo_id, area_id, dia, 100 * dia, f'Conductor {dia}') for dia in range(2, 7)]
+    mala = _valores(otro_id, area_id, 2, 10, 'Retrocede')
+    resultados = simultaneas(buenas + [mala])
+
+    assert isinstance(resultados[-1], odometro.OdometroRetrocede)
+    assert resultados[-1].lectura.km == 1000
+    ids = resultados[:-1]
+    assert all(isinstance(bitacora_id, int) for bitacora_id in ids)
+    # Cada id es el de su propia fila
+    assert [db.session.get(Bitacora, bitacora_id).nombre_conductor for bitacora_id in ids] == \
+        [valores['nombre_conductor'] for valores in buenas]
+    assert Bitacora.query.filter_by(nombre_conductor='Retrocede').count() == 0
+    assert sum(lotes) == len(resultados)
+    assert max(lotes) > 1
+
+def test_cada_fila_mala_recibe_su_error(flota, lotes, simultaneas):
+    (vehiculo_id, otro_id), area_id = flota
+    registro_agrupado.registrar(_valores(vehiculo_id, area_id, 3, 900))
+    registro_agrupado.registrar(_valores(otro_id, area_id, 3, 5000))
+    malas = [_valores(vehiculo_id, area_id, 4, 10), _valores(otro_id, area_id, 4, 20)]
+    buena = _valores(vehiculo_id, area_id, 1, 0, 'Cargado tarde')
+    resultados = simultaneas(malas + [buena])
+
+    assert [error.lectura.km for error in resultados[:2]] == [1000, 5100]
+    assert isinstance(resultados[2], int)
+    assert Bitacora.query.count() == 3
+
+def test_si_falla_el_commit_falla_todo_el_lote(flota, lotes, simultaneas):
+    (vehiculo_id, otro_id), area_id = flota
+    def fallar(session):
+        raise RuntimeError('disco lleno')
+    event.listen(db.session, 'before_commit', fallar)
+    try:
+        resultados = simultaneas([_valores(vehiculo_id, area_id, 2, 0), _valores(otro_id, area_id, 2, 0)])
+    finally:
+        event.remove(db.session, 'before_commit', fallar)
+    assert [str(error) for error in resultados] == ['disco lleno', 'disco lleno']
+    assert Bitacora.query.count() == 0
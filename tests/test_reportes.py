@@ -0,0 +1,47 @@
+# tests/test_reportes.py
+# /reportes con cursores de página (consultas.py) que llegan cortados o editados a mano.
+import re
+from datetime import datetime
+
+import pytest
+
+from app import db
+from consultas import FILTROS_VACIOS, decodificar_cursor, validar_cursor
+from models import Bitacora
+
+@pytest.fixture
+def bitacoras(flota):
+    (vehiculo_id, _), area_id = flota
+    for dia in range(1, 6):
+        db.session.add(Bitacora(nombre_conductor=f'Conductor {dia}', vehiculo_id=vehiculo_id, area_id=area_id,
+                                fecha_salida=datetime(2025, 3, dia), kilometraje_salida=100 * dia,
+                                kilometraje_entrada=100 * dia + 50, descripcion_trabajo='Traslado de personal'))
+    db.session.commit()
+
+def _conductores(respuesta):
+    return re.findall(r'Conductor \d', respuesta.get_data(as_text=True))
+
+@pytest.mark.parametrize('consulta', ['antes=zz_1', 'despues=abc', 'despues=2024-01-01_x', 'despues=_',
+                                      'despues=2024-01-01T00:00:00', 'texto=traslado&despues=2024-01-01_1',
+                                      'texto=traslado&antes=nan_1'])
+def test_cursor_no_valido_muestra_la_primera_pagina(cliente_admin, bitacoras, consulta):
+    respuesta = cliente_admin.get(f'/reportes?por_pagina=2&{consulta}')
+    assert respuesta.status_code == 200
+    assert 'El enlace de página no es válido' in respuesta.get_data(as_text=True)
+    assert len(set(_conductores(respuesta))) == 2
+
+def test_cursor_valido_pagina(cliente_admin, bitacoras):
+    primera = cliente_admin.get('/reportes?por_pagina=2')
+    siguiente = re.search(r'despues=([^&"]+)', primera.get_data(as_text=True)).group(1)
+    segunda = cliente_admin.get(f'/reportes?por_pagina=2&despues={siguiente}')
+    assert segunda.status_code == 200
+    assert 'El enlace de página no es válido' not in segunda.get_data(as_text=True)
+    assert set(_conductores(segunda)) == {'Conductor 3', 'Conductor 2'}
+
+def test_decodificar_cursor():
+    assert decodificar_cursor('2025-03-01T00:00:00_7', datetime.fromisoformat) == (datetime(2025, 3, 1), 7)
+    assert decodificar_cursor('-1.5_7', float) == (-1.5, 7)
+    for cursor in ('zz_1', 'abc', '1.5_', 'inf_3'):
+        with pytest.raises(ValueError):
+            decodificar_cursor(cursor, float)
+    validar_cursor(dict(FILTROS_VACIOS), None)
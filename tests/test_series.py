@@ -0,0 +1,32 @@
+# tests/test_series.py
+# /api/series (series.py): el caché por proceso no sobrevive a un cambio de los datos,
+# que también cambia el ETag de la respuesta (cache_http.condicional).
+from datetime import datetime
+
+from app import db
+from consultas import FILTROS_VACIOS
+from models import Bitacora
+import series
+
+def _alta(flota, dia):
+    (vehiculo_id, _), area_id = flota
+    db.session.add(Bitacora(nombre_conductor='Conductor', vehiculo_id=vehiculo_id, area_id=area_id,
+                            fecha_salida=datetime(2025, 3, dia), kilometraje_salida=100 * dia,
+                            kilometraje_entrada=100 * dia + 50, descripcion_trabajo='Traslado de personal'))
+    db.session.commit()
+
+def test_serie_recalculada_tras_un_alta(flota):
+    _alta(flota, 1)
+    assert series.series(dict(FILTROS_VACIOS), 'mes', ttl=3600)['columnas']['viajes'] == [1]
+    _alta(flota, 2)
+    assert series.series(dict(FILTROS_VACIOS), 'mes', ttl=3600)['columnas']['viajes'] == [2]
+
+def test_etag_y_cuerpo_cambian_juntos(flota, cliente_admin):
+    _alta(flota, 1)
+    primera = cliente_admin.get('/api/series?periodo=mes')
+    assert primera.get_json()['columnas']['viajes'] == [1]
+    _alta(flota, 2)
+    segunda = cliente_admin.get('/api/series?periodo=mes', headers={'If-None-Match': primera.headers['ETag']})
+    assert segunda.status_code == 200
+    assert segunda.headers['ETag'] != primera.headers['ETag']
+    assert segunda.get_json()['columnas']['viajes'] == [2]
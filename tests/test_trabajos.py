@@ -0,0 +1,55 @@
+# tests/test_trabajos.py
+# Cola de PDF en segundo plano (trabajos.py): los trabajos perdidos no ocupan la cola.
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime, timedelta
+
+import pytest
+
+from app import app, db
+from models import TrabajoReporte
+import trabajos
+
+class _Ejecutor:
+    # En lugar del pool de procesos: guarda los futuros sin correr nada
+    def __init__(self):
+        self.futuros = []
+    def submit(self, funcion, *args):
+        futuro = Future()
+        self.futuros.append(futuro)
+        return futuro
+
+@pytest.fixture
+def ejecutor(app, bd, monkeypatch):
+    falso = _Ejecutor()
+    monkeypatch.setattr(trabajos, '_obtener_ejecutor', lambda reiniciar=False: falso)
+    monkeypatch.setitem(app.config, 'REPORTES_MAX_EN_COLA', 2)
+    return falso
+
+def _estado(trabajo_id):
+    db.session.expire_all()
+    return db.session.get(TrabajoReporte, trabajo_id).estado
+
+def test_hijo_muerto_marca_error(ejecutor):
+    trabajo_id = trabajos.encolar({}).id
+    ejecutor.futuros[0].set_exception(BrokenProcessPool('murió'))
+    assert _estado(trabajo_id) == 'error'
+    assert 'BrokenProcessPool' in db.session.get(TrabajoReporte, trabajo_id).error
+
+def test_terminado_normal_no_se_toca(ejecutor):
+    trabajo_id = trabajos.encolar({}).id
+    ejecutor.futuros[0].set_result(None)
+    assert _estado(trabajo_id) == 'pendiente'
+
+def test_vencidos_liberan_la_cola(ejecutor):
+    primeros = [trabajos.encolar({}).id for _ in range(2)]
+    # La cola está llena de trabajos cuyo worker murió: nadie los va a terminar
+    assert trabajos.encolar({}) is None
+    vencido = datetime.utcnow() - timedelta(minutes=app.config['REPORTES_TIEMPO_MAX_MIN'] + 1)
+    db.session.query(TrabajoReporte).update({'creado': vencido, 'estado': 'procesando'})
+    db.session.commit()
+
+    nuevo = trabajos.encolar({})
+    assert nuevo is not None
+    assert [_estado(trabajo_id) for trabajo_id in primeros] == ['error', 'error']
+    assert _estado(nuevo.id) == 'pendiente'
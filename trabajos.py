@@ -0,0 +1,170 @@
+# trabajos.py
+# Generación del PDF de bitácoras en segundo plano.
+# El estado de cada trabajo vive en la tabla TrabajoReporte (misma BD), y el render
+# corre en un pool de procesos para no bloquear al worker de gunicorn ni al kiosko.
+# Un trabajo cuyo proceso hijo muere pasa a 'error' enseguida (_vigilar); uno que quedó
+# huérfano porque murió el worker que tenía el pool, al vencer REPORTES_TIEMPO_MAX_MIN
+# (limpiar_antiguos). Si no, seguiría ocupando un lugar de REPORTES_MAX_EN_COLA.
+import json
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime, timedelta
+from flask import url_for
+from sqlalchemy import update
+from app import app, db
+from models import TrabajoReporte
+from consultas import leer_filtros, contar_filas, filas_por_lotes
+from pdf_reportes import construir_pdf
+import cache_reportes
+
+ESTADOS_ACTIVOS = ('pendiente', 'procesando')
+ESTADOS_FINALES = ('terminado', 'error')
+
+_ejecutor = None
+_candado = threading.Lock()
+
+def directorio_reportes():
+    directorio = app.config['REPORTES_DIR'] or os.path.join(app.instance_path, 'reportes')
+    os.makedirs(directorio, exist_ok=True)
+    return directorio
+
+# --- Pool de procesos ---
+def iniciar_proceso():
+    # Inicializador de los pools de PDF (también lo usa paquetes.py).
+    # El hijo hereda (fork) el pool de conexiones del padre: se descarta sin cerrarlas
+    # para que cada proceso abra las suyas.
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose(close=False)
+
+def _obtener_ejecutor(reiniciar=False):
+    global _ejecutor
+    with _candado:
+        if _ejecutor is None or reiniciar:
+            _ejecutor = ProcessPoolExecutor(max_workers=app.config['REPORTES_MAX_RENDERS'],
+                                            initializer=iniciar_proceso)
+        return _ejecutor
+
+# --- API usada por routes.py ---
+def encolar(parametros, usuario_id=None):
+    # 'parametros' son los filtros como strings (consultas.parametros_url).
+    # Devuelve None si ya hay demasiados trabajos en cola.
+    limpiar_antiguos()
+    activos = TrabajoReporte.query.filter(TrabajoReporte.estado.in_(ESTADOS_ACTIVOS)).count()
+    if activos >= app.config['REPORTES_MAX_EN_COLA']:
+        return None
+    trabajo = TrabajoReporte(filtros=json.dumps(parametros), usuario_id=usuario_id)
+    db.session.add(trabajo)
+    db.session.commit()
+    try:
+        futuro = _obtener_ejecutor().submit(_renderizar, trabajo.id)
+    except BrokenProcessPool:
+        # Un proceso hijo murió (p. ej. por memoria): se levanta un pool nuevo.
+        futuro = _obtener_ejecutor(reiniciar=True).submit(_renderizar, trabajo.id)
+    _vigilar(futuro, trabajo.id)
+    return trabajo
+
+def _marcar_error(condicion, mensaje):
+    db.session.execute(update(TrabajoReporte)
+                       .where(condicion, TrabajoReporte.estado.in_(ESTADOS_ACTIVOS))
+                       .values(estado='error', error=mensaje, terminado=datetime.utcnow()))
+    db.session.commit()
+
+def _vigilar(futuro, trabajo_id):
+    # _renderizar anota sus propios errores: si el futuro termina con una excepción es
+    # que el proceso hijo murió (BrokenProcessPool) y nadie más va a cerrar el trabajo.
+    def al_terminar(futuro):
+        if futuro.cancelled() or futuro.exception() is None:
+            return
+        with app.app_context():
+            try:
+                _marcar_error(TrabajoReporte.id == trabajo_id,
+                              f'El proceso que generaba el reporte terminó inesperadamente '
+                              f'({type(futuro.exception()).__name__}).')
+            except Exception:
+                app.logger.exception('No se pudo anotar el error del trabajo %s', trabajo_id)
+            finally:
+                db.session.remove()
+    futuro.add_done_callback(al_terminar)
+
+def resumen(trabajo):
+    datos = {
+        'id': trabajo.id,
+        'estado': trabajo.estado,
+        'filas_procesadas': trabajo.filas_procesadas,
+        'filas_totales': trabajo.filas_totales,
+        'porcentaje': None,
+        'error': trabajo.error,
+        'url_estado': url_for('estado_reporte_pdf', trabajo_id=trabajo.id),
+        'url_descarga': None
+    }
+    if trabajo.filas_totales:
+        datos['porcentaje'] = round(100.0 * trabajo.filas_procesadas / trabajo.filas_totales, 1)
+    if trabajo.estado == 'terminado':
+        datos['url_descarga'] = url_for('descargar_reporte_pdf', trabajo_id=trabajo.id)
+    return datos
+
+def limpiar_antiguos():
+    vencimiento = datetime.utcnow() - timedelta(minutes=app.config['REPORTES_TIEMPO_MAX_MIN'])
+    _marcar_error(TrabajoReporte.creado < vencimiento,
+                  'El reporte no terminó a tiempo; vuelva a solicitarlo.')
+    limite = datetime.utcnow() - timedelta(hours=app.config['REPORTES_RETENCION_HORAS'])
+    # Solo los que ya terminaron: uno pendiente o en proceso todavía lo está escribiendo un
+    # hijo (los perdidos ya pasaron a 'error' arriba)
+    antiguos = TrabajoReporte.query.filter(TrabajoReporte.creado < limite,
+                                           TrabajoReporte.estado.in_(ESTADOS_FINALES)).all()
+    for trabajo in antiguos:
+        if trabajo.archivo:
+            try:
+                os.remove(os.path.join(directorio_reportes(), trabajo.archivo))
+            except OSError:
+                pass
+        db.session.delete(trabajo)
+    if antiguos:
+        db.session.commit()
+
+# --- Lo que corre dentro del proceso hijo ---
+def _renderizar(trabajo_id):
+    with app.app_context():
+        trabajo = db.session.get(TrabajoReporte, trabajo_id)
+        if trabajo is None:
+            return
+        try:
+            filtros = leer_filtros(json.loads(trabajo.filtros))
+            trabajo.estado = 'procesando'
+            trabajo.filas_totales = contar_filas(filtros)
+            db.session.commit()
+
+            def progreso(procesadas):
+                db.session.execute(update(TrabajoReporte)
+                                   .where(TrabajoReporte.id == trabajo_id)
+                                   .values(filas_procesadas=procesadas))
+                db.session.commit()
+
+            generacion = cache_reportes.generacion()
+            contenido = cache_reportes.obtener(filtros)
+            if contenido is None:
+                contenido = construir_pdf(filas_por_lotes(filtros), progreso=progreso)
+                cache_reportes.guardar(filtros, contenido, generacion)
+            archivo = f'reporte_{trabajo_id}.pdf'
+            ruta = os.path.join(directorio_reportes(), archivo)
+            with open(ruta + '.tmp', 'wb') as salida:
+                salida.write(contenido)
+            os.replace(ruta + '.tmp', ruta)
+
+            trabajo = db.session.get(TrabajoReporte, trabajo_id)
+            trabajo.estado = 'terminado'
+            trabajo.archivo = archivo
+            trabajo.terminado = datetime.utcnow()
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            trabajo = db.session.get(TrabajoReporte, trabajo_id)
+            trabajo.estado = 'error'
+            trabajo.error = str(e)
+            trabajo.terminado = datetime.utcnow()
+            db.session.commit()
+        finally:
+            db.session.remove()
@@ -0,0 +1,75 @@
+# usuarios.py
+# Carga del usuario de cada solicitud (user_loader de Flask-Login) sin consultar la BD:
+# cada proceso guarda los datos de los usuarios con sesión abierta en una caché chica
+# (LRU, USUARIOS_CACHE_MAX entradas, USUARIOS_CACHE_TTL segundos).
+#  - La caché se descarta en todos los workers apenas se confirma cualquier cambio en la
+#    tabla user (marca de versión de cache_http.py, un archivo en instance/).
+#  - La sesión guarda '<id>:<sello>' (User.get_id); si la contraseña o el rol cambiaron,
+#    el sello ya no coincide y la sesión queda cerrada en la solicitud siguiente, también
+#    la cookie 'recordarme'. Las sesiones de antes de este cambio (solo el id) también.
+# Cambios hechos fuera de la aplicación (psql) se ven recién al vencer el TTL.
+import threading
+import time
+from collections import OrderedDict
+from sqlalchemy.orm import make_transient_to_detached
+from app import app, db, login_manager
+from models import User
+import cache_http
+
+CAMPOS = ('id', 'username', 'email', 'password', 'role')
+
+# id -> (versión de la tabla user, momento de carga, {campo: valor})
+_cache = OrderedDict()
+_candado = threading.Lock()
+
+def _leer(usuario_id, version):
+    with _candado:
+        en_cache = _cache.get(usuario_id)
+        if en_cache is None:
+            return None
+        if en_cache[0] != version or time.monotonic() - en_cache[1] >= app.config['USUARIOS_CACHE_TTL']:
+            del _cache[usuario_id]
+            return None
+        _cache.move_to_end(usuario_id)
+        return en_cache[2]
+
+def _guardar(usuario_id, version, datos):
+    with _candado:
+        _cache[usuario_id] = (version, time.monotonic(), datos)
+        _cache.move_to_end(usuario_id)
+        while len(_cache) > app.config['USUARIOS_CACHE_MAX']:
+            _cache.popitem(last=False)
+
+def vaciar():
+    with _candado:
+        _cache.clear()
+
+def _desde_cache(datos):
+    # Objeto User "desprendido" con su identidad; merge(load=False) lo asocia a la sesión
+    # de esta solicitud sin emitir SELECT, así current_user se puede usar como siempre.
+    usuario = User(**datos)
+    make_transient_to_detached(usuario)
+    return db.session.merge(usuario, load=False)
+
+@login_manager.user_loader
+def cargar_usuario(identificador):
+    usuario_id, _, sello = identificador.partition(':')
+    if not sello or not usuario_id.isdigit():
+        return None
+    usuario_id = int(usuario_id)
+    usar_cache = app.config['USUARIOS_CACHE_TTL'] > 0
+    # La versión se lee antes de consultar: si la tabla cambia mientras tanto, la próxima
+    # solicitud ya no acepta lo guardado.
+    version = cache_http.version('user') if usar_cache else None
+    datos = _leer(usuario_id, version) if usar_cache else None
+    if datos is not None:
+        usuario = _desde_cache(datos)
+    else:
+        usuario = db.session.get(User, usuario_id)
+        if usuario is None:
+            return None
+        if usar_cache:
+            _guardar(usuario_id, version, {campo: getattr(usuario, campo) for campo in CAMPOS})
+    if usuario.sello_sesion() != sello:
+        return None
+    return usuario